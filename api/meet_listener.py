@@ -1,6 +1,5 @@
 import os
 import time
-import queue
 import threading
 import random
 from datetime import datetime
@@ -12,9 +11,14 @@ import subprocess
 import shutil
 from pathlib import Path
 
-from config.config import STREAM_SAMPLE_RATE, logger, CHROME_PROFILE_DIR, MEET_GUEST_NAME, MEET_AUDIO_CHUNKS_DIR, MEET_FRAME_DURATION_MS
+from config.config import (STREAM_SAMPLE_RATE, logger, CHROME_PROFILE_DIR, MEET_GUEST_NAME, MEET_AUDIO_CHUNKS_DIR, MEET_FRAME_DURATION_MS,
+                           AUDIO_QUEUE_MAX_S, AUDIO_QUEUE_POLICY, AUDIO_QUEUE_SILENCE_RMS, AUDIO_QUEUE_METRICS_INTERVAL_S,
+                           AUDIO_QUEUE_LAG_WARN_S, MEET_CAPTURE_BLOCK_FRAMES, MEET_CAPTURE_BACKEND, MEET_PULSE_BUFFER_MS)
 from handlers.audio_handler import AudioHandler
 from api.audio_manager import VirtualAudioManager
+from api.pulse_capture import PulseSimpleCapture, PulseCaptureError
+from utils.audio_queue import BoundedAudioQueue, queue_metrics_path
+from utils.capture_reader import BlockCaptureReader
 
 
 CHROME_LAUNCH_LOCK = threading.Lock()
@@ -33,7 +37,17 @@ class MeetListenerBot:
         self.notified_10_min = remaining_seconds <= 600
         self.notified_5_min = False
         self.driver = None  
-        self.audio_queue = queue.Queue() # Для аудиопотока
+        # Для аудиопотока: ограниченная очередь блоков по MEET_CAPTURE_BLOCK_FRAMES кадров,
+        # при переполнении действует AUDIO_QUEUE_POLICY
+        self.audio_queue = BoundedAudioQueue(
+            max_frames=max(1, int(AUDIO_QUEUE_MAX_S * 1000 / (MEET_FRAME_DURATION_MS * MEET_CAPTURE_BLOCK_FRAMES))),
+            policy=AUDIO_QUEUE_POLICY,
+            silence_rms=AUDIO_QUEUE_SILENCE_RMS,
+            spill_path=MEET_AUDIO_CHUNKS_DIR / self.meeting_id / "audio_spill.bin"
+        )
+        self.queue_metrics_path = queue_metrics_path(self.meeting_id)
+        self.capture_source = None # PulseSimpleCapture, если захват идет внутри процесса
+        self.chat_lock = threading.Lock() # Чат пишут стадия действий и монитор времени, драйвер Selenium общий
 
         self.is_running = threading.Event()
         self.is_running.set()
@@ -405,11 +419,22 @@ class MeetListenerBot:
             self._save_screenshot("99_join_fatal_error")
             return False
     
-    # Поиск и определение аудиоустройства
-    def _audio_capture_thread(self):
+    # Источник PCM для захвата: PulseAudio внутри процесса, а если не вышло — подпроцесс parec
+    def _open_capture_source(self):
+        if MEET_CAPTURE_BACKEND == "pulse":
+            try:
+                source = PulseSimpleCapture(
+                    self.monitor_name,
+                    sample_rate=STREAM_SAMPLE_RATE,
+                    fragment_bytes=self.frame_size * 2 * MEET_CAPTURE_BLOCK_FRAMES,
+                    buffer_ms=MEET_PULSE_BUFFER_MS,
+                    stream_name=f"capture-{self.meeting_id}"
+                )
+                logger.info(f"[{self.meeting_id}] 🎤 Запуск аудиозахвата через libpulse-simple")
+                return source, None
+            except PulseCaptureError as e:
+                logger.warning(f"[{self.meeting_id}] {e} Переключаюсь на parec.")
 
-        threading.current_thread().name = f'AudioCapture-{self.meeting_id}'
-        
         # Команда для запуска PulseAudio Recorder (parec)
         # Он будет записывать с нашего виртуального монитора в сыром формате
         command = [
@@ -420,41 +445,71 @@ class MeetListenerBot:
             '--channels=1',
             '--raw'                       # Вывод сырых PCM данных без заголовков
         ]
-        
+
         logger.info(f"[{self.meeting_id}] 🎤 Запуск аудиозахвата с помощью parec")
+        # Запускаем подпроцесс без буферизации stdout: читаем сразу в свои буферы через readinto
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+        return process.stdout, process
+
+    def _capture_stats(self) -> dict:
+        if self.capture_source is not None:
+            return self.capture_source.stats()
+        return {"backend": "parec"}
+
+    # Поиск и определение аудиоустройства
+    def _audio_capture_thread(self):
+
+        threading.current_thread().name = f'AudioCapture-{self.meeting_id}'
 
         # Таймер для подсчета статистики захвата
-        chunk_count = 0
+        block_count = 0
         capture_start_time = time.time()
+        last_metrics_time = capture_start_time
+        stats_every_blocks = max(1, int(30 * 1000 / (MEET_FRAME_DURATION_MS * MEET_CAPTURE_BLOCK_FRAMES)))
 
         process = None
         try:
-            # Запускаем подпроцесс
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-            # Размер чанка в байтах (int16 = 2 байта на семпл)
-            chunk_size_bytes = self.frame_size * 2
+            source, process = self._open_capture_source()
+            if process is None:
+                self.capture_source = source
+
+            # Блоки из нескольких кадров (int16 = 2 байта на семпл) читаются в один переиспользуемый буфер
+            reader = BlockCaptureReader(
+                source,
+                frame_bytes=self.frame_size * 2,
+                frames_per_block=MEET_CAPTURE_BLOCK_FRAMES
+            )
 
             while self.is_running.is_set():
-                # Читаем ровно один фрейм данных из stdout процесса
-                audio_chunk_bytes = process.stdout.read(chunk_size_bytes)
+                audio_block = reader.read_block()
 
-                if not audio_chunk_bytes:
+                if audio_block is None:
                     # Проверяем, не завершился ли процесс
-                    if process.poll() is not None:
-                        logger.warning(f"[{self.meeting_id}] Поток аудио из parec прервался, процесс завершился.")
+                    if process is None or process.poll() is not None:
+                        logger.warning(f"[{self.meeting_id}] Поток аудио прервался, источник захвата закрыт.")
                         break
                     # Если процесс жив, но данных нет, просто продолжаем цикл
                     continue
 
                 # Статистика захвата (раз в 30 секунд)
-                chunk_count += 1
-                if chunk_count % 15000 == 0:  # ~30 сек при 512 семплах/чанк
+                block_count += 1
+                if block_count % stats_every_blocks == 0:
                     elapsed = time.time() - capture_start_time
-                    logger.info(f"[{self.meeting_id}] 🎤 Захвачено {chunk_count} чанков за {elapsed:.0f} сек")
-
-                # Помещаем сырые байты в очередь для дальнейшей обработки
-                self.audio_queue.put(audio_chunk_bytes)
+                    logger.info(f"[{self.meeting_id}] 🎤 Захвачено {block_count} блоков ({reader.reads} чтений) за {elapsed:.0f} сек")
+
+                # Очередь копирует блок: буфер читателя перезаписывается следующим чтением
+                self.audio_queue.put(audio_block)
+
+                # Метрики очереди и захвата: глубина, отставание VAD, потерянные кадры, переполнения PulseAudio
+                now = time.time()
+                if now - last_metrics_time >= AUDIO_QUEUE_METRICS_INTERVAL_S:
+                    last_metrics_time = now
+                    self.audio_queue.write_metrics(self.queue_metrics_path, capture=self._capture_stats())
+                    backlog = self.audio_queue.backlog_seconds()
+                    if backlog >= AUDIO_QUEUE_LAG_WARN_S:
+                        metrics = self.audio_queue.metrics
+                        logger.warning(f"[{self.meeting_id}] VAD отстает: в очереди {backlog:.1f} с аудио, "
+                                       f"отброшено {metrics['dropped_frames']} кадров, на диске {metrics['spilled_frames']}")
         
         except FileNotFoundError:
             logger.critical(f"[{self.meeting_id}] ❌ КОМАНДА 'parec' НЕ НАЙДЕНА! Установите пакет 'pulseaudio-utils'.")
@@ -464,6 +519,9 @@ class MeetListenerBot:
             self.stop()
         finally:
             logger.info(f"[{self.meeting_id}] Завершение потока аудиозахвата...")
+            if self.capture_source is not None:
+                logger.info(f"[{self.meeting_id}] Захват PulseAudio закрыт: {self.capture_source.stats()}")
+                self.capture_source.close()
             if process:
                 # Мягко завершаем процесс
                 process.terminate()
@@ -592,6 +650,9 @@ class MeetListenerBot:
         logger.info(f"[{self.meeting_id}] Получена команда на завершение...")
 
         self.is_running.clear()
+        self.audio_queue.close()
+        self.audio_queue.write_metrics(self.queue_metrics_path, capture=self._capture_stats())
+        logger.info(f"[{self.meeting_id}] Итог очереди аудио: {self.audio_queue.snapshot()}")
 
         if self.joined_successfully:
             self._leave_meeting()
@@ -633,7 +694,11 @@ class MeetListenerBot:
             return
 
         logger.info(f"[{self.meeting_id}] Попытка отправить сообщение в чат: '{message[:30]}...'")
-        
+
+        with self.chat_lock:
+            self._send_chat_message_locked(message)
+
+    def _send_chat_message_locked(self, message: str):
         try:
 
             try:
@@ -0,0 +1,124 @@
+import ctypes
+import ctypes.util
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+PA_STREAM_RECORD = 2
+PA_SAMPLE_S16LE = 3
+PA_UINT32_MAX = 0xFFFFFFFF
+OVERRUN_LATENCY_SHARE = 0.9 # Задержка выше этой доли серверного буфера — сервер уже теряет данные
+
+
+class PulseCaptureError(RuntimeError):
+    """Ошибка libpulse-simple: библиотеки нет, устройство не открылось или чтение прервалось."""
+
+
+class _SampleSpec(ctypes.Structure):
+    _fields_ = [("format", ctypes.c_int), ("rate", ctypes.c_uint32), ("channels", ctypes.c_uint8)]
+
+
+class _BufferAttr(ctypes.Structure):
+    _fields_ = [(name, ctypes.c_uint32) for name in ("maxlength", "tlength", "prebuf", "minreq", "fragsize")]
+
+
+@lru_cache(maxsize=1)
+def _libpulse_simple():
+    path = ctypes.util.find_library("pulse-simple")
+    if path is None:
+        raise PulseCaptureError("Библиотека libpulse-simple не найдена (пакет libpulse0).")
+    lib = ctypes.CDLL(path)
+
+    lib.pa_simple_new.restype = ctypes.c_void_p
+    lib.pa_simple_new.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_char_p,
+                                  ctypes.POINTER(_SampleSpec), ctypes.c_void_p, ctypes.POINTER(_BufferAttr),
+                                  ctypes.POINTER(ctypes.c_int)]
+    lib.pa_simple_read.restype = ctypes.c_int
+    lib.pa_simple_read.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t, ctypes.POINTER(ctypes.c_int)]
+    lib.pa_simple_get_latency.restype = ctypes.c_uint64
+    lib.pa_simple_get_latency.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_int)]
+    lib.pa_simple_free.restype = None
+    lib.pa_simple_free.argtypes = [ctypes.c_void_p]
+    lib.pa_strerror.restype = ctypes.c_char_p # Из libpulse, видна через зависимости libpulse-simple
+    lib.pa_strerror.argtypes = [ctypes.c_int]
+    return lib
+
+
+class PulseSimpleCapture:
+    """
+    Захват монитора PulseAudio внутри процесса бота через libpulse-simple (ctypes) вместо parec.
+
+    Объект ведет себя как поток для BlockCaptureReader: readinto пишет PCM s16le моно
+    прямо в буфер читателя. Серверный буфер ограничен buffer_ms; если бот не успевает
+    забирать данные, сервер их выбрасывает — такие моменты видны по задержке потока
+    и считаются в overruns. Используется из одного потока захвата.
+    """
+
+    def __init__(self, device: str, sample_rate: int, fragment_bytes: int, buffer_ms: int, stream_name: str):
+        self._lib = _libpulse_simple()
+        self.device = device
+        self.sample_rate = sample_rate
+        self.max_latency_us = buffer_ms * 1000
+
+        spec = _SampleSpec(PA_SAMPLE_S16LE, sample_rate, 1)
+        attr = _BufferAttr(
+            maxlength=int(sample_rate * 2 * buffer_ms / 1000),
+            tlength=PA_UINT32_MAX,
+            prebuf=PA_UINT32_MAX,
+            minreq=PA_UINT32_MAX,
+            fragsize=fragment_bytes, # Сервер отдает данные порциями размером с блок захвата
+        )
+        error = ctypes.c_int(0)
+        self._handle = self._lib.pa_simple_new(None, b"MaryRose", PA_STREAM_RECORD, device.encode(), stream_name.encode(),
+                                               ctypes.byref(spec), None, ctypes.byref(attr), ctypes.byref(error))
+        if not self._handle:
+            raise PulseCaptureError(f"Не удалось открыть '{device}': {self._strerror(error)}")
+
+        self.overruns = 0
+        self.latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self._in_overrun = False
+
+    def _strerror(self, error: ctypes.c_int) -> str:
+        message = self._lib.pa_strerror(error.value)
+        return message.decode(errors="ignore") if message else f"код {error.value}"
+
+    def readinto(self, buffer) -> int:
+        if not self._handle:
+            return 0
+        size = len(buffer)
+        target = (ctypes.c_char * size).from_buffer(buffer)
+        error = ctypes.c_int(0)
+        if self._lib.pa_simple_read(self._handle, target, size, ctypes.byref(error)) < 0:
+            raise PulseCaptureError(f"Ошибка чтения из '{self.device}': {self._strerror(error)}")
+        self._check_latency()
+        return size
+
+    # Переполнение считаем один раз на каждый выход задержки за порог
+    def _check_latency(self):
+        error = ctypes.c_int(0)
+        latency_us = self._lib.pa_simple_get_latency(self._handle, ctypes.byref(error))
+        if latency_us == 2 ** 64 - 1:
+            return
+        self.latency_ms = latency_us / 1000
+        self.max_latency_ms = max(self.max_latency_ms, self.latency_ms)
+        overrun = latency_us >= self.max_latency_us * OVERRUN_LATENCY_SHARE
+        if overrun and not self._in_overrun:
+            self.overruns += 1
+            logger.warning(f"Переполнение буфера PulseAudio на '{self.device}': задержка {self.latency_ms:.0f} мс, "
+                           f"часть аудио потеряна (всего {self.overruns}).")
+        self._in_overrun = overrun
+
+    def stats(self) -> dict:
+        return {
+            "backend": "pulse",
+            "overruns": self.overruns,
+            "latency_ms": round(self.latency_ms, 1),
+            "max_latency_ms": round(self.max_latency_ms, 1),
+        }
+
+    def close(self):
+        if self._handle:
+            self._lib.pa_simple_free(self._handle)
+            self._handle = None
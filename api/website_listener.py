@@ -2,7 +2,6 @@ import os
 import threading
 import logging
 import asyncio
-import subprocess
 from datetime import datetime
 from uuid import uuid4
 
@@ -10,9 +9,10 @@ import numpy as np
 import soundfile as sf
 import requests
 
-from config.config import STREAM_SAMPLE_RATE, MEET_AUDIO_CHUNKS_DIR, MEET_FRAME_DURATION_MS
-from handlers.llm_handler import get_summary_response, get_title_response
-from config.load_models import asr_model
+from config.config import STREAM_SAMPLE_RATE, MEET_AUDIO_CHUNKS_DIR, OFFLINE_VAD_SEGMENTATION
+from handlers.llm_handler import get_summary_and_title
+from handlers.offline_transcriber import transcribe_file_by_regions, transcribe_media_pipelined
+from utils.asr_client import transcribe_file
 from utils.backend_request import send_results_to_backend
 
 logger = logging.getLogger(__name__)
@@ -26,8 +26,6 @@ class WebsiteListenerBot:
         self.is_running = threading.Event()
         self.is_running.set()
 
-        self.asr_model = asr_model  # Whisper
-
         self.output_dir = MEET_AUDIO_CHUNKS_DIR / self.session_id
         os.makedirs(self.output_dir, exist_ok=True)
 
@@ -61,44 +59,42 @@ class WebsiteListenerBot:
         logger.info(f"[{self.meeting_id}] Запускаю постобработку...")
 
         try:
-            # Запускаем ASR на полном файле
-            segments, _ = self.asr_model.transcribe(
+            # Режем запись по VAD и транскрибируем участки речи параллельно; без сегментации — весь файл одним проходом
+            transcribe = transcribe_file_by_regions if OFFLINE_VAD_SEGMENTATION else transcribe_file
+            segments = transcribe(
                 str(self.full_audio_path),
                 beam_size=3, best_of=3,
-                condition_on_previous_text=False,
-                vad_filter=False,
                 language="ru"
             )
-
-            full_text = "\n".join(
-                f"[{self.format_time_hms(seg.start)} - {self.format_time_hms(seg.end)}] {seg.text.strip()}"
-                for seg in segments
-            )
-
-            import re
-            cleaned_dialogue = re.sub(r"\[\d{2}:\d{2}:\d{2}\s*-\s*\d{2}:\d{2}:\d{2}\]\s*", "", full_text)
-
-            # Суммаризация
-            logger.info(f"[{self.meeting_id}] Создание summary...")
-            summary_text = get_summary_response(cleaned_dialogue)
-
-            # Заголовок
-            logger.info(f"[{self.meeting_id}] Создание title...")
-            title_text = get_title_response(cleaned_dialogue)
-
-            # Отправляем результат, используя централизованную функцию
-            send_results_to_backend(
-                meeting_id=self.meeting_id,
-                full_text=full_text,
-                summary=summary_text or "",  # Гарантируем, что отправляется строка
-                title=title_text or ""      # Гарантируем, что отправляется строка
-            )
+            self._summarize_and_send(segments)
 
         except Exception as e:
             logger.error(f"[{self.meeting_id}] ❌ Ошибка постобработки: {e}", exc_info=True)
         finally:
             logger.info(f"[{self.meeting_id}] Постобработка завершена.")
 
+    # Summary + title по готовой транскрипции и отправка на бэкенд
+    def _summarize_and_send(self, segments):
+        full_text = "\n".join(
+            f"[{self.format_time_hms(seg.start)} - {self.format_time_hms(seg.end)}] {seg.text.strip()}"
+            for seg in segments
+        )
+
+        import re
+        cleaned_dialogue = re.sub(r"\[\d{2}:\d{2}:\d{2}\s*-\s*\d{2}:\d{2}:\d{2}\]\s*", "", full_text)
+
+        # Summary и title одновременно; метки времени нужны для нарезки длинной встречи
+        logger.info(f"[{self.meeting_id}] Создание summary и title...")
+        summary_text, title_text = get_summary_and_title(full_text, cleaned_dialogue)
+
+        # Отправляем результат, используя централизованную функцию
+        send_results_to_backend(
+            meeting_id=self.meeting_id,
+            full_text=full_text,
+            summary=summary_text or "",  # Гарантируем, что отправляется строка
+            title=title_text or ""      # Гарантируем, что отправляется строка
+        )
+
     def format_time_hms(self, seconds: float) -> str:
         """Перевод секунд в формат HH:MM:SS"""
         h = int(seconds // 3600)
@@ -124,59 +120,36 @@ class WebsiteListenerBot:
 
         logger.info(f"[{self.session_id}] Сессия завершена, постобработка запущена.")
 
-    # Новый метод для обработки готового аудио файла
+    # Обработка готового аудио файла (загрузка с сайта)
     def process_audio_file(self, input_file_path: str):
-        """Обрабатывает готовый аудио файл (.webm) используя ту же логику что и вебсокет."""
+        """
+        Обрабатывает готовый аудио файл (.webm) конвейером: ffmpeg декодирует его крупными
+        блоками, VAD выделяет участки речи по мере декодирования, и они сразу уходят в ASR.
+        Промежуточный WAV не пишется.
+        """
         threading.current_thread().name = f'AudioProcessor-{self.meeting_id}'
         logger.info(f"[{self.meeting_id}] Запускаю обработку файла: {input_file_path}")
 
-        VAD_FRAME_SIZE = int(STREAM_SAMPLE_RATE * (MEET_FRAME_DURATION_MS / 1000) * 2)
-
+        # Файл записи из вебсокета здесь не нужен
+        self.is_running.clear()
         try:
+            self.audio_file.close()
+            os.remove(self.full_audio_path)
+        except Exception as e:
+            logger.warning(f"[{self.meeting_id}] Не удалось удалить пустой файл записи: {e}")
 
-            ffmpeg_command = [
-                "ffmpeg", "-i", input_file_path,
-                "-loglevel", "error",
-                "-f", "s16le",
-                "-ar", str(STREAM_SAMPLE_RATE), "-ac", "1", "-"
-            ]
-
-            logger.info(f"[{self.meeting_id}] Запуск FFmpeg: {' '.join(ffmpeg_command)}")
-
-            ffmpeg_process = subprocess.Popen(
-                ffmpeg_command,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-
-            try:
-                while True:
-                    pcm_chunk = ffmpeg_process.stdout.read(VAD_FRAME_SIZE)
-                    if not pcm_chunk:
-                        break
-
-                    if len(pcm_chunk) < VAD_FRAME_SIZE:
-                        pcm_chunk += b'\x00' * (VAD_FRAME_SIZE - len(pcm_chunk))
-
-                    self.feed_audio_chunk(pcm_chunk)
-
-                logger.info(f"[{self.meeting_id}] Конвертация завершена, начинаем постобработку")
-
-                # Останавливаем бота для запуска постобработки
-                self.stop()
-
-                # Очищаем входной файл
-                try:
-                    os.remove(input_file_path)
-                    logger.info(f"[{self.meeting_id}] Удален входной файл: {input_file_path}")
-                except Exception as e:
-                    logger.warning(f"[{self.meeting_id}] Не удалось удалить входной файл: {e}")
-
-            finally:
-                # Останавливаем FFmpeg процесс
-                ffmpeg_process.terminate()
-                ffmpeg_process.wait()
+        try:
+            segments = transcribe_media_pipelined(input_file_path, beam_size=3, best_of=3, language="ru")
+            logger.info(f"[{self.meeting_id}] Транскрибация завершена, создаю summary")
+            self._summarize_and_send(segments)
 
         except Exception as e:
             logger.error(f"[{self.meeting_id}] ❌ Ошибка обработки файла: {e}", exc_info=True)
+        finally:
+            # Очищаем входной файл
+            try:
+                os.remove(input_file_path)
+                logger.info(f"[{self.meeting_id}] Удален входной файл: {input_file_path}")
+            except Exception as e:
+                logger.warning(f"[{self.meeting_id}] Не удалось удалить входной файл: {e}")
+            logger.info(f"[{self.meeting_id}] Обработка файла завершена.")
@@ -5,6 +5,7 @@ import signal
 import time
 from api.meet_listener import MeetListenerBot
 from config.logging import setup_logging
+from utils.cpu_budget import apply_process_budget
 
 # Настраиваем логирование
 setup_logging()
@@ -44,6 +45,7 @@ def main():
     signal.signal(signal.SIGINT, handle_shutdown_signal)
     
     logger.info(f"Инициализация бота для meeting_id: {args.meeting_id}")
+    apply_process_budget()
 
     try:
         # Создаем экземпляр бота и сохраняем его в глобальную переменную
@@ -0,0 +1,97 @@
+import os
+import logging
+from dataclasses import dataclass, asdict, replace
+
+from config.config import ASR_PROFILE, ASR_DEVICE, ASR_COMPUTE_TYPE, ASR_CPU_THREADS, ASR_NUM_WORKERS
+from utils.gpu_monitor import get_gpu_utilization
+
+logger = logging.getLogger(__name__)
+
+SMALL_GPU_MEMORY_MB = 8192 # На картах меньше 8 ГБ держим веса в int8
+
+
+@dataclass(frozen=True)
+class ASRProfile:
+    """Параметры запуска WhisperModel для конкретного типа машины."""
+    name: str
+    device: str
+    compute_type: str
+    cpu_threads: int
+    num_workers: int
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def available_cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def build_profiles() -> dict[str, ASRProfile]:
+    cpus = available_cpu_count()
+    return {
+        "gpu_fp16": ASRProfile("gpu_fp16", device="cuda", compute_type="float16", cpu_threads=4, num_workers=1),
+        "gpu_int8": ASRProfile("gpu_int8", device="cuda", compute_type="int8_float16", cpu_threads=4, num_workers=1),
+        # На CPU потоки CTranslate2 делим между воркерами, чтобы параллельные запросы не толкались за ядра
+        "cpu_int8": ASRProfile("cpu_int8", device="cpu", compute_type="int8", cpu_threads=max(1, cpus // 2), num_workers=2 if cpus >= 8 else 1),
+        "cpu_fp32": ASRProfile("cpu_fp32", device="cpu", compute_type="float32", cpu_threads=max(1, cpus // 2), num_workers=2 if cpus >= 8 else 1),
+    }
+
+
+def _supported_compute_types(device: str) -> set[str]:
+    import ctranslate2
+    try:
+        return set(ctranslate2.get_supported_compute_types(device))
+    except Exception:
+        return set()
+
+
+# Автоматический выбор профиля по железу
+def _auto_profile(profiles: dict[str, ASRProfile]) -> ASRProfile:
+    import ctranslate2
+
+    if ctranslate2.get_cuda_device_count() > 0:
+        supported = _supported_compute_types("cuda")
+        gpu = get_gpu_utilization()
+        small_gpu = gpu is not None and gpu["memory_total_mb"] < SMALL_GPU_MEMORY_MB
+        if "float16" in supported and not small_gpu:
+            return profiles["gpu_fp16"]
+        if "int8_float16" in supported:
+            return profiles["gpu_int8"]
+        return profiles["gpu_fp16"]
+
+    if "int8" in _supported_compute_types("cpu"):
+        return profiles["cpu_int8"]
+    return profiles["cpu_fp32"]
+
+
+def select_asr_profile() -> ASRProfile:
+    """
+    Возвращает профиль Whisper: ASR_PROFILE=auto выбирает по железу, иначе берется
+    профиль по имени. Отдельные поля можно переопределить через ASR_DEVICE,
+    ASR_COMPUTE_TYPE, ASR_CPU_THREADS и ASR_NUM_WORKERS.
+    """
+    profiles = build_profiles()
+    if ASR_PROFILE == "auto":
+        profile = _auto_profile(profiles)
+    elif ASR_PROFILE in profiles:
+        profile = profiles[ASR_PROFILE]
+    else:
+        logger.warning(f"Неизвестный ASR_PROFILE '{ASR_PROFILE}', выбираю автоматически.")
+        profile = _auto_profile(profiles)
+
+    overrides = {
+        "device": ASR_DEVICE,
+        "compute_type": ASR_COMPUTE_TYPE,
+        "cpu_threads": ASR_CPU_THREADS,
+        "num_workers": ASR_NUM_WORKERS,
+    }
+    overrides = {key: value for key, value in overrides.items() if value is not None}
+    if overrides:
+        profile = replace(profile, name=f"{profile.name}+override", **overrides)
+
+    logger.info(f"Профиль ASR: {profile}")
+    return profile
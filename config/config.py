@@ -2,7 +2,6 @@ import os
 from pathlib import Path
 from openai import OpenAI
 from huggingface_hub import login, snapshot_download
-import torch
 import logging
 from dotenv import load_dotenv
 
@@ -31,30 +30,124 @@ def ensure_dirs_exist():
     for path in [USER_DATA_DIR, MEETINGS_DIR, CHROME_PROFILE_DIR, MEET_AUDIO_CHUNKS_DIR]:
         path.mkdir(parents=True, exist_ok=True)
 
-device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 hf_token = os.getenv("HUGGING_FACE_HUB_TOKEN")
 
 # Клиент от OpenAI моделей
+LLM_API_KEY = os.getenv("PROXY_API")
+LLM_BASE_URL = os.getenv("BASE_OPENAI_URL")
 CLIENT = OpenAI(
-    api_key=os.getenv("PROXY_API"),
-    base_url=os.getenv("BASE_OPENAI_URL"),
+    api_key=LLM_API_KEY,
+    base_url=LLM_BASE_URL,
 )
 
+# Асинхронный клиент (utils/llm_client.py): общий пул соединений процесса и ограничение параллельных запросов
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "120")) # Тайм-аут одного запроса к LLM
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3")) # Повторы при сетевых ошибках, 429 и 5xx
+LLM_RETRY_BASE_S = 1.0 # Базовая задержка повтора, растет вдвое с разбросом ±50%
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8")) # Одновременных запросов к LLM на процесс
+LLM_MAX_CONNECTIONS = 16 # Размер пула HTTP-соединений к прокси
+LLM_STREAM_MIN_CHUNK_CHARS = 40 # Ответ в чат уходит предложениями; более короткие склеиваются со следующими
+
 if hf_token:
     login(token=hf_token)
     print("Успешный вход в Hugging Face.")
 else:
     print(f"Токен Hugging Face не найден в переменных окружения. {hf_token}")
 
-ASR_MODEL_NAME = "deepdml/faster-whisper-large-v3-turbo-ct2" # Модель Whisper 
+ASR_MODEL_NAME = "deepdml/faster-whisper-large-v3-turbo-ct2" # Модель Whisper
+ASR_PRELOAD_ON_STARTUP = os.getenv("ASR_PRELOAD_ON_STARTUP", "1") == "1" # Загружать и прогревать Whisper при старте сервера, а не при первом запросе
+
+# --- Профиль запуска Whisper (см. config/asr_profile.py) ---
+ASR_PROFILE = os.getenv("ASR_PROFILE", "auto") # auto | gpu_fp16 | gpu_int8 | cpu_int8 | cpu_fp32
+ASR_DEVICE = os.getenv("ASR_DEVICE") # Переопределения отдельных полей профиля (не заданы — берутся из профиля)
+ASR_COMPUTE_TYPE = os.getenv("ASR_COMPUTE_TYPE")
+ASR_CPU_THREADS = int(os.getenv("ASR_CPU_THREADS")) if os.getenv("ASR_CPU_THREADS") else None
+ASR_NUM_WORKERS = int(os.getenv("ASR_NUM_WORKERS")) if os.getenv("ASR_NUM_WORKERS") else None
+
+# --- Общий ASR-сервис (модель загружена один раз в процессе FastAPI-сервера) ---
+ASR_SERVICE_URL = os.getenv("ASR_SERVICE_URL", "http://127.0.0.1:8001") # Адрес сервера, который держит Whisper
+ASR_SERVICE_TIMEOUT_S = float(os.getenv("ASR_SERVICE_TIMEOUT_S", "60")) # Тайм-аут запроса на транскрибацию фрагмента
+
+# --- Динамический батчинг фрагментов речи между встречами ---
+ASR_BATCH_MAX_SIZE = int(os.getenv("ASR_BATCH_MAX_SIZE", "8")) # Максимум фрагментов в одном батче
+ASR_BATCH_MAX_WAIT_MS = float(os.getenv("ASR_BATCH_MAX_WAIT_MS", "20")) # Сколько ждать попутчиков для первого фрагмента
+ASR_BATCH_MAX_AUDIO_S = 30.0 # Фрагменты длиннее одного окна Whisper идут мимо батчей
+ASR_BATCH_BACKGROUND_WAIT_MS = float(os.getenv("ASR_BATCH_BACKGROUND_WAIT_MS", "200")) # Для речи без обращения к ассистенту можно ждать дольше
+ASR_QUEUE_MAX_SIZE = int(os.getenv("ASR_QUEUE_MAX_SIZE", "64")) # Больше запросов в очереди — сразу отказ 429 с Retry-After
+
+# --- Кэш транскрибаций голосовых из Telegram ---
+TG_TRANSCRIPTION_CACHE_SIZE = int(os.getenv("TG_TRANSCRIPTION_CACHE_SIZE", "512")) # Записей в памяти
+TG_TRANSCRIPTION_CACHE_DIR = Path(os.getenv("TG_TRANSCRIPTION_CACHE_DIR", BASE_DIR / "transcription_cache")) # Дисковый уровень кэша
+TG_TRANSCRIPTION_CACHE_DISK_MB = int(os.getenv("TG_TRANSCRIPTION_CACHE_DISK_MB", "0")) # 0 — дисковый уровень выключен
 
 STREAM_SAMPLE_RATE = 16000 # Частота для аудиочанков
 MEET_FRAME_DURATION_MS = 30 # Размер чанка
+MEET_CAPTURE_BLOCK_FRAMES = int(os.getenv("MEET_CAPTURE_BLOCK_FRAMES", "4")) # Кадров в одном чтении из источника захвата (4 × 30 мс = 120 мс)
+MEET_CAPTURE_BACKEND = os.getenv("MEET_CAPTURE_BACKEND", "pulse") # pulse — libpulse-simple в процессе бота (parec как запасной), parec — только подпроцесс
+MEET_PULSE_BUFFER_MS = int(os.getenv("MEET_PULSE_BUFFER_MS", "2000")) # Серверный буфер записи PulseAudio; при переполнении сервер теряет данные
 MEET_PAUSE_THRESHOLD_S = 1  # Пауза в секундах перед завершением записи
 SILENCE_THRESHOLD_FRAMES = 16 # Для определения пауз в речи
+AUDIO_QUEUE_MAX_S = float(os.getenv("AUDIO_QUEUE_MAX_S", "10")) # Сколько секунд аудио держит очередь между захватом и VAD
+AUDIO_QUEUE_POLICY = os.getenv("AUDIO_QUEUE_POLICY", "drop_oldest_silence") # block | drop_oldest_silence | shed_to_disk
+AUDIO_QUEUE_SILENCE_RMS = 300 # RMS кадра (int16), ниже которого кадр считается тишиной
+AUDIO_QUEUE_METRICS_INTERVAL_S = 5 # Как часто бот пишет метрики очереди для /status
+AUDIO_QUEUE_LAG_WARN_S = 3.0 # Отставание VAD от захвата, после которого пишем предупреждение
+PIPELINE_ASR_QUEUE_MAX = 16 # Реплик и частичных гипотез в очереди стадии ASR
+PIPELINE_ACTION_QUEUE_MAX = 8 # Команд ассистенту в очереди стадии действий
+STREAM_SPEECH_BUFFER_S = 300 # Емкость буфера одной реплики (int16, ~9.6 МБ); при переполнении теряется начало
+STREAM_MAX_UTTERANCE_S = float(os.getenv("STREAM_MAX_UTTERANCE_S", "30")) # Речь без пауз длиннее этого режется на части
+STREAM_CUT_LOOKBACK_S = 3.0 # В каких последних секундах части искать самое тихое место для разреза
+STREAM_CUT_OVERLAP_S = 0.5 # Сколько аудио до разреза повторяется в начале следующей части (повтор слов убирается)
 
 STREAM_TRIGGER_WORD = "мэри" # Триггер для работы Мэри
 
+# --- Бюджет CPU для процессов ботов ---
+BOT_CPU_RESERVED = int(os.getenv("BOT_CPU_RESERVED")) if os.getenv("BOT_CPU_RESERVED") else None # Ядра под сервер (ASR); по умолчанию четверть машины
+BOT_CPU_MAX_PER_BOT = int(os.getenv("BOT_CPU_MAX_PER_BOT", "4")) # Больше ядер одному боту не даем, даже если машина пустая
+
+# --- Общий VAD для всех встреч (батчевый прогон Silero в процессе сервера) ---
+VAD_BACKEND = os.getenv("VAD_BACKEND", "onnx") # onnx — ONNX Runtime без torch, torch — TorchScript из torch.hub
+VAD_ONNX_MODEL_PATH = os.getenv("VAD_ONNX_MODEL_PATH") # По умолчанию — silero_vad.onnx из пакета silero-vad
+VAD_SERVICE_ENABLED = os.getenv("VAD_SERVICE_ENABLED", "1") == "1" # Без сервиса каждый бот держит свою модель
+VAD_SOCKET_PATH = os.getenv("VAD_SOCKET_PATH", "/tmp/maryrose_vad.sock") # Unix-сокет сервиса VAD
+VAD_BATCH_MAX_SIZE = int(os.getenv("VAD_BATCH_MAX_SIZE", "64")) # Максимум окон от разных встреч в одном прогоне
+VAD_BATCH_MAX_WAIT_MS = float(os.getenv("VAD_BATCH_MAX_WAIT_MS", "4")) # Сколько ждать окна остальных встреч
+VAD_GATE_ENABLED = os.getenv("VAD_GATE_ENABLED", "1") == "1" # Пре-гейт по энергии: заведомо тихие окна не идут в Silero
+VAD_GATE_SILENCE_RMS = 50 # RMS окна (int16), ниже которого окно — тишина без проверки VAD
+VAD_GATE_NOISE_RMS = 150 # Тихое окно с частыми переходами через ноль тоже считаем тишиной (шум без голоса)
+VAD_GATE_NOISE_ZCR = 0.35 # Доля переходов через ноль для такого шума
+VAD_GATE_HANGOVER_WINDOWS = 16 # Сколько окон (~0.5 с) после громкого окна VAD работает без гейта
+
+# --- Частичные гипотезы для длинных реплик ---
+STREAM_PARTIALS_ENABLED = os.getenv("STREAM_PARTIALS_ENABLED", "1") == "1" # Инкрементальная транскрибация во время речи
+STREAM_PARTIAL_INTERVAL_S = float(os.getenv("STREAM_PARTIAL_INTERVAL_S", "2.5")) # Как часто пересчитывать гипотезу
+STREAM_PARTIAL_MAX_WINDOW_S = float(os.getenv("STREAM_PARTIAL_MAX_WINDOW_S", "10")) # Максимальная длина окна одного вызова ASR
+STREAM_PARTIAL_OVERLAP_S = 1.0 # Перекрытие окна с уже зафиксированным текстом
+
+# --- Детектор слова-триггера до полной транскрибации ---
+WAKE_WORD_ENABLED = os.getenv("WAKE_WORD_ENABLED", "1") == "1"
+WAKE_WORD_TEMPLATES_DIR = BASE_DIR / "wake_word" # Эталонные записи «мэри» (*.wav, 16 кГц, моно)
+WAKE_WORD_THRESHOLD = float(os.getenv("WAKE_WORD_THRESHOLD", "0.25")) # Порог DTW-расстояния (косинусного) для срабатывания
+WAKE_WORD_WINDOW_S = 1.0 # Сколько секунд от начала реплики проверяет детектор
+WAKE_WORD_MAX_TEMPLATES = 8 # Сколько эталонов набирать за встречу из подтвержденных обращений
+WAKE_WORD_ENROLL_CLIP_S = 3.0 # Начало короткого обращения, которое распознается со словами, чтобы вырезать эталон
+
+# --- Транскрибация загруженных записей по участкам речи ---
+OFFLINE_VAD_SEGMENTATION = os.getenv("OFFLINE_VAD_SEGMENTATION", "1") == "1" # Резать запись по VAD и транскрибировать участки параллельно
+OFFLINE_VAD_THRESHOLD = 0.5 # Вероятность речи для начала участка (конец — ниже порога на 0.15)
+OFFLINE_VAD_MIN_SILENCE_MS = 500 # Пауза, после которой участок речи считается законченным
+OFFLINE_VAD_SPEECH_PAD_MS = 200 # Запас по краям участка, чтобы не срезать начало и конец слов
+OFFLINE_MAX_REGION_S = 28.0 # Участки не длиннее окна Whisper, чтобы они попадали в батчи
+OFFLINE_ASR_PARALLELISM = int(os.getenv("OFFLINE_ASR_PARALLELISM", "8")) # Сколько участков одной записи одновременно в очереди ASR
+
+# --- Суммаризация длинных встреч (map-reduce) ---
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "8000")) # Бюджет одного фрагмента стенограммы; короче — резюме одним запросом
+SUMMARY_MAP_PARALLELISM = int(os.getenv("SUMMARY_MAP_PARALLELISM", "4")) # Сколько фрагментов суммаризируются одновременно
+SUMMARY_CHARS_PER_TOKEN = 3 # Грубая оценка длины русского текста в токенах
+SUMMARY_ROLLING_ENABLED = os.getenv("SUMMARY_ROLLING_ENABLED", "1") == "1" # Резюмировать длинную встречу по частям прямо во время нее
+SUMMARY_ROLLING_INTERVAL_S = float(os.getenv("SUMMARY_ROLLING_INTERVAL_S", "300")) # Как часто проверять, набралась ли новая часть
+SUMMARY_ROLLING_MIN_TOKENS = 1500 # Минимальный объем новой части диалога для шага скользящего резюме
+
 # Триггеры для завершения работы бота
 STREAM_STOP_WORD_1 = "стоп"
 STREAM_STOP_WORD_2 = "закончи встречу"
@@ -105,3 +198,29 @@ SUMMARY_PROMPT = '''
 Очень важно, чтобы задачи дл участников были вно указаны в разговоре (пример: Михаилу до завтра нужно разработать прототип приложения), иначе не записывай ничего в задачи.
 Оформление таблицы — в Markdown.
 '''
+
+SUMMARY_CHUNK_PROMPT = '''
+Перед тобой фрагмент стенограммы длинной встречи (номер фрагмента и время указаны в первой строке).
+Составь подробное резюме только этого фрагмента, оно будет объединено с резюме остальных фрагментов.
+
+## ВАЖНЫЕ ПРАВИЛА:
+1. ЯЗЫК ОТВЕТА: всегда и без исключений отвечай ТОЛЬКО на РУССКОМ языке.
+2. ТОЧНОСТЬ: основываться только на информации из фрагмента, ничего не выдумывать.
+
+Перечисли обсуждавшиеся темы и ключевые моменты по каждой.
+Отдельным списком выпиши все задачи, которые явно поручены участникам: участник, задача, срок (если указан).
+Если задач во фрагменте нет, так и напиши.
+'''
+
+SUMMARY_MERGE_PROMPT = '''
+Перед тобой резюме нескольких последовательных фрагментов длинной встречи.
+Объедини их в одно резюме этой части встречи: сгруппируй повторяющиеся темы, сохрани ключевые моменты
+и все задачи участников (участник, задача, срок) без потерь.
+Отвечай ТОЛЬКО на РУССКОМ языке и ничего не выдумывай.
+'''
+
+# Финальная свертка: на входе не стенограмма, а резюме фрагментов по порядку
+SUMMARY_REDUCE_PROMPT = '''
+Встреча была длинной, поэтому вместо стенограммы ниже приведены резюме ее последовательных фрагментов.
+Опирайся на них как на стенограмму: объедини темы, встречавшиеся в разных фрагментах, и собери все задачи в одну таблицу.
+''' + SUMMARY_PROMPT
@@ -1,4 +1,7 @@
 import os
+import threading
+import time
+import logging
 from pathlib import Path
 
 # Настройка путей для RunPod (модели сохраняются в персистентный /workspace)
@@ -8,7 +11,7 @@ os.environ['NEMO_CACHE_DIR'] = '/workspace/.cache/nemo'
 os.environ['HF_HOME'] = '/workspace/.cache/huggingface'
 os.environ['LOGS_DIR'] = '/workspace/logs'
 
-# Создаем необходимые директории в /workspace
+# Директории в /workspace, создаются при первой загрузке моделей
 workspace_dirs = [
     '/workspace/.cache/torch',
     '/workspace/.cache/nemo', 
@@ -16,27 +19,23 @@ workspace_dirs = [
     '/workspace/models',
     '/workspace/logs'
 ]
-for dir_path in workspace_dirs:
-    Path(dir_path).mkdir(parents=True, exist_ok=True)
-    print(f"Создана директория: {dir_path}")
 
-from faster_whisper import WhisperModel
+import numpy as np
 from huggingface_hub import snapshot_download
 from dotenv import load_dotenv
-import torch
 
-from config.config import ASR_MODEL_NAME, hf_token
+from config.config import ASR_MODEL_NAME, STREAM_SAMPLE_RATE, hf_token
+from config.load_vad_model import create_new_vad_model
+from config.asr_profile import ASRProfile, select_asr_profile
 
 load_dotenv() 
 
-# Создает и возвращает НОВЫЙ, ИЗОЛИРОВАННЫЙ экземпляр VAD-модели Silero. Использует кэш, чтобы не скачивать модель каждый раз.
-def create_new_vad_model():
-    print("Создание нового экземпляра VAD-модели из кэша...")
-    model, _ = torch.hub.load(repo_or_dir='snakers4/silero-vad',
-                              model='silero_vad',
-                              force_reload=False)
-    print("✅ Новый экземпляр VAD создан.")
-    return model
+logger = logging.getLogger(__name__)
+
+def ensure_workspace_dirs():
+    for dir_path in workspace_dirs:
+        Path(dir_path).mkdir(parents=True, exist_ok=True)
+
 
 # Функция проверки, загружены ли модели
 def check_model_exists(model_identifier, model_type="whisper"):
@@ -57,8 +56,8 @@ def check_model_exists(model_identifier, model_type="whisper"):
         return torch_cache.exists() and any(torch_cache.iterdir())
     return False
 
-# Проверка и загрузка Whisper
-def load_asr_model():
+# Поиск модели в локальном кэше, при отсутствии — скачивание
+def download_asr_model() -> str:
     print(f"Проверка локального кэша для ASR модели: {ASR_MODEL_NAME}")
     try:
         local_path = snapshot_download(
@@ -77,14 +76,104 @@ def load_asr_model():
             token=hf_token
         )
         print(f"ASR модель скачана в: {local_path}")
-    asr_model = WhisperModel(local_path, compute_type="float16")
-    print("ASR model loaded.")
-    return asr_model
+    return local_path
+
+# Создание WhisperModel по профилю (устройство, тип вычислений, потоки)
+def load_whisper(local_path: str, profile: ASRProfile):
+    from faster_whisper import WhisperModel
+
+    return WhisperModel(
+        local_path,
+        device=profile.device,
+        compute_type=profile.compute_type,
+        cpu_threads=profile.cpu_threads,
+        num_workers=profile.num_workers
+    )
+
+class ModelRegistry:
+    """
+    Ленивая загрузка моделей: импорт модуля ничего не загружает, Whisper
+    поднимается при первом обращении (или заранее через load_all при старте
+    сервера). Хранит состояние готовности и время каждой фазы запуска.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._asr_model = None
+        self.state = "not_loaded" # not_loaded -> loading -> warming_up -> ready | failed
+        self.error = None
+        self.timings: dict[str, float] = {}
+        self.profile: ASRProfile | None = None
+
+    def _timed(self, phase: str, func):
+        started = time.perf_counter()
+        try:
+            return func()
+        finally:
+            self.timings[phase] = round(time.perf_counter() - started, 3)
+            logger.info(f"Фаза загрузки '{phase}' заняла {self.timings[phase]} с")
+
+    def get_asr_model(self):
+        if self._asr_model is not None:
+            return self._asr_model
+        with self._lock:
+            if self._asr_model is None:
+                self.state = "loading"
+                try:
+                    self._timed("workspace", ensure_workspace_dirs)
+                    local_path = self._timed("download", download_asr_model)
+                    self.profile = select_asr_profile()
+                    self._asr_model = self._timed("load", lambda: load_whisper(local_path, self.profile))
+                except Exception as e:
+                    self.state = "failed"
+                    self.error = str(e)
+                    logger.error(f"Не удалось загрузить ASR модель: {e}", exc_info=True)
+                    raise
+                self.state = "loaded"
+                print("ASR model loaded.")
+        return self._asr_model
+
+    # Пробная транскрибация секунды шума: прогревает CUDA-ядра и аллокаторы до первого реального запроса
+    def warmup(self):
+        model = self.get_asr_model()
+        self.state = "warming_up"
+
+        def _run():
+            dummy_audio = np.random.default_rng(0).normal(0, 0.01, STREAM_SAMPLE_RATE).astype(np.float32)
+            segments, _ = model.transcribe(dummy_audio, beam_size=1, language="ru", vad_filter=False)
+            list(segments)
+
+        self._timed("warmup", _run)
+        self.state = "ready"
+
+    # Полная подготовка при старте сервера (вызывается в фоновом потоке)
+    def load_all(self):
+        started = time.perf_counter()
+        try:
+            self.warmup()
+            logger.info("=== Все модели загружены и прогреты ===")
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            logger.error(f"Ошибка подготовки моделей: {e}", exc_info=True)
+        finally:
+            self.timings["total"] = round(time.perf_counter() - started, 3)
+
+    # Модель можно использовать и без прогрева (ленивая загрузка), но не во время него
+    @property
+    def is_ready(self) -> bool:
+        return self.state in ("loaded", "ready")
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "error": self.error,
+            "profile": self.profile.as_dict() if self.profile else None,
+            "timings": dict(self.timings)
+        }
+
 
-# Загрузка моделей при импорте модуля
-print("=== Начинаем загрузку моделей в /workspace ===")
-asr_model = load_asr_model()
-print("=== Все модели успешно загружены ===")
+model_registry = ModelRegistry()
 
-# Экспортируем загруженные модели
-__all__ = ['llm_model', 'asr_model', 'create_new_vad_model']
\ No newline at end of file
+# Экспортируем реестр моделей
+__all__ = ['model_registry', 'create_new_vad_model']
\ No newline at end of file
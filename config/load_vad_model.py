@@ -0,0 +1,106 @@
+import importlib.util
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from config.config import STREAM_SAMPLE_RATE, VAD_BACKEND, VAD_ONNX_MODEL_PATH
+
+# Модули вынесены из config.load_models, чтобы процессы ботов не импортировали faster_whisper.
+# Обе обертки принимают и возвращают numpy: __call__ — одно окно из 512 семплов с внутренним состоянием,
+# forward — батч окон с явно переданным состоянием (для общего VAD нескольких встреч)
+
+VAD_CONTEXT_SAMPLES = 64 # Silero v5 приклеивает к окну хвост предыдущего
+VAD_STATE_SHAPE = (2, 1, 128)
+
+
+def initial_vad_state(batch_size: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    return (np.zeros((VAD_STATE_SHAPE[0], batch_size, VAD_STATE_SHAPE[2]), dtype=np.float32),
+            np.zeros((batch_size, VAD_CONTEXT_SAMPLES), dtype=np.float32))
+
+
+def _onnx_model_path() -> str:
+    if VAD_ONNX_MODEL_PATH:
+        return VAD_ONNX_MODEL_PATH
+    # find_spec не выполняет пакет: silero_vad/__init__ импортирует torch, а нам нужен только файл модели
+    package_dir = importlib.util.find_spec("silero_vad").submodule_search_locations[0]
+    return os.path.join(package_dir, "data", "silero_vad.onnx")
+
+
+# Одна сессия на процесс: состояние хранится снаружи, а session.run потокобезопасен
+@lru_cache(maxsize=1)
+def _onnx_session():
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = 1
+    options.inter_op_num_threads = 1
+    path = _onnx_model_path()
+    print(f"Загрузка VAD-модели ONNX: {path}")
+    return onnxruntime.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+class OnnxSileroVAD:
+    """Silero VAD на ONNX Runtime без torch: модель из пакета silero-vad, один поток на сессию."""
+
+    supports_batching = True
+
+    def __init__(self):
+        self.session = _onnx_session()
+        self._sr = np.array(STREAM_SAMPLE_RATE, dtype=np.int64)
+        self.reset_states()
+
+    def reset_states(self):
+        self._state, self._context = initial_vad_state()
+
+    def forward(self, audio: np.ndarray, state: np.ndarray, context: np.ndarray):
+        x = np.concatenate([context, audio], axis=1)
+        probs, new_state = self.session.run(None, {"input": x, "state": state, "sr": self._sr})
+        return probs.reshape(-1), new_state, x[:, -VAD_CONTEXT_SAMPLES:].copy()
+
+    def __call__(self, audio: np.ndarray) -> float:
+        probs, self._state, self._context = self.forward(audio[None, :], self._state, self._context)
+        return float(probs[0])
+
+
+class TorchSileroVAD:
+    """Silero VAD из torch.hub (TorchScript), как раньше."""
+
+    def __init__(self):
+        import torch
+
+        self._torch = torch
+        self.model, _ = torch.hub.load(repo_or_dir='snakers4/silero-vad',
+                                       model='silero_vad',
+                                       force_reload=False)
+        # Батчевый прогон возможен, только если у модели можно подменить состояние
+        self.supports_batching = all(hasattr(self.model, attr) for attr in ("_state", "_context", "_last_sr", "_last_batch_size"))
+
+    def reset_states(self):
+        self.model.reset_states()
+
+    def forward(self, audio: np.ndarray, state: np.ndarray, context: np.ndarray):
+        torch = self._torch
+        self.model._state = torch.from_numpy(state)
+        self.model._context = torch.from_numpy(context)
+        self.model._last_sr = STREAM_SAMPLE_RATE
+        self.model._last_batch_size = len(audio)
+        with torch.no_grad():
+            probs = self.model(torch.from_numpy(audio), STREAM_SAMPLE_RATE).numpy().reshape(-1)
+        return probs, self.model._state.numpy().copy(), self.model._context.numpy().copy()
+
+    def __call__(self, audio: np.ndarray) -> float:
+        with self._torch.no_grad():
+            return self.model(self._torch.from_numpy(audio), STREAM_SAMPLE_RATE).item()
+
+
+# Создает и возвращает НОВЫЙ, ИЗОЛИРОВАННЫЙ экземпляр VAD (свое состояние). Бэкенд задается VAD_BACKEND:
+# onnx — общая на процесс ONNX-сессия из файла пакета silero-vad, torch — модель из кэша torch.hub
+def create_new_vad_model(backend: str = VAD_BACKEND):
+    if backend == "onnx":
+        model = OnnxSileroVAD()
+    else:
+        print("Создание нового экземпляра VAD-модели из кэша...")
+        model = TorchSileroVAD()
+    print(f"✅ Новый экземпляр VAD создан ({backend}).")
+    return model
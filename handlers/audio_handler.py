@@ -3,26 +3,86 @@ import logging
 import time
 import queue
 import numpy as np 
-import torch
 import re
 import asyncio
+from dataclasses import dataclass, field
 
-from handlers.llm_handler import llm_response, get_summary_response, get_title_response
+from handlers.llm_handler import (llm_response_streamed, get_summary_and_title, update_rolling_summary_async,
+                                  finish_rolling_summary, estimate_tokens)
 from utils.kb_requests import save_info_in_kb, get_info_from_kb
-from config.config import (STREAM_SAMPLE_RATE, STREAM_TRIGGER_WORD, STREAM_STOP_WORD_1, STREAM_STOP_WORD_2, MEET_AUDIO_CHUNKS_DIR,
-                        STREAM_STOP_WORD_3, MEET_FRAME_DURATION_MS, SUMMARY_OUTPUT_DIR)
-from config.load_models import create_new_vad_model, asr_model
+from config.config import (STREAM_SAMPLE_RATE, STREAM_TRIGGER_WORD, MEET_AUDIO_CHUNKS_DIR,
+                        MEET_FRAME_DURATION_MS, SUMMARY_OUTPUT_DIR, STREAM_PARTIALS_ENABLED,
+                        STREAM_PARTIAL_INTERVAL_S, WAKE_WORD_ENABLED, STREAM_SPEECH_BUFFER_S, PIPELINE_ASR_QUEUE_MAX,
+                        PIPELINE_ACTION_QUEUE_MAX, MEET_CAPTURE_BLOCK_FRAMES, VAD_GATE_ENABLED,
+                        STREAM_MAX_UTTERANCE_S, STREAM_CUT_LOOKBACK_S, STREAM_CUT_OVERLAP_S, SUMMARY_ROLLING_ENABLED,
+                        SUMMARY_ROLLING_INTERVAL_S, SUMMARY_ROLLING_MIN_TOKENS, SUMMARY_CHUNK_TOKENS, WAKE_WORD_ENROLL_CLIP_S)
+from utils.asr_client import transcribe_pcm, TranscriptionWord
+from utils.audio_ring_buffer import AudioRingBuffer, int16_to_float32
+from utils.vad_client import create_vad
+from utils.energy_gate import EnergyGate
+from utils.endpointer import Endpointer, VAD_WINDOW_SAMPLES, SPEECH_START, SPEECH, PAUSE
+from handlers.streaming_transcriber import StreamingTranscriber, drop_overlapping_words, words_to_text
+from handlers.wake_word import WakeWordSpotter
+from handlers.intent_router import IntentRouter
 from utils.backend_request import send_results_to_backend
+from utils.llm_client import llm_client
 
 logger = logging.getLogger(__name__)
 
+CUT_FRAME_SAMPLES = 320 # Шаг поиска тихого места для разреза длинной реплики (20 мс)
+
+
+@dataclass
+class _Utterance:
+    audio: np.ndarray
+    start_s: float # Время от начала встречи
+    end_s: float
+    wake_word_spotted: bool | None
+    pipeline_start_time: float | None
+    head_overlap_s: float = 0.0 # Начало повторяет хвост предыдущей части длинной реплики
+    cut: bool = False # Реплика разрезана по STREAM_MAX_UTTERANCE_S, продолжение придет следующей частью
+    ended_at: float = field(default_factory=time.time) # Когда VAD закончил реплику (отсчет времени до ответа в чате)
+
+
+@dataclass
+class _PartialRequest:
+    audio: np.ndarray # Вся речь текущей реплики на момент запроса
+
+
+@dataclass
+class _TriggerCheck:
+    audio: np.ndarray # Начало реплики, на котором сработал детектор слова-триггера
+
+
+@dataclass
+class _Command:
+    transcription: str
+    acknowledged_early: bool
+    ended_at: float # Конец реплики с обращением
+
+
+@dataclass
+class _Acknowledgement:
+    text: str # Короткое подтверждение в чат, пока реплика с обращением еще звучит
+
+
+# Точка разреза: середина самого тихого 20 мс отрезка среди последних lookback семплов
+def lowest_energy_cut(audio: np.ndarray, lookback: int, frame: int = CUT_FRAME_SAMPLES) -> int:
+    start = max(0, len(audio) - lookback)
+    n_frames = (len(audio) - start) // frame
+    if not n_frames:
+        return len(audio)
+    frames = audio[start:start + n_frames * frame].reshape(n_frames, frame)
+    quietest = int(np.argmin(np.einsum("ij,ij->i", frames, frames)))
+    return start + quietest * frame + frame // 2
+
+
 class AudioHandler:
     def __init__(self, meeting_id, audio_queue, is_running, email, send_chat_message, stop):
         self.meeting_id = meeting_id
         self.audio_queue = audio_queue
         self.is_running = is_running
-        self.vad = create_new_vad_model()
-        self.asr_model = asr_model
+        self.vad = create_vad() # Общий батчевый VAD сервера или своя модель, если сервис недоступен
         self.email = email
         self.start_time = time.time()
 
@@ -35,6 +95,28 @@ class AudioHandler:
         self.send_chat_message = send_chat_message
         self.stop = stop
 
+        # Частичные гипотезы во время длинной речи (None — транскрибация только после паузы)
+        self.streaming_transcriber = StreamingTranscriber() if STREAM_PARTIALS_ENABLED else None
+        self._boundary_words: list[TranscriptionWord] = [] # Хвост разрезанной реплики для сверки со следующей частью
+        # Быстрая проверка начала реплики на слово-триггер до запроса к Whisper
+        self.wake_word_spotter = WakeWordSpotter() if WAKE_WORD_ENABLED else None
+        self._acknowledged_early = False # Стадия ASR уже подтвердила обращение текущей реплики в чате
+        self.intent_router = IntentRouter()
+        self.time_to_first_message: list[float] = [] # Секунды от конца обращения до первого сообщения ответа
+
+        # Скользящее резюме: резюме уже обработанных частей диалога и сколько элементов all_segments в них вошло
+        self.rolling_summaries: list[str] = []
+        self._summarized_segments = 0
+        self._rolling_lock = threading.Lock()
+        self._rolling_future = None # Идущий шаг скользящего резюме (Future клиента LLM)
+        self._rolling_checked_at = time.time()
+
+        # Стадии конвейера: захват -> VAD -> ASR -> действия, между ними ограниченные очереди
+        self.asr_queue = queue.Queue(maxsize=PIPELINE_ASR_QUEUE_MAX)
+        self.action_queue = queue.Queue(maxsize=PIPELINE_ACTION_QUEUE_MAX)
+        self.asr_thread = None
+        self.action_thread = None
+
     # Преобразование временных меток
     def format_time_hms(self, seconds: float) -> str:
         h = int(seconds // 3600)
@@ -42,25 +124,97 @@ class AudioHandler:
         s = int(seconds % 60)
         return f"{h:02d}:{m:02d}:{s:02d}"
 
-    # Обработка аудиопотока -- транскрибация -- ответ (если обнаружен триггер)
+    # Запуск стадий после VAD: транскрибация и действия по командам, каждая в своем потоке
+    def _start_stages(self):
+        self.asr_thread = threading.Thread(target=self._transcription_stage, name=f'ASRStage-{self.meeting_id}', daemon=True)
+        self.action_thread = threading.Thread(target=self._action_stage, name=f'ActionStage-{self.meeting_id}', daemon=True)
+        self.asr_thread.start()
+        self.action_thread.start()
+
+    # Ожидание, пока стадии разберут свои очереди (перед постобработкой)
+    def _wait_for_stages(self, timeout: float = 60):
+        deadline = time.time() + timeout
+        for thread in (self.asr_thread, self.action_thread):
+            if thread is not None:
+                thread.join(timeout=max(0.0, deadline - time.time()))
+
+    # Фоновое резюме во время встречи: как только диалог перестает помещаться в один запрос,
+    # не чаще раза в SUMMARY_ROLLING_INTERVAL_S новая часть суммаризируется и сворачивается с предыдущими.
+    # Проверка идет из стадии ASR после каждой реплики, сам шаг выполняется в цикле клиента LLM и не занимает поток
+    def _maybe_update_rolling_summary(self):
+        if not SUMMARY_ROLLING_ENABLED or time.time() - self._rolling_checked_at < SUMMARY_ROLLING_INTERVAL_S:
+            return
+        if self._rolling_future is not None and not self._rolling_future.done():
+            return
+        self._rolling_checked_at = time.time()
+
+        with self._rolling_lock:
+            segments_count = len(self.all_segments)
+            new_dialogue = "\n".join(self.all_segments[self._summarized_segments:segments_count])
+            if estimate_tokens(new_dialogue) < SUMMARY_ROLLING_MIN_TOKENS:
+                return
+            if not self.rolling_summaries and estimate_tokens("\n".join(self.all_segments[:segments_count])) <= SUMMARY_CHUNK_TOKENS:
+                return # Короткая встреча в конце суммаризируется одним запросом целиком
+            summaries = list(self.rolling_summaries)
+        self._rolling_future = llm_client.submit(self._rolling_summary_step(summaries, new_dialogue, segments_count))
+
+    async def _rolling_summary_step(self, summaries: list[str], new_dialogue: str, segments_count: int):
+        started = time.time()
+        try:
+            updated = await update_rolling_summary_async(summaries, new_dialogue)
+        except Exception as e:
+            logger.error(f"[{self.meeting_id}] Ошибка скользящего резюме: {e}", exc_info=True)
+            return
+        with self._rolling_lock:
+            self.rolling_summaries = updated
+            self._summarized_segments = segments_count
+        logger.info(f"[{self.meeting_id}] Скользящее резюме обновлено за {time.time() - started:.1f} с "
+                    f"({segments_count} реплик, частей резюме: {len(updated)})")
+
+    # Итоговые резюме и заголовок: после скользящего резюме остается только хвост диалога и свертка.
+    # Идущий шаг скользящего резюме сначала дожидаемся, чтобы не суммаризировать его часть дважды
+    def _summarize_meeting(self, full: str, cleaned_dialogue: str) -> tuple[str, str]:
+        if self._rolling_future is not None:
+            self._rolling_future.result()
+        with self._rolling_lock:
+            summaries = list(self.rolling_summaries)
+            tail_dialogue = "\n".join(self.all_segments[self._summarized_segments:])
+        if not summaries:
+            return get_summary_and_title(full, cleaned_dialogue)
+        return finish_rolling_summary(summaries, tail_dialogue, cleaned_dialogue)
+
+    # Стадия VAD: разбор аудиопотока на реплики. Здесь нет сетевых вызовов — только VAD и детектор триггера,
+    # поэтому стадия успевает за реальным временем, как бы долго ни работали ASR и LLM
     def _process_audio_stream(self):
         threading.current_thread().name = f'VADProcessor-{self.meeting_id}'
         logger.info(f"[{self.meeting_id}] VAD процессор запущен (Silero).")
-
-        vad_buffer = None
-        VAD_CHUNK_SIZE = 512
-        speech_buffer_for_asr = []
-        is_speaking = False
-        recent_probs = []                     # для сглаживания
-
-        # Настройки
-        vad_threshold = 0.1                   # вероятность речи
-        silence_duration_ms = 600             # сколько тишины нужно для конца речи
-        min_speech_duration = 0.5             # минимальная длина речи
+        self._start_stages()
+
+        VAD_CHUNK_SIZE = VAD_WINDOW_SAMPLES
+        # Кадры копятся в кольцевом буфере до окна VAD, окна речи — во втором буфере до конца реплики.
+        # Захват кладет в очередь блоки по MEET_CAPTURE_BLOCK_FRAMES кадров, буфер вмещает блок и остаток окна
+        block_samples = int(STREAM_SAMPLE_RATE * MEET_FRAME_DURATION_MS / 1000) * MEET_CAPTURE_BLOCK_FRAMES
+        vad_ring = AudioRingBuffer(max(VAD_CHUNK_SIZE * 8, block_samples + VAD_CHUNK_SIZE), max_pop=VAD_CHUNK_SIZE)
+        vad_input = np.zeros(VAD_CHUNK_SIZE, dtype=np.float32)
+        vad_gate = EnergyGate() if VAD_GATE_ENABLED else None # Тихие окна не отдаем в Silero
+        speech_ring = AudioRingBuffer(int(STREAM_SPEECH_BUFFER_S * STREAM_SAMPLE_RATE))
+        # Начало и конец реплик по вероятностям VAD (те же правила использует utils.vad_gate_compare)
+        endpointer = Endpointer()
         sr = STREAM_SAMPLE_RATE
 
-        silence_accum_ms = 0
         speech_start_walltime = None
+        partial_interval_samples = int(STREAM_PARTIAL_INTERVAL_S * sr)
+        samples_since_partial = 0
+
+        # Длинная речь без пауз режется в самом тихом месте, следующая часть начинается с перекрытия
+        max_utterance_samples = int(STREAM_MAX_UTTERANCE_S * sr)
+        cut_lookback_samples = int(STREAM_CUT_LOOKBACK_S * sr)
+        cut_overlap_samples = int(STREAM_CUT_OVERLAP_S * sr)
+        head_overlap_s = 0.0
+
+        # Результат детектора слова-триггера для текущей реплики (None — не проверяли или детектор не готов)
+        wake_word_checked = False
+        wake_word_spotted = None
 
         # Таймер для всего пайплайна обработки речи
         pipeline_start_time = None
@@ -71,117 +225,302 @@ class AudioHandler:
                 if not audio_frame_bytes:
                     continue
 
-                audio_np = np.frombuffer(audio_frame_bytes, dtype=np.int16).astype(np.float32) / 32768.0
-                new_audio_tensor = torch.from_numpy(audio_np)
-
-                if vad_buffer is None:
-                    vad_buffer = new_audio_tensor
-                else:
-                    vad_buffer = torch.cat([vad_buffer, new_audio_tensor])
-
-                while vad_buffer is not None and vad_buffer.shape[0] >= VAD_CHUNK_SIZE:
-                    chunk_to_process = vad_buffer[:VAD_CHUNK_SIZE]
-                    vad_buffer = vad_buffer[VAD_CHUNK_SIZE:]
-
-                    speech_prob = self.vad(chunk_to_process, sr).item()
+                vad_ring.write(np.frombuffer(audio_frame_bytes, dtype=np.int16))
 
-                    recent_probs.append(speech_prob)
-                    if len(recent_probs) > 3:
-                        recent_probs.pop(0)
-                    smooth_prob = sum(recent_probs) / len(recent_probs)
+                while len(vad_ring) >= VAD_CHUNK_SIZE:
+                    window = vad_ring.pop(VAD_CHUNK_SIZE)
+                    int16_to_float32(window, vad_input)
+                    if vad_gate is not None and vad_gate.should_skip(vad_input):
+                        speech_prob = 0.0
+                    else:
+                        speech_prob = self.vad(vad_input)
 
-                    now = time.time()
-                    meeting_elapsed_sec = now - self.start_time
+                    event = endpointer.update(speech_prob)
 
-                    if smooth_prob > vad_threshold:
-                        if not is_speaking:
+                    if event in (SPEECH_START, SPEECH):
+                        if event == SPEECH_START:
                             logger.info(f"[{self.meeting_id}] ▶️ Начало речи")
-                            is_speaking = True
-                            speech_start_walltime = meeting_elapsed_sec
+                            speech_start_walltime = time.time() - self.start_time
                             pipeline_start_time = time.time()  # Запуск таймера пайплайна
-
-                        speech_buffer_for_asr.append(chunk_to_process.numpy())
-                        silence_accum_ms = 0
-
-                    else:
-                        if is_speaking:
-                            silence_accum_ms += (VAD_CHUNK_SIZE / sr) * 1000
-                            if silence_accum_ms >= silence_duration_ms:
-
-                                if speech_buffer_for_asr:
-
-                                    full_audio_np = np.concatenate(speech_buffer_for_asr)
-                                    speech_buffer_for_asr.clear()
-
-                                    chunk_duration = len(full_audio_np) / 16000.0
-                                    if chunk_duration >= min_speech_duration:
-
-                                        speech_end_walltime = speech_start_walltime + chunk_duration
-
-                                        is_speaking = False
-                                        silence_accum_ms = 0
-
-                                        #self._save_chunk(full_audio_np)
-
-                                        segments, _ = self.asr_model.transcribe(full_audio_np, beam_size=1, best_of=1, condition_on_previous_text=False, vad_filter=False, language="ru")
-
-                                        dialog = "\n".join(
-                                            f"[{self.format_time_hms(speech_start_walltime)} - {self.format_time_hms(speech_end_walltime)}] {segment.text.strip()}"
-                                            for segment in segments
-                                        )
-                                        self.all_segments.append(dialog)
-                                        print(dialog)
-
-                                        # Чистый текст без таймингов
-                                        transcription = re.sub(r"\[\d{2}:\d{2}:\d{2}\s*-\s*\d{2}:\d{2}:\d{2}\]\s*", "", dialog)
-
-                                        self.global_offset += chunk_duration
-
-                                        if transcription.lower().lstrip().startswith(STREAM_TRIGGER_WORD):
-
-                                            clean_transcription = ''.join(char for char in transcription.lower() if char.isalnum() or char.isspace())
-
-                                            if STREAM_STOP_WORD_1 in clean_transcription or STREAM_STOP_WORD_2 in clean_transcription or STREAM_STOP_WORD_3 in clean_transcription:
-                                                logger.info(f"[{self.meeting_id}] Провожу постобработку и завершаю работу")
-                                                self.send_chat_message("Услышала Вас, завершаю работу!")
-                                                # self._speak_via_meet(response, pipeline_start_time)
-                                                self.stop()
-                                            else:
-                                                self.send_chat_message("Услышала Вас, действую...")
-                                                try:
-                                                    key, response = llm_response(transcription)
-                                                    logger.info(f"Ответ от LLM: {key, response}")
-                                                    if response:
-                                                        print("Отправляю ответ в чат...")
-                                                    if key == 0:
-                                                        asyncio.run(save_info_in_kb(response, self.email))
-                                                        self.send_chat_message("Ваша информация сохранена.")
-                                                    elif key == 1:
-                                                        info_from_kb = asyncio.run(get_info_from_kb(response, self.email))
-                                                        if info_from_kb == None:
-                                                            self.send_chat_message("Не нашла информации в вашей базе знаний.")
-                                                        else:
-                                                            self.send_chat_message(info_from_kb)
-                                                    elif key == 3:
-                                                        self.send_chat_message(response)
-
-                                                except Exception as chat_err:
-                                                    logger.error(f"[{self.meeting_id}] Ошибка при отправке ответа в чат: {chat_err}")
-
-                                        else:
-                                            pipeline_start_time = None
+                            samples_since_partial = 0
+                            wake_word_checked = False
+                            wake_word_spotted = None
+                            head_overlap_s = 0.0
+
+                        speech_ring.write(window)
+
+                        if len(speech_ring) >= max_utterance_samples:
+                            full_audio_np = speech_ring.to_float32()
+                            cut = lowest_energy_cut(full_audio_np, cut_lookback_samples)
+                            logger.info(f"[{self.meeting_id}] Речь без пауз дольше {STREAM_MAX_UTTERANCE_S:.0f} с, режу на {cut / sr:.1f} с")
+                            self._enqueue_utterance(_Utterance(
+                                audio=full_audio_np[:cut],
+                                start_s=speech_start_walltime,
+                                end_s=speech_start_walltime + cut / sr,
+                                wake_word_spotted=wake_word_spotted,
+                                pipeline_start_time=pipeline_start_time,
+                                head_overlap_s=head_overlap_s,
+                                cut=True
+                            ))
+                            # В буфере остается продолжение вместе с перекрытием перед разрезом
+                            overlap = min(cut, cut_overlap_samples)
+                            speech_ring.discard(cut - overlap)
+                            speech_start_walltime += (cut - overlap) / sr
+                            self.global_offset += (cut - overlap) / sr
+                            head_overlap_s = overlap / sr
+                            pipeline_start_time = time.time()
+                            samples_since_partial = 0
+                            wake_word_checked = True # Обращение ищем только в начале реплики
+                            wake_word_spotted = None
+
+                        # Как только набралось окно детектора, проверяем обращение. Подтверждение в чат уходит,
+                        # только когда Whisper распознает слово-триггер в этом окне: ложное срабатывание
+                        # детектора не должно оставлять в чате «слушаю» без ответа
+                        if (self.wake_word_spotter is not None and not wake_word_checked
+                                and len(speech_ring) >= self.wake_word_spotter.window_samples):
+                            wake_word_checked = True
+                            head_audio = speech_ring.to_float32()
+                            wake_word_spotted = self.wake_word_spotter.spot(head_audio)
+                            if wake_word_spotted:
+                                logger.info(f"[{self.meeting_id}] Детектор услышал обращение, проверяю его распознаванием")
+                                try:
+                                    self.asr_queue.put_nowait(_TriggerCheck(head_audio[:self.wake_word_spotter.window_samples]))
+                                except queue.Full:
+                                    logger.warning(f"[{self.meeting_id}] Очередь стадии ASR заполнена, раннее подтверждение пропущено")
+
+                        # Частичная гипотеза по скользящему окну, не дожидаясь паузы. Если стадия ASR занята,
+                        # шаг пропускается: гипотеза необязательна, а финальный текст все равно будет
+                        if self.streaming_transcriber is not None:
+                            samples_since_partial += VAD_CHUNK_SIZE
+                            if samples_since_partial >= partial_interval_samples:
+                                samples_since_partial = 0
+                                try:
+                                    self.asr_queue.put_nowait(_PartialRequest(speech_ring.to_float32()))
+                                except queue.Full:
+                                    logger.debug(f"[{self.meeting_id}] Стадия ASR занята, частичная гипотеза пропущена")
+
+                    elif event == PAUSE and len(speech_ring):
+                        full_audio_np = speech_ring.to_float32()
+                        speech_ring.clear()
+
+                        chunk_duration = len(full_audio_np) / sr
+                        if endpointer.long_enough(chunk_duration):
+                            # Реплика короче окна детектора — проверяем ее целиком
+                            if self.wake_word_spotter is not None and not wake_word_checked:
+                                wake_word_spotted = self.wake_word_spotter.spot(full_audio_np)
+
+                            self._enqueue_utterance(_Utterance(
+                                audio=full_audio_np,
+                                start_s=speech_start_walltime,
+                                end_s=speech_start_walltime + chunk_duration,
+                                wake_word_spotted=wake_word_spotted,
+                                pipeline_start_time=pipeline_start_time,
+                                head_overlap_s=head_overlap_s
+                            ))
+                            self.global_offset += chunk_duration
+                            pipeline_start_time = None
             except queue.Empty:
-                if is_speaking and speech_buffer_for_asr:
+                if endpointer.is_speaking and len(speech_ring):
                     logger.info(f"[{self.meeting_id}] Тайм-аут, обрабатываем оставшуюся речь.")
-                    is_speaking = False
+                    endpointer.reset()
                 continue
             except Exception as e:
                 logger.error(f"[{self.meeting_id}] Ошибка в цикле VAD: {e}", exc_info=True)
 
+        if vad_gate is not None:
+            logger.info(f"[{self.meeting_id}] Пре-гейт VAD: {vad_gate.stats()}")
+
+    # Законченная реплика не теряется: при полной очереди VAD ждет, и задержка копится в audio_queue
+    def _enqueue_utterance(self, utterance: _Utterance):
+        try:
+            self.asr_queue.put_nowait(utterance)
+        except queue.Full:
+            logger.warning(f"[{self.meeting_id}] Очередь стадии ASR заполнена ({self.asr_queue.maxsize}), VAD ждет")
+            self.asr_queue.put(utterance)
+
+    # Стадия ASR: частичные гипотезы и финальный текст реплик, поиск обращения к ассистенту
+    def _transcription_stage(self):
+        while self.is_running.is_set() or not self.asr_queue.empty():
+            try:
+                item = self.asr_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                if isinstance(item, _PartialRequest):
+                    partial = self.streaming_transcriber.step(item.audio)
+                    logger.info(f"[{self.meeting_id}] … {partial}")
+                elif isinstance(item, _TriggerCheck):
+                    self._acknowledge_trigger(item.audio)
+                else:
+                    self._transcribe_utterance(item)
+                    self._maybe_update_rolling_summary()
+            except Exception as e:
+                logger.error(f"[{self.meeting_id}] Ошибка в стадии ASR: {e}", exc_info=True)
+
+    # Раннее подтверждение: окно детектора распознается вне очереди, и если в нем слово-триггер,
+    # чат получает «слушаю» еще до конца реплики. Чат пишет только стадия действий
+    def _acknowledge_trigger(self, head_audio: np.ndarray):
+        segments = transcribe_pcm(head_audio, beam_size=1, best_of=1, language="ru", priority="high")
+        text = " ".join(segment.text.strip() for segment in segments).strip()
+        if not text.lower().startswith(STREAM_TRIGGER_WORD):
+            logger.info(f"[{self.meeting_id}] Детектор ошибся («{text}»), подтверждение не отправляю")
+            return
+        try:
+            self.action_queue.put_nowait(_Acknowledgement("Услышала Вас, слушаю..."))
+            self._acknowledged_early = True
+        except queue.Full:
+            logger.warning(f"[{self.meeting_id}] Очередь стадии действий заполнена, раннее подтверждение пропущено")
+
+    def _transcribe_utterance(self, utterance: _Utterance):
+        # Обращение к ассистенту распознается вне очереди, обычная речь ждет полного батча
+        asr_priority = {True: "high", False: "background"}.get(utterance.wake_word_spotted, "normal")
+
+        split = utterance.cut or utterance.head_overlap_s > 0
+        if self.streaming_transcriber is not None:
+            if utterance.cut:
+                self.streaming_transcriber.truncate(len(utterance.audio) / STREAM_SAMPLE_RATE)
+            # Распознается только незафиксированный хвост реплики
+            texts = [self.streaming_transcriber.finalize(utterance.audio, priority=asr_priority)]
+            words = self.streaming_transcriber.final_words
+        elif split:
+            # Части длинной реплики распознаются со словами, чтобы убрать повтор на стыке
+            segments = transcribe_pcm(utterance.audio, beam_size=1, best_of=1, language="ru", word_timestamps=True,
+                                      priority=asr_priority)
+            words = [w for segment in segments for w in (segment.words or [])]
+            texts = [words_to_text(words)]
+        else:
+            segments = transcribe_pcm(utterance.audio, beam_size=1, best_of=1, language="ru", priority=asr_priority)
+            texts = [segment.text.strip() for segment in segments]
+            words = []
+
+        if utterance.head_overlap_s > 0 and words:
+            words = drop_overlapping_words(self._boundary_words, words)
+            texts = [words_to_text(words)]
+        self._boundary_words = words if utterance.cut else []
+
+        dialog = "\n".join(
+            f"[{self.format_time_hms(utterance.start_s)} - {self.format_time_hms(utterance.end_s)}] {text}"
+            for text in texts if text
+        )
+        self.all_segments.append(dialog)
+        print(dialog)
+
+        # Чистый текст без таймингов
+        transcription = re.sub(r"\[\d{2}:\d{2}:\d{2}\s*-\s*\d{2}:\d{2}:\d{2}\]\s*", "", dialog)
+
+        is_trigger = transcription.lower().lstrip().startswith(STREAM_TRIGGER_WORD)
+        if is_trigger:
+            self.action_queue.put(_Command(transcription, self._acknowledged_early, utterance.ended_at))
+        self._acknowledged_early = False
+
+        # После постановки команды: пополнение эталонов может потребовать еще один короткий вызов ASR
+        if self.wake_word_spotter is not None:
+            self._update_wake_word_spotter(utterance.wake_word_spotted, is_trigger, utterance.audio)
+
+    # Стадия действий: ответы LLM, база знаний и сообщения в чат (отправка может ждать браузер десятки секунд)
+    def _action_stage(self):
+        while self.is_running.is_set() or not self.action_queue.empty():
+            try:
+                command = self.action_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                if isinstance(command, _Acknowledgement):
+                    self.send_chat_message(command.text)
+                else:
+                    self._handle_command(command)
+            except Exception as e:
+                logger.error(f"[{self.meeting_id}] Ошибка в стадии действий: {e}", exc_info=True)
+
+    def _handle_command(self, command: _Command):
+        transcription = command.transcription
+        # Частые команды (стоп, приветствие, «запиши…», «найди…») разбираются локально, остальное решает LLM
+        intent = self.intent_router.route(transcription)
+
+        if intent is not None and intent.name == "stop":
+            logger.info(f"[{self.meeting_id}] Провожу постобработку и завершаю работу")
+            self.send_chat_message("Завершаю работу!" if command.acknowledged_early else "Услышала Вас, завершаю работу!")
+            # self._speak_via_meet(response, pipeline_start_time)
+            self.stop()
+            return
+
+        if not command.acknowledged_early:
+            self.send_chat_message("Услышала Вас, действую...")
+
+        answered = False
+
+        # Сообщение с ответом; для первого из них фиксируем время от конца реплики до появления ответа в чате
+        def answer(text: str):
+            nonlocal answered
+            self.send_chat_message(text)
+            if not answered:
+                answered = True
+                time_to_first_message = time.time() - command.ended_at
+                self.time_to_first_message.append(time_to_first_message)
+                logger.info(f"[{self.meeting_id}] Первое сообщение ответа в чате через {time_to_first_message:.2f} с после реплики")
+
+        try:
+            if intent is not None:
+                key, response = intent.key, intent.text
+                logger.info(f"[{self.meeting_id}] Команда разобрана без LLM ({intent.name}): {response}")
+            else:
+                # Ответ пользователю (key 3) уходит в чат по предложениям, пока модель генерирует продолжение
+                key, response = llm_response_streamed(transcription, on_reply=answer)
+                logger.info(f"Ответ от LLM: {key, response}")
+            if response:
+                print("Отправляю ответ в чат...")
+            if key == 0:
+                asyncio.run(save_info_in_kb(response, self.email))
+                answer("Ваша информация сохранена.")
+            elif key == 1:
+                info_from_kb = asyncio.run(get_info_from_kb(response, self.email))
+                if info_from_kb == None:
+                    answer("Не нашла информации в вашей базе знаний.")
+                else:
+                    answer(info_from_kb)
+            elif key == 3 and not answered and response:
+                answer(response)
+
+        except Exception as chat_err:
+            logger.error(f"[{self.meeting_id}] Ошибка при отправке ответа в чат: {chat_err}")
+
+    # Время до первого сообщения ответа в чате по всем обращениям встречи
+    def _time_to_first_message_stats(self) -> dict:
+        samples = sorted(self.time_to_first_message)
+        if not samples:
+            return {"count": 0}
+        return {
+            "count": len(samples),
+            "p50_s": round(samples[len(samples) // 2], 2),
+            "p95_s": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+            "max_s": round(samples[-1], 2),
+        }
+
+    # Статистика детектора и пополнение эталонов словом-триггером из подтвержденного обращения
+    def _update_wake_word_spotter(self, spotted, is_trigger: bool, audio_np: np.ndarray):
+        self.wake_word_spotter.record_outcome(spotted, is_trigger)
+        if not is_trigger or not self.wake_word_spotter.wants_template(spotted):
+            return
+
+        # Слова с таймингами есть только после промежуточных шагов; короткие обращения («Мэри, привет»)
+        # распознаем еще раз по началу реплики, чтобы узнать, где кончается слово-триггер
+        words = self.streaming_transcriber.final_words if self.streaming_transcriber is not None else []
+        if not words:
+            clip = audio_np[:int(WAKE_WORD_ENROLL_CLIP_S * STREAM_SAMPLE_RATE)]
+            segments = transcribe_pcm(clip, beam_size=1, best_of=1, language="ru", word_timestamps=True, priority="background")
+            words = [w for segment in segments for w in (segment.words or [])]
+        if words and words[0].word.lower().strip().startswith(STREAM_TRIGGER_WORD):
+            self.wake_word_spotter.enroll(audio_np[:int(words[0].end * STREAM_SAMPLE_RATE)])
+
     # Постобработка: объединение аудиочанков -- запуск диаризации и объединение с транскрибацией -- суммаризация -- генерация заголовка -- отправка результатов на внешний сервер
     def _perform_post_processing(self):
         threading.current_thread().name = f'PostProcessor-{self.meeting_id}'
         logger.info(f"[{self.meeting_id}] Начинаю постобработку...")
+        self._wait_for_stages() # Последние реплики еще могут транскрибироваться
+        if self.wake_word_spotter is not None:
+            logger.info(f"[{self.meeting_id}] Статистика детектора слова-триггера: {self.wake_word_spotter.counters}")
+        logger.info(f"[{self.meeting_id}] Разбор команд без LLM: {self.intent_router.stats()}")
+        logger.info(f"[{self.meeting_id}] Время до первого ответа в чате: {self._time_to_first_message_stats()}")
 
         try:
 
@@ -199,14 +538,11 @@ class AudioHandler:
             title_text = ""
             
             if cleaned_dialogue:
-                # Суммаризация
-                logger.info(f"[{self.meeting_id}] Создание резюме...")
-                summary_text = get_summary_response(cleaned_dialogue)
+                # Суммаризация и генерация заголовка идут одновременно
+                logger.info(f"[{self.meeting_id}] Создание резюме и заголовка...")
+                # Метки времени нужны для нарезки длинной встречи
+                summary_text, title_text = self._summarize_meeting(full, cleaned_dialogue)
                 print(f"Это вывод summary: \n{summary_text}")
-                
-                # Генерация заголовка
-                logger.info(f"[{self.meeting_id}] Создание заголовка...")
-                title_text = get_title_response(cleaned_dialogue)
                 print(f"Это вывод заголовка: \n{title_text}")
 
                 # Отправка результатов на внешний сервер
@@ -0,0 +1,128 @@
+import re
+from dataclasses import dataclass
+
+from config.config import STREAM_TRIGGER_WORD, STREAM_STOP_WORD_1, STREAM_STOP_WORD_2, STREAM_STOP_WORD_3
+
+# Ключи ответа как у llm_response_streamed: 0 — сохранить в базу знаний, 1 — поиск в базе, 3 — ответ пользователю
+KEY_SAVE = 0
+KEY_SEARCH = 1
+KEY_REPLY = 3
+
+GREETING_REPLY = ("Здравствуйте! Я Мэри. Вы можете попросить меня записать информацию в базу знаний "
+                  "или найти в ней то, что уже сохранено.")
+
+STOP_PHRASES = (STREAM_STOP_WORD_1, STREAM_STOP_WORD_2, STREAM_STOP_WORD_3)
+GREETING_RE = re.compile(r"^(привет(ствую)?|здравствуй(те)?|добр(ый|ое|ого) (день|утро|вечер|дня|утра|вечера)|хай|хелло|салют)( мэри)?$")
+SAVE_RE = re.compile(r"^(запиши|запомни|сохрани|добавь|занеси|зафиксируй)( пожалуйста)?( в базу( знаний)?)?( что)? (?P<text>.+)$")
+SEARCH_RE = re.compile(r"^(найди|поищи)( пожалуйста)?( в базе( знаний)?)?( мне)? (?P<text>.+)$")
+# «Напомни», «подскажи», «покажи» часто просят не о поиске («напомни позвонить»), поэтому только с «в базе»
+KB_SEARCH_RE = re.compile(r"^(посмотри|покажи|напомни|подскажи)( пожалуйста)?( мне)? в базе( знаний)?( мне)? (?P<text>.+)$")
+
+# Относительные даты LLM переводит в абсолютные (см. llm_response_streamed), поэтому такие записи отдаем ей
+RELATIVE_TIME_RE = re.compile(r"\b(сегодня|завтра|послезавтра|вчера|через|следующ\w*|понедельник\w*|вторник\w*|сред[аеуы]|"
+                              r"четверг\w*|пятниц\w*|суббот\w*|воскресень\w*)\b")
+
+# Словарь классификатора: начала слов, по которым фраза без явной команды относится к поиску или записи
+SEARCH_STEMS = ("найд", "поиск", "поищ")
+SAVE_STEMS = ("запиш", "запис", "запомн", "сохран", "добав", "занес", "фиксир")
+# Вопрос («когда», «где»…) и просьбы «напомни», «подскажи» считаются поиском, только если в них есть
+# отсылка к базе знаний, иначе отвечает LLM
+QUESTION_WORDS = ("когда", "где", "сколько", "какой", "какая", "какое", "какие")
+KB_SEARCH_STEMS = ("напомн", "подскаж", "покаж", "посмотр")
+KB_CUE_STEMS = ("баз", "заметк")
+# Слова, которые сами по себе не составляют запрос или запись («найди пожалуйста» — искать нечего)
+FILLER_WORDS = ("пожалуйста", "мне", "в", "базе", "базу", "знаний", "что", "а", "ты", "не", "мэри")
+
+
+# Токены фразы: (как сказано, нормализованный), знаки препинания по краям слов отброшены, внутри ("14:00") сохранены
+def tokenize(text: str) -> list[tuple[str, str]]:
+    tokens = []
+    for token in text.split():
+        normalized = re.sub(r"^\W+|\W+$", "", token.lower().replace("ё", "е"))
+        if normalized:
+            tokens.append((token, normalized))
+    return tokens
+
+
+# Фраза из нескольких слов встречается в words целиком и по границам слов («стоп», но не «стопка»)
+def has_phrase(words: list[str], phrase: str) -> bool:
+    phrase_words = phrase.split()
+    n = len(phrase_words)
+    return any(words[i:i + n] == phrase_words for i in range(len(words) - n + 1))
+
+
+@dataclass
+class Intent:
+    name: str # stop | save | search | greeting
+    key: int | None = None # Ключ в формате llm_response_streamed (для stop — None)
+    text: str = ""
+
+
+class IntentRouter:
+    """
+    Локальный разбор команд ассистенту без запроса к LLM.
+
+    Сначала проверяются стоп-фразы (целыми словами) и грамматика частых команд
+    (приветствие, «запиши…», «найди…»), затем словарный классификатор: фраза с
+    признаками поиска и без признаков записи считается поисковым запросом (основы
+    сравниваются с началом слов, общие вопросы — только при упоминании базы знаний).
+    Если уверенности нет (запись с относительной датой, команда без текста),
+    route возвращает None и команда уходит в LLM.
+    """
+
+    def __init__(self):
+        self.counters = {"stop": 0, "save": 0, "search": 0, "greeting": 0, "llm_fallback": 0}
+
+    def _match(self, text: str) -> Intent | None:
+        tokens = tokenize(text)
+        if tokens and tokens[0][1].startswith(STREAM_TRIGGER_WORD):
+            tokens = tokens[1:]
+        command = " ".join(normalized for _, normalized in tokens)
+
+        # Текст команды берется из сказанного (с пунктуацией и регистром), без слов-команды в начале
+        def spoken_tail(match: re.Match) -> str:
+            tail = tokens[len(tokens) - len(match.group("text").split()):]
+            return " ".join(token for token, _ in tail)
+
+        words = [normalized for _, normalized in tokens]
+
+        def has_stem(stems) -> bool:
+            return any(word.startswith(stems) for word in words)
+
+        def has_content(text_words: list[str]) -> bool:
+            return any(word not in FILLER_WORDS and not word.startswith(SEARCH_STEMS + KB_SEARCH_STEMS + SAVE_STEMS)
+                       for word in text_words)
+
+        if any(has_phrase(words, phrase) for phrase in STOP_PHRASES):
+            return Intent("stop")
+        if GREETING_RE.match(command):
+            return Intent("greeting", KEY_REPLY, GREETING_REPLY)
+
+        match = SAVE_RE.match(command)
+        if match:
+            if RELATIVE_TIME_RE.search(command) or not has_content(match.group("text").split()):
+                return None
+            payload = spoken_tail(match)
+            return Intent("save", KEY_SAVE, payload[0].upper() + payload[1:])
+
+        match = SEARCH_RE.match(command) or KB_SEARCH_RE.match(command)
+        if match:
+            return Intent("search", KEY_SEARCH, spoken_tail(match)) if has_content(match.group("text").split()) else None
+
+        has_kb_cue = has_stem(KB_CUE_STEMS)
+        is_search = has_stem(SEARCH_STEMS) or (has_kb_cue and (any(word in QUESTION_WORDS for word in words)
+                                                                 or has_stem(KB_SEARCH_STEMS)))
+        if is_search and not has_stem(SAVE_STEMS) and has_content(words):
+            return Intent("search", KEY_SEARCH, " ".join(token for token, _ in tokens))
+        return None
+
+    # Intent, если команда распознана локально; None — решение за LLM
+    def route(self, text: str) -> Intent | None:
+        intent = self._match(text)
+        self.counters[intent.name if intent else "llm_fallback"] += 1
+        return intent
+
+    def stats(self) -> dict:
+        total = sum(self.counters.values())
+        fast = total - self.counters["llm_fallback"]
+        return {**self.counters, "fast_path_share": round(fast / total, 3) if total else 0.0}
@@ -1,38 +1,194 @@
 from datetime import datetime
+from dataclasses import dataclass
+from collections.abc import Callable
+import asyncio
 import json
+import logging
+import re
+import time
+
+from config.config import (SUMMARY_PROMPT, TITLE_PROMPT, CLIENT, SUMMARY_CHUNK_PROMPT, SUMMARY_MERGE_PROMPT, SUMMARY_REDUCE_PROMPT,
+                           SUMMARY_CHUNK_TOKENS, SUMMARY_MAP_PARALLELISM, SUMMARY_CHARS_PER_TOKEN, LLM_STREAM_MIN_CHUNK_CHARS)
+from utils.llm_client import llm_client
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_MODEL = "openai/gpt-4.1-mini"
+TITLE_MODEL = "openai/gpt-4o-mini"
+INTENT_MODEL = "openai/gpt-4o-mini"
+KEY_REPLY = 3 # Ключ ответа пользователю в чат
+TIMESTAMP_RE = re.compile(r"\[(\d{2}:\d{2}:\d{2})\s*-\s*(\d{2}:\d{2}:\d{2})\]\s*")
+
+
+@dataclass
+class DialogueChunk:
+    start: str | None # Время первой реплики фрагмента (HH:MM:SS), если в диалоге были метки
+    end: str | None
+    text: str # Реплики без временных меток
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // SUMMARY_CHARS_PER_TOKEN + 1
+
+
+# Режет диалог по границам реплик на фрагменты не длиннее max_tokens (реплика длиннее бюджета идет отдельным фрагментом)
+def split_dialogue(dialogue: str, max_tokens: int = SUMMARY_CHUNK_TOKENS) -> list[DialogueChunk]:
+    chunks = []
+    lines, tokens, start, end = [], 0, None, None
+    for line in dialogue.splitlines():
+        match = TIMESTAMP_RE.match(line)
+        text = TIMESTAMP_RE.sub("", line).strip()
+        if not text:
+            continue
+        line_tokens = estimate_tokens(text)
+        if lines and tokens + line_tokens > max_tokens:
+            chunks.append(DialogueChunk(start, end, "\n".join(lines)))
+            lines, tokens, start = [], 0, None
+        if match:
+            start = start or match.group(1)
+            end = match.group(2)
+        lines.append(text)
+        tokens += line_tokens
+    if lines:
+        chunks.append(DialogueChunk(start, end, "\n".join(lines)))
+    return chunks
+
+
+# Параллельные запросы с одним системным промптом, ответы в порядке входа
+async def _chat_many(system_prompt: str, texts: list[str]) -> list[str]:
+    semaphore = asyncio.Semaphore(SUMMARY_MAP_PARALLELISM) # Одна встреча не занимает весь лимит клиента
+
+    async def chat(text: str) -> str:
+        async with semaphore:
+            return await llm_client.chat(system_prompt, text, SUMMARY_MODEL)
+
+    return await asyncio.gather(*(chat(text) for text in texts))
+
+
+# Группы подряд идущих резюме в пределах бюджета; в группе минимум два резюме, чтобы свертка сходилась
+def _group_summaries(summaries: list[str], max_tokens: int) -> list[list[str]]:
+    groups = [[]]
+    tokens = 0
+    for summary in summaries:
+        summary_tokens = estimate_tokens(summary)
+        if len(groups[-1]) >= 2 and tokens + summary_tokens > max_tokens:
+            groups.append([])
+            tokens = 0
+        groups[-1].append(summary)
+        tokens += summary_tokens
+    return groups
+
+
+def _fragment_label(chunk: DialogueChunk, index: int | None = None, total: int | None = None) -> str:
+    label = f"Фрагмент {index} из {total}" if index is not None else "Фрагмент встречи"
+    return label + (f", {chunk.start}–{chunk.end}" if chunk.start else "")
+
+
+# Map: резюме фрагментов диалога (параллельно, в порядке следования)
+async def summarize_fragments_async(dialogue: str, numbered: bool = True) -> list[str]:
+    chunks = split_dialogue(dialogue)
+    labeled = [
+        (_fragment_label(chunk, i, len(chunks)) if numbered else _fragment_label(chunk)) + f"\n{chunk.text}"
+        for i, chunk in enumerate(chunks, 1)
+    ]
+    return await _chat_many(SUMMARY_CHUNK_PROMPT, labeled)
+
+
+# Промежуточная свертка: резюме объединяются группами, пока не уложатся в бюджет одного запроса
+async def merge_summaries_async(summaries: list[str]) -> list[str]:
+    level = 0
+    while len(summaries) > 1 and estimate_tokens("\n\n".join(summaries)) > SUMMARY_CHUNK_TOKENS:
+        level_started = time.perf_counter()
+        level += 1
+        groups = _group_summaries(summaries, SUMMARY_CHUNK_TOKENS)
+        summaries = await _chat_many(SUMMARY_MERGE_PROMPT, ["\n\n".join(group) for group in groups])
+        logger.info(f"Резюме: промежуточная свертка {level} до {len(summaries)} частей за {time.perf_counter() - level_started:.1f} с")
+    return summaries
+
+
+# Reduce: итоговое резюме с таблицей задач по резюме фрагментов
+async def reduce_summaries_async(summaries: list[str]) -> str:
+    summaries = await merge_summaries_async(summaries)
+    reduce_started = time.perf_counter()
+    summary = await llm_client.chat(SUMMARY_REDUCE_PROMPT, "\n\n".join(summaries), SUMMARY_MODEL)
+    logger.info(f"Резюме: reduce за {time.perf_counter() - reduce_started:.1f} с")
+    return summary
 
-from config.config import SUMMARY_PROMPT, TITLE_PROMPT, CLIENT
 
 # Функция для суммаризации
-def get_summary_response(cleaned_dialogue: str) -> str:
+async def get_summary_response_async(dialogue: str) -> str:
+    """
+    Резюме встречи по диалогу (реплики построчно, можно с метками [HH:MM:SS - HH:MM:SS]).
 
-    chat_completion = CLIENT.chat.completions.create(
-        model="openai/gpt-4.1-mini", 
-        messages=[
-            {"role": "system", "content": SUMMARY_PROMPT},
-            {"role": "user", "content": cleaned_dialogue}
-        ]
-    )
-    return chat_completion.choices[0].message.content
+    Короткий диалог суммаризируется одним запросом. Длинный режется на фрагменты по
+    SUMMARY_CHUNK_TOKENS, фрагменты суммаризируются параллельно (map), а их резюме
+    сворачиваются в итоговое резюме с таблицей задач (reduce), при необходимости в несколько уровней.
+    """
+    started = time.perf_counter()
+    chunks = split_dialogue(dialogue)
+    if len(chunks) <= 1:
+        summary = await llm_client.chat(SUMMARY_PROMPT, chunks[0].text if chunks else "", SUMMARY_MODEL)
+        logger.info(f"Резюме одним запросом за {time.perf_counter() - started:.1f} с")
+        return summary
+
+    summaries = await summarize_fragments_async(dialogue)
+    logger.info(f"Резюме: map по {len(summaries)} фрагментам за {time.perf_counter() - started:.1f} с")
+    summary = await reduce_summaries_async(summaries)
+    logger.info(f"Резюме готово за {time.perf_counter() - started:.1f} с")
+    return summary
 
 # Функция для названия встречи
+async def get_title_response_async(cleaned_dialogue: str) -> str:
+    return await llm_client.chat(TITLE_PROMPT, cleaned_dialogue, TITLE_MODEL)
+
+
+def get_summary_response(dialogue: str) -> str:
+    return llm_client.run(get_summary_response_async(dialogue))
+
+
 def get_title_response(cleaned_dialogue: str) -> str:
+    return llm_client.run(get_title_response_async(cleaned_dialogue))
+
+
+async def _summary_and_title(dialogue: str, cleaned_dialogue: str) -> tuple[str, str]:
+    started = time.perf_counter()
+    summary, title = await asyncio.gather(get_summary_response_async(dialogue), get_title_response_async(cleaned_dialogue))
+    logger.info(f"Резюме и заголовок готовы за {time.perf_counter() - started:.1f} с")
+    return summary, title
+
+
+# Резюме (по диалогу с метками времени) и заголовок (по очищенному диалогу) одновременно
+def get_summary_and_title(dialogue: str, cleaned_dialogue: str) -> tuple[str, str]:
+    return llm_client.run(_summary_and_title(dialogue, cleaned_dialogue))
+
+
+# Шаг скользящего резюме во время встречи: резюме новой части диалога, при переполнении — свертка накопленного
+async def update_rolling_summary_async(summaries: list[str], new_dialogue: str) -> list[str]:
+    return await merge_summaries_async(summaries + await summarize_fragments_async(new_dialogue, numbered=False))
+
+
+async def _finish_rolling_summary(summaries: list[str], tail_dialogue: str, cleaned_dialogue: str) -> tuple[str, str]:
+    started = time.perf_counter()
+
+    async def summary() -> str:
+        tail = await summarize_fragments_async(tail_dialogue, numbered=False) if tail_dialogue.strip() else []
+        return await reduce_summaries_async(summaries + tail)
+
+    summary_text, title = await asyncio.gather(summary(), get_title_response_async(cleaned_dialogue))
+    logger.info(f"Резюме по скользящим частям и заголовок готовы за {time.perf_counter() - started:.1f} с")
+    return summary_text, title
+
+
+# Конец встречи со скользящим резюме: досуммаризировать хвост после последнего шага, свернуть и получить заголовок
+def finish_rolling_summary(summaries: list[str], tail_dialogue: str, cleaned_dialogue: str) -> tuple[str, str]:
+    return llm_client.run(_finish_rolling_summary(summaries, tail_dialogue, cleaned_dialogue))
 
-    chat_completion = CLIENT.chat.completions.create(
-        model="openai/gpt-4o-mini", 
-        messages=[
-            {"role": "system", "content": TITLE_PROMPT},
-            {"role": "user", "content": cleaned_dialogue}
-        ]
-    )
-    return chat_completion.choices[0].message.content
 
 now = datetime.now()
 date = now.strftime("%d.%m.%Y")
 
-def llm_response(user_text: str) -> str:
-    
-    instruction = f'''Ты умный ассистент Мэри по помощи в поиске и добавлении информации в векторных базах данных.
+def _intent_instruction() -> str:
+    return f'''Ты умный ассистент Мэри по помощи в поиске и добавлении информации в векторных базах данных.
     Определи намерение пользователя по его сообщению, а именно, хочет ли он добавить информацию в базу знаний или же найти в ней информацию.
     Если пользователь хочет добавить информацию, то тебе нужно лишь занести её в базу знаний, не меняя текст пользователя, дай ответ в формате:
     {{"key": 0, "text": <текст>}}. Если же пользователь ищет информацию, то четко структурируй его вопрос при надобности и
@@ -41,22 +197,107 @@ def llm_response(user_text: str) -> str:
     Созвон 03.09.2025 в 14:00. Также, если пользователь просто поздоровалс с тобой, просто поприветствуй его в ответ и скажи,
     что он может начать использовать функции добавлени и поиска информации в базе знаний. Ответ отправь в формате {{"key": 3, "text": <твой ответ>}}'''
 
-    chat_completion = CLIENT.chat.completions.create(
-        model="openai/gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": instruction},
-            {"role": "user", "content": user_text}
-        ]
-    )
-    try:
-        response_dict = json.loads(chat_completion.choices[0].message.content)
 
-        key_value = response_dict.get('key')
-        text_value = response_dict.get('text')
+REPLY_PREFIX_RE = re.compile(r'^\s*\{\s*"key"\s*:\s*(\d+)\s*,\s*"text"\s*:\s*"')
+SENTENCE_END_RE = re.compile(r"[.!?…](?=\s)|\n")
+
+
+class StreamedReply:
+    """
+    Разбор ответа модели на запрос намерения ({"key": ..., "text": "..."}) по мере генерации.
+
+    Как только известен key и началось поле text, feed возвращает новые символы
+    текста (с раскрытыми JSON-экранированиями); неполная escape-последовательность
+    ждет следующего кусочка.
+    """
+
+    def __init__(self):
+        self.raw = ""
+        self.key: int | None = None
+        self.text = ""
+        self.closed = False
+        self._pos: int | None = None # Позиция в raw, до которой текст уже разобран
+
+    def feed(self, delta: str) -> str:
+        self.raw += delta
+        if self.closed:
+            return ""
+        if self._pos is None:
+            match = REPLY_PREFIX_RE.match(self.raw)
+            if not match:
+                return ""
+            self.key = int(match.group(1))
+            self._pos = match.end()
+
+        i = safe = self._pos
+        while i < len(self.raw):
+            char = self.raw[i]
+            if char == "\\":
+                step = 6 if self.raw[i + 1:i + 2] == "u" else 2
+                if i + step > len(self.raw):
+                    break
+                i += step
+            elif char == '"':
+                self.closed = True
+                break
+            else:
+                i += 1
+            safe = i
 
+        piece = json.loads(f'"{self.raw[self._pos:safe]}"', strict=False) if safe > self._pos else ""
+        self._pos = safe
+        self.text += piece
+        return piece
+
+
+class SentenceBuffer:
+    """Копит текст и отдает его целыми предложениями, не короче min_chars (короткие склеиваются со следующими)."""
+
+    def __init__(self, min_chars: int = LLM_STREAM_MIN_CHUNK_CHARS):
+        self.min_chars = min_chars
+        self.text = ""
+
+    def feed(self, text: str) -> list[str]:
+        self.text += text
+        chunks = []
+        start = 0
+        for match in SENTENCE_END_RE.finditer(self.text):
+            if match.end() - start >= self.min_chars:
+                chunk = self.text[start:match.end()].strip()
+                if chunk:
+                    chunks.append(chunk)
+                start = match.end()
+        self.text = self.text[start:]
+        return chunks
+
+    def flush(self) -> list[str]:
+        rest, self.text = self.text.strip(), ""
+        return [rest] if rest else []
+
+
+def llm_response_streamed(user_text: str, on_reply: Callable[[str], None]) -> tuple[int | None, str | None]:
+    """
+    Определение намерения с потоковой генерацией: если модель отвечает пользователю (key 3),
+    on_reply получает текст ответа по предложениям, пока генерируется продолжение.
+    Возвращает key и полный text ответа.
+    """
+    reply = StreamedReply()
+    sentences = SentenceBuffer()
+    for delta in llm_client.stream_chat(_intent_instruction(), user_text, INTENT_MODEL):
+        text = reply.feed(delta)
+        if reply.key == KEY_REPLY and text:
+            for sentence in sentences.feed(text):
+                on_reply(sentence)
+    if reply.key == KEY_REPLY:
+        for sentence in sentences.flush():
+            on_reply(sentence)
+
+    try:
+        response_dict = json.loads(reply.raw)
+        return response_dict.get('key'), response_dict.get('text')
     except json.JSONDecodeError as e:
-        print(f"Ошибка при парсинге JSON: {e}")
-    return key_value, text_value
+        logger.warning(f"Ошибка при парсинге JSON: {e}")
+        return reply.key, reply.text or None
 
 def llm_response_after_kb(user_text: str) -> str:
     
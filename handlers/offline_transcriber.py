@@ -0,0 +1,249 @@
+import logging
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import soundfile as sf
+
+from config.config import (STREAM_SAMPLE_RATE, OFFLINE_VAD_THRESHOLD, OFFLINE_VAD_MIN_SILENCE_MS, OFFLINE_VAD_SPEECH_PAD_MS,
+                           OFFLINE_MAX_REGION_S, OFFLINE_ASR_PARALLELISM)
+from config.load_vad_model import create_new_vad_model
+from utils.asr_client import transcribe_pcm, TranscriptionSegment
+
+logger = logging.getLogger(__name__)
+
+VAD_CHUNK_SIZE = 512
+VAD_NEG_THRESHOLD_DELTA = 0.15 # Гистерезис: речь заканчивается при вероятности ниже threshold - 0.15
+READ_BLOCK_S = 30 # Размер блока при чтении файла для VAD
+DECODE_READ_BYTES = 1024 * 1024 # ~32 с PCM s16le за одно чтение из ffmpeg
+DEFAULT_CAPACITY_S = 600 # Начальный размер буфера, если ffprobe не знает длительность
+
+
+@dataclass
+class SpeechRegion:
+    start: int # Семплы от начала записи
+    end: int
+
+
+class SpeechSegmenter:
+    """
+    Делит аудио на участки речи с помощью Silero VAD.
+
+    Аудио подается кусками любого размера (feed), готовые участки возвращаются,
+    как только после них набралась пауза, поэтому сегментатор годится и для
+    записи, которая еще декодируется. Участки длиннее max_region_s режутся,
+    чтобы каждый помещался в одно окно Whisper.
+    """
+
+    def __init__(self, vad_model, sample_rate: int = STREAM_SAMPLE_RATE, threshold: float = OFFLINE_VAD_THRESHOLD,
+                 min_silence_ms: int = OFFLINE_VAD_MIN_SILENCE_MS, speech_pad_ms: int = OFFLINE_VAD_SPEECH_PAD_MS,
+                 max_region_s: float = OFFLINE_MAX_REGION_S):
+        self.vad = vad_model
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.neg_threshold = max(threshold - VAD_NEG_THRESHOLD_DELTA, 0.01)
+        self.min_silence_samples = int(min_silence_ms * sample_rate / 1000)
+        self.pad_samples = int(speech_pad_ms * sample_rate / 1000)
+        self.max_region_samples = int(max_region_s * sample_rate)
+
+        self.vad.reset_states()
+        self._remainder = np.zeros(0, dtype=np.float32)
+        self._position = 0 # Сколько семплов уже прошло через VAD
+        self._speech_start = None
+        self._silence_start = None
+        self._last_end = 0 # Конец последнего выданного участка, чтобы запас не залезал на предыдущий
+
+    def _emit(self, start: int, end: int, pad_end: bool = True) -> SpeechRegion:
+        region = SpeechRegion(
+            start=max(self._last_end, start - self.pad_samples),
+            end=end + self.pad_samples if pad_end else end
+        )
+        self._last_end = region.end
+        return region
+
+    def feed(self, audio: np.ndarray) -> list[SpeechRegion]:
+        audio = np.concatenate([self._remainder, audio.astype(np.float32, copy=False)])
+        n_chunks = len(audio) // VAD_CHUNK_SIZE
+        self._remainder = audio[n_chunks * VAD_CHUNK_SIZE:]
+
+        regions = []
+        for i in range(n_chunks):
+            chunk = audio[i * VAD_CHUNK_SIZE:(i + 1) * VAD_CHUNK_SIZE]
+            speech_prob = self.vad(chunk)
+            chunk_start = self._position
+            self._position += VAD_CHUNK_SIZE
+
+            if speech_prob >= self.threshold:
+                self._silence_start = None
+                if self._speech_start is None:
+                    self._speech_start = chunk_start
+            elif self._speech_start is not None and speech_prob < self.neg_threshold:
+                if self._silence_start is None:
+                    self._silence_start = chunk_start
+                if self._position - self._silence_start >= self.min_silence_samples:
+                    regions.append(self._emit(self._speech_start, self._silence_start))
+                    self._speech_start = self._silence_start = None
+                    continue
+
+            # Слишком длинный участок режем по началу текущей паузы, если она есть, иначе по текущему кадру
+            if self._speech_start is not None and self._position - self._speech_start >= self.max_region_samples:
+                cut = self._silence_start or self._position
+                regions.append(self._emit(self._speech_start, cut, pad_end=False))
+                self._speech_start = cut if self._silence_start is None else None
+                self._silence_start = None
+        return regions
+
+    # Конец записи: закрываем незавершенный участок
+    def flush(self) -> list[SpeechRegion]:
+        regions = []
+        if self._speech_start is not None:
+            end = self._silence_start or self._position + len(self._remainder)
+            regions.append(self._emit(self._speech_start, end, pad_end=False))
+        self._speech_start = self._silence_start = None
+        self._remainder = np.zeros(0, dtype=np.float32)
+        return regions
+
+
+def to_float32(audio: np.ndarray) -> np.ndarray:
+    if audio.dtype == np.int16:
+        return audio.astype(np.float32) / 32768.0
+    return audio.astype(np.float32, copy=False)
+
+
+# Транскрибация одного участка с переводом меток времени в абсолютные (от начала записи)
+def transcribe_region(audio: np.ndarray, region: SpeechRegion, beam_size: int = 3, best_of: int = 3,
+                      language: str = "ru") -> list[TranscriptionSegment]:
+    offset_s = region.start / STREAM_SAMPLE_RATE
+    end_s = region.end / STREAM_SAMPLE_RATE
+    segments = transcribe_pcm(to_float32(audio[region.start:region.end]), beam_size=beam_size, best_of=best_of,
+                              language=language, priority="background")
+    return [
+        TranscriptionSegment(start=offset_s + seg.start, end=min(offset_s + seg.end, end_s), text=seg.text.strip())
+        for seg in segments if seg.text.strip()
+    ]
+
+
+def detect_speech_regions(audio: np.ndarray, vad_model=None) -> list[SpeechRegion]:
+    segmenter = SpeechSegmenter(vad_model or create_new_vad_model())
+    block = READ_BLOCK_S * STREAM_SAMPLE_RATE
+    regions = []
+    for start in range(0, len(audio), block):
+        regions.extend(segmenter.feed(to_float32(audio[start:start + block])))
+    regions.extend(segmenter.flush())
+    return regions
+
+
+# Запись целиком: VAD -> участки речи -> параллельная транскрибация -> склейка по времени.
+# Участки идут в ASR с фоновым приоритетом и одинаковыми параметрами, поэтому собираются в батчи
+def transcribe_file_by_regions(path: str, beam_size: int = 3, best_of: int = 3, language: str = "ru",
+                               max_parallel: int = OFFLINE_ASR_PARALLELISM) -> list[TranscriptionSegment]:
+    started = time.monotonic()
+    audio, sr = sf.read(path, dtype="int16") # int16 вдвое экономнее float32 для многочасовых записей
+    if sr != STREAM_SAMPLE_RATE:
+        raise ValueError(f"Ожидается запись {STREAM_SAMPLE_RATE} Гц, получено {sr} Гц: {path}")
+    if audio.ndim > 1:
+        audio = audio[:, 0]
+
+    regions = detect_speech_regions(audio)
+    vad_seconds = time.monotonic() - started
+    speech_seconds = sum(r.end - r.start for r in regions) / STREAM_SAMPLE_RATE
+    logger.info(f"VAD: {len(regions)} участков, речь {speech_seconds:.0f} с из {len(audio) / sr:.0f} с, {vad_seconds:.1f} с")
+
+    with ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="OfflineASR") as executor:
+        results = list(executor.map(lambda region: transcribe_region(audio, region, beam_size, best_of, language), regions))
+
+    logger.info(f"Транскрибация по участкам завершена за {time.monotonic() - started:.1f} с")
+    return [segment for region_segments in results for segment in region_segments]
+
+
+# Длительность медиафайла по данным ffprobe (None, если определить не удалось)
+def probe_duration_s(path: str) -> float | None:
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=nw=1:nk=1", path],
+            capture_output=True, text=True, timeout=30
+        )
+        return float(result.stdout.strip())
+    except (ValueError, OSError, subprocess.TimeoutExpired):
+        return None
+
+
+class PCMBuffer:
+    """Заранее выделенный int16-буфер, в который ffmpeg пишет PCM напрямую через readinto."""
+
+    def __init__(self, capacity_samples: int):
+        self.data = np.empty(max(capacity_samples, STREAM_SAMPLE_RATE), dtype=np.int16)
+        self.length = 0
+
+    def read_from(self, stream, max_bytes: int = DECODE_READ_BYTES) -> int:
+        if (len(self.data) - self.length) * 2 < max_bytes:
+            # Длительность оказалась больше ожидаемой — расширяем в полтора раза. Старый массив остается
+            # у потоков, которые уже транскрибируют свои участки, данные в нем те же
+            grown = np.empty(int(len(self.data) * 1.5) + max_bytes // 2, dtype=np.int16)
+            grown[:self.length] = self.data[:self.length]
+            self.data = grown
+        view = memoryview(self.data).cast("B")[self.length * 2:self.length * 2 + max_bytes]
+        n_bytes = stream.readinto(view)
+        if not n_bytes:
+            return 0
+        if n_bytes % 2: # Нечетный хвост дочитываем, чтобы не разрезать семпл
+            n_bytes += stream.readinto(view[n_bytes:n_bytes + 1]) or 0
+        self.length += n_bytes // 2
+        return n_bytes // 2
+
+    @property
+    def samples(self) -> np.ndarray:
+        return self.data[:self.length]
+
+
+# Конвейер для загруженного файла: ffmpeg декодирует крупными блоками в общий буфер, VAD идет следом
+# за декодером, а каждый готовый участок речи сразу уходит в ASR. К концу декодирования остается
+# дождаться только последних участков
+def transcribe_media_pipelined(input_path: str, beam_size: int = 3, best_of: int = 3, language: str = "ru",
+                               max_parallel: int = OFFLINE_ASR_PARALLELISM) -> list[TranscriptionSegment]:
+    started = time.monotonic()
+    duration_s = probe_duration_s(input_path) or DEFAULT_CAPACITY_S
+    buffer = PCMBuffer(int(duration_s * STREAM_SAMPLE_RATE * 1.02))
+    segmenter = SpeechSegmenter(create_new_vad_model())
+
+    ffmpeg_process = subprocess.Popen(
+        ["ffmpeg", "-i", input_path, "-loglevel", "error", "-f", "s16le", "-ar", str(STREAM_SAMPLE_RATE), "-ac", "1", "-"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        bufsize=0
+    )
+
+    futures = []
+    first_region_at = None
+    with ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="OfflineASR") as executor:
+        def _submit(regions: list[SpeechRegion]):
+            for region in regions:
+                futures.append(executor.submit(transcribe_region, buffer.data, region, beam_size, best_of, language))
+
+        try:
+            vad_position = 0
+            while True:
+                n_samples = buffer.read_from(ffmpeg_process.stdout)
+                if not n_samples:
+                    break
+                _submit(segmenter.feed(to_float32(buffer.samples[vad_position:])))
+                vad_position = buffer.length
+                if futures and first_region_at is None:
+                    first_region_at = time.monotonic() - started
+            _submit(segmenter.flush())
+        finally:
+            ffmpeg_process.stdout.close()
+            ffmpeg_process.wait()
+
+        if ffmpeg_process.returncode != 0 and not buffer.length:
+            raise RuntimeError(f"FFmpeg не смог декодировать {input_path} (код {ffmpeg_process.returncode})")
+
+        decode_seconds = time.monotonic() - started
+        logger.info(f"Декодирование и VAD: {buffer.length / STREAM_SAMPLE_RATE:.0f} с аудио за {decode_seconds:.1f} с, "
+                    f"{len(futures)} участков, первый участок ушел в ASR через {first_region_at or 0:.1f} с")
+        results = [future.result() for future in futures]
+
+    logger.info(f"Конвейер завершен за {time.monotonic() - started:.1f} с (декодирование {decode_seconds:.1f} с)")
+    return [segment for region_segments in results for segment in region_segments]
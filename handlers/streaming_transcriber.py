@@ -0,0 +1,135 @@
+import logging
+import re
+
+import numpy as np
+
+from config.config import STREAM_SAMPLE_RATE, STREAM_PARTIAL_MAX_WINDOW_S, STREAM_PARTIAL_OVERLAP_S
+from utils.asr_client import transcribe_pcm, TranscriptionWord
+
+logger = logging.getLogger(__name__)
+
+COMMIT_TOLERANCE_S = 0.1 # Допуск при сравнении границ слов с уже зафиксированным текстом
+MAX_DEDUP_NGRAM = 5 # Максимальная длина повтора, который ищем на стыке окон
+
+
+def normalize_word(word: str) -> str:
+    return re.sub(r"[^\w]", "", word.lower())
+
+
+# Убирает из начала new_words слова, которые повторяют хвост committed_words (стык двух окон с перекрытием)
+def drop_overlapping_words(committed_words: list[TranscriptionWord], new_words: list[TranscriptionWord]) -> list[TranscriptionWord]:
+    if not committed_words or not new_words:
+        return new_words
+
+    committed_norm = [normalize_word(w.word) for w in committed_words[-MAX_DEDUP_NGRAM:]]
+    new_norm = [normalize_word(w.word) for w in new_words[:MAX_DEDUP_NGRAM]]
+    for n in range(min(len(committed_norm), len(new_norm)), 0, -1):
+        if committed_norm[-n:] == new_norm[:n]:
+            return new_words[n:]
+    return new_words
+
+
+def words_to_text(words: list[TranscriptionWord]) -> str:
+    return "".join(w.word for w in words).strip()
+
+
+class StreamingTranscriber:
+    """
+    Инкрементальная транскрибация одной реплики по принципу LocalAgreement-2.
+
+    На каждом шаге транскрибируется скользящее окно растущего буфера речи.
+    Слова, совпавшие в двух последовательных гипотезах, фиксируются и больше
+    не пересчитываются; когда окно становится длиннее max_window_s, его начало
+    сдвигается к концу зафиксированного текста (с перекрытием overlap_s).
+    При окончании речи распознается только незафиксированный хвост.
+    """
+
+    def __init__(self, sample_rate: int = STREAM_SAMPLE_RATE, max_window_s: float = STREAM_PARTIAL_MAX_WINDOW_S,
+                 overlap_s: float = STREAM_PARTIAL_OVERLAP_S):
+        self.sample_rate = sample_rate
+        self.max_window_s = max_window_s
+        self.overlap_s = overlap_s
+        self.final_words: list[TranscriptionWord] = [] # Слова последней завершенной реплики (если были шаги)
+        self.reset()
+
+    def reset(self):
+        self.window_start = 0 # Смещение начала окна внутри реплики (в семплах)
+        self.committed_words: list[TranscriptionWord] = []
+        self.hypothesis_words: list[TranscriptionWord] = []
+        self.last_committed_end = 0.0 # Конец последнего зафиксированного слова (секунды от начала реплики)
+        self.steps = 0
+
+    @property
+    def committed_text(self) -> str:
+        return words_to_text(self.committed_words)
+
+    # Транскрибирует окно и возвращает слова с временем относительно начала реплики, без уже зафиксированных
+    def _transcribe_window(self, audio: np.ndarray) -> list[TranscriptionWord]:
+        if len(audio) - self.window_start < self.sample_rate * COMMIT_TOLERANCE_S:
+            return []
+
+        offset_s = self.window_start / self.sample_rate
+        segments = transcribe_pcm(audio[self.window_start:], beam_size=1, best_of=1, language="ru", word_timestamps=True)
+
+        words = [
+            TranscriptionWord(start=w.start + offset_s, end=w.end + offset_s, word=w.word)
+            for seg in segments for w in (seg.words or [])
+        ]
+        words = [w for w in words if w.start > self.last_committed_end - COMMIT_TOLERANCE_S]
+        return drop_overlapping_words(self.committed_words, words)
+
+    # Шаг по растущему буферу: фиксирует устойчивый префикс и возвращает частичную гипотезу
+    def step(self, audio: np.ndarray) -> str:
+        words = self._transcribe_window(audio)
+        self.steps += 1
+
+        stable = 0
+        for previous, current in zip(self.hypothesis_words, words):
+            if normalize_word(previous.word) != normalize_word(current.word):
+                break
+            stable += 1
+
+        if stable:
+            self.committed_words.extend(words[:stable])
+            self.last_committed_end = words[stable - 1].end
+        self.hypothesis_words = words[stable:]
+
+        # Гипотезы долго не сходятся — фиксируем все, кроме хвоста длиной overlap_s, чтобы окно не росло бесконечно
+        audio_end_s = len(audio) / self.sample_rate
+        if audio_end_s - self.window_start / self.sample_rate > self.max_window_s * 2:
+            forced = [w for w in self.hypothesis_words if w.end < audio_end_s - self.overlap_s]
+            if forced:
+                self.committed_words.extend(forced)
+                self.last_committed_end = forced[-1].end
+                self.hypothesis_words = self.hypothesis_words[len(forced):]
+
+        # Ограничиваем стоимость одного вызова: окно не растет больше max_window_s
+        if (len(audio) - self.window_start) / self.sample_rate > self.max_window_s and self.committed_words:
+            new_start = int(max(0.0, self.last_committed_end - self.overlap_s) * self.sample_rate)
+            self.window_start = max(self.window_start, new_start)
+
+        return words_to_text(self.committed_words + self.hypothesis_words)
+
+    # Реплику разрезали на end_s, а промежуточные шаги уже видели речь после разреза: слова за разрезом
+    # достанутся следующей части, поэтому забываем их и при необходимости возвращаем окно назад
+    def truncate(self, end_s: float):
+        self.committed_words = [w for w in self.committed_words if w.end <= end_s]
+        self.hypothesis_words = [w for w in self.hypothesis_words if w.end <= end_s]
+        self.last_committed_end = self.committed_words[-1].end if self.committed_words else 0.0
+        new_start = int(max(0.0, self.last_committed_end - self.overlap_s) * self.sample_rate)
+        self.window_start = min(self.window_start, new_start)
+
+    # Конец реплики: распознаем незафиксированный хвост и возвращаем полный текст
+    def finalize(self, audio: np.ndarray, priority: str = "normal") -> str:
+        try:
+            if not self.steps:
+                # Короткая реплика без промежуточных шагов — обычный запрос, который может попасть в батч
+                self.final_words = []
+                segments = transcribe_pcm(audio, beam_size=1, best_of=1, language="ru", priority=priority)
+                return " ".join(seg.text.strip() for seg in segments).strip()
+
+            self.committed_words.extend(self._transcribe_window(audio))
+            self.final_words = self.committed_words
+            return self.committed_text
+        finally:
+            self.reset()
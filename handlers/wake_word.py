@@ -0,0 +1,162 @@
+import logging
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from config.config import (STREAM_SAMPLE_RATE, WAKE_WORD_TEMPLATES_DIR, WAKE_WORD_THRESHOLD, WAKE_WORD_WINDOW_S,
+                           WAKE_WORD_MAX_TEMPLATES)
+
+logger = logging.getLogger(__name__)
+
+# Параметры признаков: окно 25 мс, шаг 10 мс, 26 мел-фильтров, 13 кепстральных коэффициентов
+FRAME_LEN = 400
+HOP_LEN = 160
+N_FFT = 512
+N_MELS = 26
+N_MFCC = 13
+MAX_START_SHIFT_FRAMES = 30 # Слово может начаться чуть позже срабатывания VAD
+
+
+def _mel_filterbank(sample_rate: int) -> np.ndarray:
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    mel_points = np.linspace(hz_to_mel(0), hz_to_mel(sample_rate / 2), N_MELS + 2)
+    bins = np.floor((N_FFT + 1) * mel_to_hz(mel_points) / sample_rate).astype(int)
+
+    filterbank = np.zeros((N_MELS, N_FFT // 2 + 1), dtype=np.float32)
+    for m in range(1, N_MELS + 1):
+        left, center, right = bins[m - 1], bins[m], bins[m + 1]
+        for k in range(left, center):
+            filterbank[m - 1, k] = (k - left) / max(center - left, 1)
+        for k in range(center, right):
+            filterbank[m - 1, k] = (right - k) / max(right - center, 1)
+    return filterbank
+
+
+def _dct_matrix() -> np.ndarray:
+    n = np.arange(N_MELS)
+    k = np.arange(N_MFCC)[:, None]
+    return np.cos(np.pi / N_MELS * (n + 0.5) * k).astype(np.float32)
+
+
+class WakeWordSpotter:
+    """
+    Легкий детектор слова-триггера («мэри») до полной транскрибации.
+
+    Сравнивает MFCC начала реплики с эталонными записями через DTW.
+    Эталоны берутся из WAKE_WORD_TEMPLATES_DIR (*.wav, 16 кГц, моно) и
+    пополняются во время встречи, когда Whisper подтверждает обращение.
+    Без эталонов детектор ничего не решает (spot возвращает None).
+    """
+
+    def __init__(self, sample_rate: int = STREAM_SAMPLE_RATE, threshold: float = WAKE_WORD_THRESHOLD):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.window_samples = int(WAKE_WORD_WINDOW_S * sample_rate)
+        self._filterbank = _mel_filterbank(sample_rate)
+        self._dct = _dct_matrix()
+        self._window = np.hamming(FRAME_LEN).astype(np.float32)
+
+        self.static_templates: list[np.ndarray] = []
+        self.enrolled_templates: list[np.ndarray] = []
+        self.counters = {"spotted": 0, "rejected": 0, "confirmed": 0, "false_alarms": 0, "missed": 0}
+        self._load_templates(Path(WAKE_WORD_TEMPLATES_DIR))
+
+    def _load_templates(self, templates_dir: Path):
+        if not templates_dir.exists():
+            logger.info(f"Эталоны слова-триггера не найдены ({templates_dir}), ждем первого подтвержденного обращения.")
+            return
+        for path in sorted(templates_dir.glob("*.wav")):
+            try:
+                audio, sr = sf.read(path, dtype="float32")
+                if sr != self.sample_rate or audio.ndim != 1:
+                    logger.warning(f"Эталон {path.name} пропущен: нужен моно-файл {self.sample_rate} Гц.")
+                    continue
+                self.static_templates.append(self._features(audio))
+            except Exception as e:
+                logger.warning(f"Не удалось загрузить эталон {path}: {e}")
+        logger.info(f"Загружено эталонов слова-триггера: {len(self.static_templates)}")
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.static_templates or self.enrolled_templates)
+
+    # MFCC без нулевого коэффициента (громкость) с нормировкой каждого кадра.
+    # Среднее не вычитаем: у шаблона и начала реплики разный контекст, и CMN сдвигает их по-разному
+    def _features(self, audio: np.ndarray) -> np.ndarray:
+        audio = np.append(audio[0], audio[1:] - 0.97 * audio[:-1]).astype(np.float32)
+        if len(audio) < FRAME_LEN:
+            audio = np.pad(audio, (0, FRAME_LEN - len(audio)))
+
+        n_frames = 1 + (len(audio) - FRAME_LEN) // HOP_LEN
+        idx = np.arange(FRAME_LEN)[None, :] + HOP_LEN * np.arange(n_frames)[:, None]
+        frames = audio[idx] * self._window
+
+        power = np.abs(np.fft.rfft(frames, n=N_FFT)) ** 2 / N_FFT
+        log_mel = np.log(power @ self._filterbank.T + 1e-10)
+        mfcc = (log_mel @ self._dct.T)[:, 1:]
+
+        mfcc /= np.linalg.norm(mfcc, axis=1, keepdims=True) + 1e-8
+        return mfcc
+
+    # DTW с фиксированным концом шаблона и свободным концом (и небольшим сдвигом начала) в запросе
+    @staticmethod
+    def _dtw_distance(template: np.ndarray, query: np.ndarray) -> float:
+        cost = 1.0 - template @ query.T # Косинусное расстояние между кадрами
+        m, n = cost.shape
+
+        acc = np.full(n, np.inf, dtype=np.float64)
+        start_shift = min(MAX_START_SHIFT_FRAMES, n)
+        acc[:start_shift] = cost[0, :start_shift]
+        for i in range(1, m):
+            row = np.empty(n, dtype=np.float64)
+            row[0] = acc[0] + cost[i, 0]
+            row[1:] = np.minimum(acc[1:], acc[:-1]) + cost[i, 1:] # Переходы сверху и по диагонали
+            # Горизонтальный переход зависит от предыдущего элемента строки, его считаем циклом
+            for j in range(1, n):
+                if row[j - 1] + cost[i, j] < row[j]:
+                    row[j] = row[j - 1] + cost[i, j]
+            acc = row
+        return float(acc.min() / m)
+
+    # Проверка начала реплики: True — похоже на обращение, False — нет, None — детектор не готов
+    def spot(self, audio: np.ndarray) -> bool | None:
+        if not self.ready or len(audio) == 0:
+            return None
+
+        query = self._features(audio[:self.window_samples])
+        distance = min(self._dtw_distance(t, query) for t in self.static_templates + self.enrolled_templates)
+        spotted = distance < self.threshold
+
+        self.counters["spotted" if spotted else "rejected"] += 1
+        logger.debug(f"Детектор триггера: расстояние {distance:.3f}, порог {self.threshold}")
+        return spotted
+
+    # Сверка с результатом Whisper для статистики точности детектора
+    def record_outcome(self, spotted: bool | None, is_trigger: bool):
+        if spotted is None:
+            return
+        if spotted and is_trigger:
+            self.counters["confirmed"] += 1
+        elif spotted:
+            self.counters["false_alarms"] += 1
+        elif is_trigger:
+            self.counters["missed"] += 1
+
+    # Нужен ли эталон из очередного подтвержденного обращения: пока набор не полон или если детектор его пропустил.
+    # Иначе каждое обращение стоило бы лишнего распознавания ради замены эталона, который и так срабатывает
+    def wants_template(self, spotted: bool | None) -> bool:
+        return len(self.enrolled_templates) < WAKE_WORD_MAX_TEMPLATES or spotted is False
+
+    # Добавление эталона из подтвержденного обращения (аудио только самого слова-триггера)
+    def enroll(self, word_audio: np.ndarray):
+        if len(word_audio) < FRAME_LEN * 4:
+            return
+        self.enrolled_templates.append(self._features(word_audio))
+        if len(self.enrolled_templates) > WAKE_WORD_MAX_TEMPLATES:
+            self.enrolled_templates.pop(0)
@@ -0,0 +1,57 @@
+import asyncio
+import logging
+import os
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel
+
+from server.dependencies import get_api_key
+from server.ASR.batch_scheduler import asr_scheduler, PRIORITIES, ASRQueueFullError
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api/v1/internal/asr", dependencies=[Depends(get_api_key)])
+
+
+class TranscribeFileRequest(BaseModel):
+    path: str
+    beam_size: int = 3
+    best_of: int = 3
+    language: str = "ru"
+
+
+# Транскрибация фрагмента от бота: тело запроса — сырые float32 семплы (16 кГц, моно)
+@router.post("/transcribe")
+async def transcribe_pcm(request: Request, beam_size: int = 1, best_of: int = 1, language: str = "ru", word_timestamps: bool = False,
+                         priority: str = "normal"):
+    body = await request.body()
+    if not body or len(body) % 4 != 0:
+        raise HTTPException(status_code=400, detail="Тело запроса должно содержать float32 PCM.")
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Неизвестный приоритет: {priority}")
+
+    audio_np = np.frombuffer(body, dtype=np.float32)
+    try:
+        future = asr_scheduler.submit(audio_np, beam_size, best_of, language, word_timestamps, priority)
+    except ASRQueueFullError as e:
+        # Отказываем сразу, а не держим соединение: клиент повторит запрос через Retry-After
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return await asyncio.wrap_future(future)
+
+
+# Транскрибация файла с диска (используется WebsiteListenerBot)
+@router.post("/transcribe-file")
+async def transcribe_file(request: TranscribeFileRequest):
+    if not os.path.exists(request.path):
+        raise HTTPException(status_code=404, detail=f"Файл не найден: {request.path}")
+
+    logger.info(f"Транскрибация файла: {request.path}")
+    return await asyncio.wrap_future(
+        asr_scheduler.submit(request.path, request.beam_size, request.best_of, request.language)
+    )
+
+
+# Статистика пула: размеры батчей, ожидание в очереди и время инференса (p50/p95), отказы, пропускная способность
+@router.get("/stats")
+async def get_asr_stats():
+    return asr_scheduler.stats()
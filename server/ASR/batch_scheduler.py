@@ -0,0 +1,387 @@
+import logging
+import math
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+from faster_whisper.audio import pad_or_trim
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.transcribe import get_suppressed_tokens
+
+from config.config import (STREAM_SAMPLE_RATE, ASR_BATCH_MAX_SIZE, ASR_BATCH_MAX_WAIT_MS, ASR_BATCH_MAX_AUDIO_S,
+                           ASR_BATCH_BACKGROUND_WAIT_MS, ASR_QUEUE_MAX_SIZE)
+from config.load_models import model_registry
+
+logger = logging.getLogger(__name__)
+
+NO_SPEECH_THRESHOLD = 0.6 # Те же пороги, что у faster-whisper по умолчанию
+LOG_PROB_THRESHOLD = -1.0
+COMPRESSION_RATIO_THRESHOLD = 2.4 # Выше — текст зациклился (повторы), нужен повтор с температурой
+RECENT_REQUESTS_WINDOW = 1000 # По скольким последним запросам считаем перцентили
+
+# Приоритеты фрагментов: high — детектор услышал обращение к ассистенту, background — речь без обращения
+PRIORITIES = ("high", "normal", "background")
+
+
+# Степень сжатия текста zlib, как в faster-whisper: у зацикленной расшифровки она большая
+def compression_ratio(text: str) -> float:
+    text_bytes = text.encode("utf-8")
+    return len(text_bytes) / len(zlib.compress(text_bytes))
+
+
+class ASRQueueFullError(Exception):
+    """Очередь ASR заполнена; retry_after — через сколько секунд имеет смысл повторить запрос."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Очередь ASR заполнена, повторите через {retry_after} с")
+        self.retry_after = retry_after
+
+
+@dataclass
+class _PendingRequest:
+    audio: np.ndarray
+    options: tuple # (beam_size, best_of, language) — в один батч попадают только запросы с одинаковыми параметрами
+    future: Future
+    deadline: float # Момент, когда фрагмент нужно отправить в модель, даже если батч не набран
+    batchable: bool = True
+    word_timestamps: bool = False
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class BatchScheduler:
+    """
+    Пул ASR-воркеров перед общим Whisper с батчингом и ограниченной очередью.
+
+    Короткие фрагменты речи от всех встреч и Telegram-запросов собираются в батчи
+    и прогоняются одним вызовом encode/generate. Фрагменты длиннее одного окна
+    Whisper (30 с) и запросы с пословными метками времени идут через ту же очередь,
+    но воркер обрабатывает их по одному через model.transcribe. Батч декодируется
+    жадно при нулевой температуре; фрагменты, не прошедшие пороги faster-whisper
+    (сжатие текста, средний log-prob), распознаются заново через transcribe с его
+    повторами при повышенной температуре.
+
+    Воркеров столько же, сколько реплик модели держит CTranslate2 (num_workers
+    профиля ASR), поэтому они не толкаются за одну реплику. Если в очереди уже
+    ASR_QUEUE_MAX_SIZE запросов, submit сразу отказывает с ASRQueueFullError.
+    Файлы загрузок обрабатываются в отдельном пуле вне очереди, чтобы часовая
+    запись не занимала воркеров встреч.
+    """
+
+    def __init__(self, registry, max_batch_size: int = ASR_BATCH_MAX_SIZE, max_wait_ms: float = ASR_BATCH_MAX_WAIT_MS,
+                 max_queue_size: int = ASR_QUEUE_MAX_SIZE):
+        self.registry = registry # Модель загружается лениво, воркеры стартуют после ее загрузки
+        self.max_batch_size = max_batch_size
+        self.max_queue_size = max_queue_size
+        self.wait_s = {"high": 0.0, "normal": max_wait_ms / 1000.0, "background": ASR_BATCH_BACKGROUND_WAIT_MS / 1000.0}
+        self.max_batch_samples = int(ASR_BATCH_MAX_AUDIO_S * STREAM_SAMPLE_RATE)
+
+        self._pending: list[_PendingRequest] = []
+        self._condition = threading.Condition()
+        self._tokenizers: dict[str, Tokenizer] = {}
+        self._file_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ASRFile")
+        self._workers: list[threading.Thread] = []
+        self._start_lock = threading.Lock()
+        self._started = False
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "batches": 0,
+            "batched_items": 0,
+            "single_items": 0,
+            "fallback_items": 0, # Фрагменты батча, не прошедшие пороги и распознанные заново через transcribe
+            "rejected": 0,
+            "audio_seconds": 0.0,
+            "inference_seconds": 0.0,
+            "queue_wait_seconds": 0.0,
+            "batch_size_histogram": {},
+        }
+        self._recent_queue_wait_ms = deque(maxlen=RECENT_REQUESTS_WINDOW)
+        self._recent_inference_ms = deque(maxlen=RECENT_REQUESTS_WINDOW)
+
+        logger.info(f"ASR-планировщик создан: max_batch_size={max_batch_size}, max_wait_ms={max_wait_ms}, max_queue={max_queue_size}")
+
+    @property
+    def model(self):
+        return self.registry.get_asr_model()
+
+    # Воркеры запускаются при первом запросе: дожидаемся модели и поднимаем по воркеру на реплику
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._start_workers, name="ASRPoolStarter", daemon=True).start()
+
+    def _start_workers(self):
+        try:
+            self.registry.get_asr_model()
+        except Exception as e:
+            logger.error(f"ASR-воркеры не запущены, модель недоступна: {e}")
+            with self._condition:
+                for request in self._pending:
+                    request.future.set_exception(e)
+                self._pending = []
+            with self._start_lock:
+                self._started = False
+            return
+
+        num_workers = max(1, self.registry.profile.num_workers if self.registry.profile else 1)
+        for i in range(num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"ASRWorker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        logger.info(f"Запущено ASR-воркеров: {num_workers}")
+
+    # Постановка фрагмента в очередь. Возвращает Future со словарем {"segments": [...], "duration": ..., "timings": {...}}
+    def submit(self, audio, beam_size: int = 1, best_of: int = 1, language: str = "ru", word_timestamps: bool = False,
+               priority: str = "normal") -> Future:
+        future = Future()
+        options = (beam_size, best_of, language)
+
+        if not isinstance(audio, np.ndarray):
+            self._file_executor.submit(self._run_file, audio, options, future)
+            return future
+
+        self._ensure_started()
+        batchable = not word_timestamps and 0 < len(audio) <= self.max_batch_samples
+        deadline = time.monotonic() + self.wait_s.get(priority, self.wait_s["normal"])
+
+        with self._condition:
+            if len(self._pending) >= self.max_queue_size:
+                with self._stats_lock:
+                    self._stats["rejected"] += 1
+                raise ASRQueueFullError(self._estimate_retry_after())
+            self._pending.append(_PendingRequest(
+                audio.astype(np.float32, copy=False), options, future, deadline, batchable, word_timestamps
+            ))
+            self._condition.notify()
+        return future
+
+    # Оценка времени разбора текущей очереди по средней длительности одного вызова модели
+    def _estimate_retry_after(self) -> int:
+        with self._stats_lock:
+            calls = self._stats["batches"] + self._stats["single_items"]
+            avg_call_s = self._stats["inference_seconds"] / calls if calls else 1.0
+        workers = max(1, len(self._workers))
+        calls_ahead = len(self._pending) / (self.max_batch_size * workers)
+        return max(1, math.ceil(calls_ahead * avg_call_s))
+
+    @staticmethod
+    def _percentiles(values) -> dict:
+        if not values:
+            return {"p50": 0.0, "p95": 0.0}
+        p50, p95 = np.percentile(np.fromiter(values, dtype=np.float64), [50, 95])
+        return {"p50": round(float(p50), 1), "p95": round(float(p95), 1)}
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+            stats["batch_size_histogram"] = dict(self._stats["batch_size_histogram"])
+            stats["queue_wait_ms"] = self._percentiles(self._recent_queue_wait_ms)
+            stats["inference_ms"] = self._percentiles(self._recent_inference_ms)
+        total_items = stats["batched_items"] + stats["single_items"]
+        stats["avg_batch_size"] = stats["batched_items"] / stats["batches"] if stats["batches"] else 0.0
+        stats["avg_queue_wait_ms"] = stats["queue_wait_seconds"] / total_items * 1000 if total_items else 0.0
+        # Сколько секунд аудио обрабатывается за секунду работы модели
+        stats["realtime_factor"] = stats["audio_seconds"] / stats["inference_seconds"] if stats["inference_seconds"] else 0.0
+        stats["total_items"] = total_items
+        stats["workers"] = len(self._workers)
+        with self._condition:
+            stats["queue_depth"] = len(self._pending)
+        stats["queue_capacity"] = self.max_queue_size
+        return stats
+
+    def _record(self, batch_size: int, audio_seconds: float, inference_seconds: float, queue_waits: list[float]):
+        with self._stats_lock:
+            if batch_size:
+                self._stats["batches"] += 1
+                self._stats["batched_items"] += batch_size
+                histogram = self._stats["batch_size_histogram"]
+                histogram[batch_size] = histogram.get(batch_size, 0) + 1
+            else:
+                self._stats["single_items"] += 1
+            self._stats["audio_seconds"] += audio_seconds
+            self._stats["inference_seconds"] += inference_seconds
+            self._stats["queue_wait_seconds"] += sum(queue_waits)
+            for queue_wait in queue_waits:
+                self._recent_queue_wait_ms.append(queue_wait * 1000)
+                self._recent_inference_ms.append(inference_seconds * 1000)
+
+    # Ждем ближайший по сроку запрос, добираем совместимые до max_batch_size или до наступления срока.
+    # Срочный (high) запрос приходит с нулевым ожиданием и сразу забирает с собой все, что уже в очереди.
+    # Небатчевый запрос воркер забирает в одиночку, как только он оказывается первым по сроку
+    def _next_batch(self) -> list[_PendingRequest]:
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+
+            while len(self._pending) < self.max_batch_size:
+                leader = min(self._pending, key=lambda request: request.deadline)
+                remaining = leader.deadline - time.monotonic()
+                if remaining <= 0 or not leader.batchable:
+                    break
+                self._condition.wait(timeout=remaining)
+                if not self._pending: # Пока ждали, очередь разобрал другой воркер
+                    return []
+
+            self._pending.sort(key=lambda request: request.deadline)
+            leader = self._pending[0]
+            if not leader.batchable:
+                return [self._pending.pop(0)]
+
+            batch, rest = [], []
+            for request in self._pending:
+                if request.batchable and request.options == leader.options and len(batch) < self.max_batch_size:
+                    batch.append(request)
+                else:
+                    rest.append(request)
+            self._pending = rest
+            return batch
+
+    def _worker_loop(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                if batch[0].batchable:
+                    self._run_batch(batch)
+                else:
+                    self._run_single(batch[0])
+            except Exception as e:
+                logger.error(f"Ошибка транскрибации ({len(batch)} фрагм.): {e}", exc_info=True)
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _get_tokenizer(self, language: str) -> Tokenizer:
+        if language not in self._tokenizers:
+            self._tokenizers[language] = Tokenizer(
+                self.model.hf_tokenizer,
+                self.model.model.is_multilingual,
+                task="transcribe",
+                language=language
+            )
+        return self._tokenizers[language]
+
+    @staticmethod
+    def _timings(queue_wait: float, inference: float, batch_size: int) -> dict:
+        return {
+            "queue_wait_ms": round(queue_wait * 1000, 1),
+            "inference_ms": round(inference * 1000, 1),
+            "batch_size": batch_size,
+        }
+
+    # Один проход encoder + generate для всего батча (аналог BatchedInferencePipeline из faster-whisper)
+    def _run_batch(self, batch: list[_PendingRequest]):
+        model = self.model
+        started = time.monotonic()
+        beam_size, _, language = batch[0].options
+        tokenizer = self._get_tokenizer(language)
+
+        features = np.stack([
+            pad_or_trim(model.feature_extractor(request.audio)[..., :-1])
+            for request in batch
+        ])
+        prompt = model.get_prompt(tokenizer, [], without_timestamps=True)
+
+        encoder_output = model.encode(features)
+        results = model.model.generate(
+            encoder_output,
+            [list(prompt) for _ in batch],
+            beam_size=beam_size,
+            length_penalty=1,
+            max_length=model.max_length,
+            suppress_blank=True,
+            suppress_tokens=get_suppressed_tokens(tokenizer, [-1]),
+            return_scores=True,
+            return_no_speech_prob=True,
+        )
+
+        inference_seconds = time.monotonic() - started
+        audio_seconds = sum(len(request.audio) for request in batch) / STREAM_SAMPLE_RATE
+        queue_waits = [started - request.enqueued_at for request in batch]
+        self._record(len(batch), audio_seconds, inference_seconds, queue_waits)
+
+        fallback = []
+        for request, result, queue_wait in zip(batch, results, queue_waits):
+            tokens = result.sequences_ids[0]
+            avg_logprob = result.scores[0] * len(tokens) / (len(tokens) + 1)
+            duration = len(request.audio) / STREAM_SAMPLE_RATE
+
+            segments = []
+            if not (result.no_speech_prob > NO_SPEECH_THRESHOLD and avg_logprob < LOG_PROB_THRESHOLD):
+                text = tokenizer.decode(tokens).strip()
+                if avg_logprob < LOG_PROB_THRESHOLD or (text and compression_ratio(text) > COMPRESSION_RATIO_THRESHOLD):
+                    fallback.append((request, queue_wait))
+                    continue
+                if text:
+                    segments.append({"start": 0.0, "end": duration, "text": text})
+
+            request.future.set_result({
+                "segments": segments,
+                "duration": duration,
+                "timings": self._timings(queue_wait, inference_seconds, len(batch))
+            })
+
+        logger.debug(f"ASR-батч: {len(batch)} фрагм., {audio_seconds:.1f} с аудио за {inference_seconds:.2f} с")
+
+        # Как transcribe без батча: неуверенный или зацикленный результат перераспознается с повышением температуры
+        for request, queue_wait in fallback:
+            fallback_started = time.monotonic()
+            result = self._transcribe(request.audio, request.options, word_timestamps=False)
+            result["timings"] = self._timings(queue_wait, inference_seconds + time.monotonic() - fallback_started, len(batch))
+            with self._stats_lock:
+                self._stats["fallback_items"] += 1
+            request.future.set_result(result)
+
+    def _transcribe(self, audio, options: tuple, word_timestamps: bool) -> dict:
+        beam_size, best_of, language = options
+        segments, info = self.model.transcribe(
+            audio,
+            beam_size=beam_size,
+            best_of=best_of,
+            condition_on_previous_text=False,
+            vad_filter=False,
+            language=language,
+            word_timestamps=word_timestamps
+        )
+        result_segments = []
+        for seg in segments:
+            segment = {"start": seg.start, "end": seg.end, "text": seg.text.strip()}
+            if word_timestamps:
+                segment["words"] = [
+                    {"start": word.start, "end": word.end, "word": word.word}
+                    for word in seg.words or []
+                ]
+            result_segments.append(segment)
+        return {"segments": result_segments, "duration": info.duration}
+
+    # Длинное аудио или пословные метки — обычный transcribe с разбиением на окна внутри faster-whisper
+    def _run_single(self, request: _PendingRequest):
+        started = time.monotonic()
+        queue_wait = started - request.enqueued_at
+        result = self._transcribe(request.audio, request.options, request.word_timestamps)
+        inference_seconds = time.monotonic() - started
+        self._record(0, result["duration"], inference_seconds, [queue_wait])
+        result["timings"] = self._timings(queue_wait, inference_seconds, 1)
+        request.future.set_result(result)
+
+    # Файл загрузки: отдельный пул вне очереди встреч
+    def _run_file(self, path: str, options: tuple, future: Future):
+        started = time.monotonic()
+        try:
+            result = self._transcribe(path, options, word_timestamps=False)
+            result["timings"] = self._timings(0.0, time.monotonic() - started, 1)
+            future.set_result(result)
+        except Exception as e:
+            logger.error(f"Ошибка транскрибации файла {path}: {e}", exc_info=True)
+            future.set_exception(e)
+
+
+# Единый планировщик на процесс сервера: через него идут и встречи, и Telegram
+asr_scheduler = BatchScheduler(model_registry)
@@ -1,31 +1,50 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import JSONResponse
 from uuid import uuid4
 import logging
 import threading
 import os
+import json
 
 from server.dependencies import get_api_key
 from server.request_models import StartRequest, StopRequest, WebsiteSessionStartRequest
 from server.Google_Meet.meet_bot_manager import start_bot_process, stop_bot_process, get_bot_status
 from api.website_listener import WebsiteListenerBot
 from config.config import MEET_AUDIO_CHUNKS_DIR
+from config.load_models import model_registry
+from utils.audio_queue import queue_metrics_path
 
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Проверка сервера
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# Проверка сервера: 200 только когда ASR модель загружена, иначе 503 с текущей фазой загрузки
 @router.get("/health")
 async def health_check():
     logger.info("Health check requested")
-    return {"status": "ok", "message": "Server is running and models are loaded."}
+    models = model_registry.status()
+    if model_registry.is_ready:
+        return {"status": "ok", "message": "Server is running and models are loaded.", "models": models}
+    return JSONResponse(
+        status_code=503,
+        content={"status": models["state"], "message": "Models are not ready yet.", "models": models}
+    )
 
 # Проверка бота по ID
 @router.get("/status/{meeting_id}")
 async def get_status(meeting_id: str):
-    """Проверяет статус бота по его ID."""
+    """Проверяет статус бота по его ID и отдает последние метрики его очереди аудио."""
     status = get_bot_status(meeting_id)
-    return {"status": status, "meeting_id": meeting_id}
+    audio_queue = None
+    metrics_path = queue_metrics_path(meeting_id)
+    if metrics_path.exists():
+        try:
+            audio_queue = json.loads(metrics_path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать метрики очереди {meeting_id}: {e}")
+    return {"status": status, "meeting_id": meeting_id, "audio_queue": audio_queue}
 
 # Запуск бота
 @router.post("/api/v1/internal/start-processing", dependencies=[Depends(get_api_key)])
@@ -58,11 +77,11 @@ async def upload_audio_file(
         temp_dir = MEET_AUDIO_CHUNKS_DIR / f"upload_{meeting_id}"
         temp_dir.mkdir(parents=True, exist_ok=True)
 
-        # Сохраняем файл временно
+        # Сохраняем файл временно, читая загрузку кусками, чтобы не держать всю запись в памяти
         temp_file_path = temp_dir / f"{meeting_id}.webm"
         with open(temp_file_path, "wb") as temp_file:
-            content = await audio_file.read()
-            temp_file.write(content)
+            while chunk := await audio_file.read(UPLOAD_CHUNK_BYTES):
+                temp_file.write(chunk)
 
         logger.info(f"Файл сохранен временно: {temp_file_path}")
 
@@ -2,14 +2,20 @@ import logging
 import subprocess
 import os
 import signal
+import shutil
 import sys
 from typing import Dict
 
+from utils.cpu_budget import CPUBudget
+
 logger = logging.getLogger(__name__)
 
 # Словарь для хранения активных ботов: {meeting_id: process_pid}
 active_bots: Dict[str, int] = {}
 
+# Ядра и число потоков для каждого бота, чтобы процессы не дрались за CPU
+cpu_budget = CPUBudget()
+
 def start_bot_process(meeting_id: str, meet_url: str, email: str, remaining_seconds: int) -> bool:
     """
     Запускает бота в отдельном процессе с собственным виртуальным дисплеем.
@@ -35,18 +41,35 @@ def start_bot_process(meeting_id: str, meet_url: str, email: str, remaining_seco
         "--remaining-seconds", str(remaining_seconds)
     ]
     
+    allocation = cpu_budget.allocate(meeting_id)
+
+    # Привязка к ядрам через taskset наследуется всеми потомками: Xvfb, процессом бота и Chrome
+    # (preexec_fn в многопоточном сервере небезопасен)
+    taskset = shutil.which("taskset")
+    if taskset:
+        command = [taskset, "-c", ",".join(map(str, allocation.cpus))] + command
+
     logger.info(f"Запуск дочернего процесса командой: {' '.join(command)}")
-    
+
     try:
-        process = subprocess.Popen(command)
+        process = subprocess.Popen(
+            command,
+            env={**os.environ, **allocation.env()}
+        )
+        if not taskset and hasattr(os, "sched_setaffinity"):
+            # Без taskset привязываем уже запущенный процесс; бот сам доводит привязку в apply_process_budget
+            os.sched_setaffinity(process.pid, allocation.cpus)
+        cpu_budget.attach(meeting_id, process)
         active_bots[meeting_id] = process.pid
         logger.info(f"Бот для встречи {meeting_id} успешно запущен в процессе с PID: {process.pid}")
         return True
     except FileNotFoundError:
         logger.critical("❌ КОМАНДА 'xvfb-run' НЕ НАЙДЕНА! Установите пакет 'xvfb' в ваш Dockerfile.")
+        cpu_budget.release(meeting_id)
         return False
     except Exception as e:
         logger.error(f"Не удалось запустить процесс бота для {meeting_id}: {e}", exc_info=True)
+        cpu_budget.release(meeting_id)
         return False
 
 # Функции stop_bot_process и get_bot_status остаются без изменений
@@ -64,11 +87,13 @@ def stop_bot_process(meeting_id: str) -> bool:
         os.kill(pid, signal.SIGTERM)
         logger.info(f"Отправлен сигнал SIGTERM процессу {pid} (meeting_id: {meeting_id}).")
         del active_bots[meeting_id]
+        cpu_budget.release(meeting_id)
         return True
     except ProcessLookupError:
         logger.warning(f"Процесс с PID {pid} не найден. Вероятно, он уже завершился самостоятельно.")
         if meeting_id in active_bots:
             del active_bots[meeting_id]
+        cpu_budget.release(meeting_id)
         return False
     except Exception as e:
         logger.error(f"Ошибка при попытке остановить процесс {pid}: {e}", exc_info=True)
@@ -88,4 +113,5 @@ def get_bot_status(meeting_id: str) -> str:
     except OSError:
         logger.warning(f"Процесс {pid} для {meeting_id} не найден. Удаляем запись.")
         del active_bots[meeting_id]
+        cpu_budget.release(meeting_id)
         return "inactive"
\ No newline at end of file
@@ -1,17 +1,40 @@
 import asyncio
 import io
+from concurrent.futures import ThreadPoolExecutor
 
-from config.load_models import asr_model
+from faster_whisper import decode_audio
 
-TRANSCRIBE_SEMAPHORE = asyncio.Semaphore(6)
+from config.config import ASR_MODEL_NAME, TG_TRANSCRIPTION_CACHE_SIZE, TG_TRANSCRIPTION_CACHE_DIR, TG_TRANSCRIPTION_CACHE_DISK_MB
+from server.ASR.batch_scheduler import asr_scheduler
+from server.TG_Bot.transcription_cache import TranscriptionCache
 
-async def transcribe_audio_async(audio_bytes: bytes) -> str:
+TG_BEAM_SIZE = 3
+TG_LANGUAGE = "ru"
+
+# Декодирование голосовых идет в своем пуле, чтобы не занимать executor по умолчанию
+DECODE_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="TGAudioDecode")
+
+transcription_cache = TranscriptionCache(
+    max_items=TG_TRANSCRIPTION_CACHE_SIZE,
+    disk_dir=TG_TRANSCRIPTION_CACHE_DIR,
+    max_disk_bytes=TG_TRANSCRIPTION_CACHE_DISK_MB * 1024 * 1024
+)
+
+async def _transcribe(audio_bytes: bytes) -> str:
     loop = asyncio.get_event_loop()
 
-    def _sync_transcribe():
+    def _decode():
         with io.BytesIO(audio_bytes) as audio_stream:
-            segments, _ = asr_model.transcribe(audio_stream, beam_size=3, best_of=1, condition_on_previous_text=False, vad_filter=False, language="ru")
-            
-            return " ".join(segment.text.strip() for segment in segments)
-            
-    return await loop.run_in_executor(None, _sync_transcribe)
+            return decode_audio(audio_stream)
+
+    # Декодируем голосовое в PCM и отдаем в общий пул ASR: короткие сообщения попадают в батчи вместе с фрагментами встреч.
+    # При переполненной очереди submit сразу бросает ASRQueueFullError
+    audio_np = await loop.run_in_executor(DECODE_EXECUTOR, _decode)
+    result = await asyncio.wrap_future(asr_scheduler.submit(audio_np, beam_size=TG_BEAM_SIZE, best_of=1, language=TG_LANGUAGE))
+
+    return " ".join(segment["text"] for segment in result["segments"])
+
+async def transcribe_audio_async(audio_bytes: bytes) -> str:
+    # Пересланные голосовые и повторы запросов бэкендом берутся из кэша
+    key = TranscriptionCache.make_key(audio_bytes, ASR_MODEL_NAME, TG_BEAM_SIZE, TG_LANGUAGE)
+    return await transcription_cache.get_or_compute(key, lambda: _transcribe(audio_bytes))
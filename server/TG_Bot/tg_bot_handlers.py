@@ -2,7 +2,8 @@ from fastapi import APIRouter, UploadFile, File, Depends, Form, HTTPException
 import logging
 
 from server.dependencies import get_api_key
-from server.TG_Bot.asr_handler import transcribe_audio_async, TRANSCRIBE_SEMAPHORE
+from server.TG_Bot.asr_handler import transcribe_audio_async, transcription_cache
+from server.ASR.batch_scheduler import ASRQueueFullError
 
 router = APIRouter(prefix="/api/v1/internal", dependencies=[Depends(get_api_key)])
 
@@ -11,14 +12,21 @@ async def receive_audio(chat_id: int = Form(...), audio: UploadFile = File(...))
     try:
         audio_bytes = await audio.read()
 
-        async with TRANSCRIBE_SEMAPHORE:
-
-            transcription = await transcribe_audio_async(audio_bytes)
+        transcription = await transcribe_audio_async(audio_bytes)
 
         logging.info(f"[chat_id={chat_id}] Транскрибация завершена.")
         logging.info(transcription)
         return {"status": "ok", "chat_id": chat_id, "text": transcription}
 
+    except ASRQueueFullError as e:
+        logging.warning(f"[chat_id={chat_id}] {e}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         logging.exception(f"[chat_id={chat_id}] Ошибка при обработке аудио: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# Статистика кэша транскрибаций: попадания в память/на диск, объединенные запросы, промахи
+@router.get("/audio/cache-stats")
+async def get_audio_cache_stats():
+    return transcription_cache.stats()
@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+# Ошибку транскрибации, которую не дождался ни один запрос, не выводим как «never retrieved»
+def _consume_exception(task: asyncio.Task):
+    if not task.cancelled():
+        task.exception()
+
+
+class TranscriptionCache:
+    """
+    Кэш транскрибаций голосовых по содержимому аудио.
+
+    Ключ — sha256 байтов аудио вместе с параметрами ASR, поэтому пересланное
+    повторно голосовое или повтор запроса бэкендом не транскрибируется заново.
+    Первый уровень — LRU в памяти, второй (если задан каталог) — текстовые файлы
+    на диске с вытеснением самых старых при превышении max_disk_bytes.
+    Одновременные запросы с одинаковым ключом ждут одну и ту же транскрибацию:
+    она идет в отдельной задаче, поэтому отмена одного запроса (клиент отключился)
+    не отменяет ее для остальных.
+    """
+
+    def __init__(self, max_items: int, disk_dir: Path | None = None, max_disk_bytes: int = 0):
+        self.max_items = max_items
+        self.disk_dir = disk_dir if disk_dir and max_disk_bytes > 0 else None
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self._disk_bytes = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "coalesced": 0, "misses": 0}
+
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(path.stat().st_size for path in self.disk_dir.glob("*.txt"))
+            logger.info(f"Дисковый кэш транскрибаций: {self.disk_dir}, занято {self._disk_bytes / 1024 / 1024:.1f} МБ")
+
+    @staticmethod
+    def make_key(audio_bytes: bytes, model: str, beam_size: int, language: str) -> str:
+        digest = hashlib.sha256(audio_bytes).hexdigest()
+        params = hashlib.sha256(f"{model}|{beam_size}|{language}".encode()).hexdigest()[:16]
+        return f"{digest}-{params}"
+
+    def _remember(self, key: str, text: str):
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> str | None:
+        if not self.disk_dir:
+            return None
+        path = self.disk_dir / f"{key}.txt"
+        try:
+            text = path.read_text(encoding="utf-8")
+            os.utime(path) # Время изменения служит меткой последнего использования при вытеснении
+            return text
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key: str, text: str):
+        if not self.disk_dir:
+            return
+        path = self.disk_dir / f"{key}.txt"
+        try:
+            path.write_text(text, encoding="utf-8")
+            self._disk_bytes += path.stat().st_size
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить транскрибацию в кэш: {e}")
+
+    def _evict_disk(self):
+        files = sorted(self.disk_dir.glob("*.txt"), key=lambda p: p.stat().st_mtime)
+        self._disk_bytes = sum(path.stat().st_size for path in files)
+        for path in files:
+            if self._disk_bytes <= self.max_disk_bytes * 0.9: # Чистим с запасом, чтобы не вытеснять на каждой записи
+                break
+            size = path.stat().st_size
+            path.unlink(missing_ok=True)
+            self._disk_bytes -= size
+
+    def get(self, key: str) -> str | None:
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.counters["memory_hits"] += 1
+            return self._memory[key]
+        text = self._read_disk(key)
+        if text is not None:
+            self.counters["disk_hits"] += 1
+            self._remember(key, text)
+        return text
+
+    # Возвращает текст из кэша, присоединяется к уже идущей транскрибации или запускает новую
+    async def get_or_compute(self, key: str, compute) -> str:
+        text = self.get(key)
+        if text is not None:
+            return text
+
+        task = self._in_flight.get(key)
+        if task is None:
+            self.counters["misses"] += 1
+            task = asyncio.create_task(self._compute(key, compute))
+            task.add_done_callback(_consume_exception)
+            self._in_flight[key] = task
+        else:
+            self.counters["coalesced"] += 1
+        # Отмена вызывающего прерывает только его ожидание, транскрибацию дождутся остальные и кэш
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: str, compute) -> str:
+        try:
+            text = await compute()
+            self._remember(key, text)
+            self._write_disk(key, text)
+            return text
+        finally:
+            # Ошибку (в т.ч. переполненную очередь ASR) получают все ожидающие, но в кэш она не попадает
+            del self._in_flight[key]
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "memory_items": len(self._memory),
+            "disk_bytes": self._disk_bytes if self.disk_dir else None,
+            "in_flight": len(self._in_flight),
+        }
@@ -0,0 +1,165 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+import numpy as np
+
+from config.config import VAD_BATCH_MAX_SIZE, VAD_BATCH_MAX_WAIT_MS
+from config.load_vad_model import create_new_vad_model, initial_vad_state
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class _StreamState:
+    state: np.ndarray # (2, 1, 128) — рекуррентное состояние Silero
+    context: np.ndarray # (1, 64) — хвост предыдущего окна
+
+
+class BatchedVADEngine:
+    """
+    Один Silero VAD на все встречи.
+
+    Каждая встреча — отдельный поток со своим рекуррентным состоянием. Окна
+    разных потоков, пришедшие почти одновременно, склеиваются в батч: состояния
+    потоков собираются в одно состояние, передаются в forward модели, а новое
+    состояние раскладывается обратно по потокам. Батч запускается, как только окно прислали все открытые потоки,
+    набран max_batch_size или прошло max_wait_ms с первого окна.
+
+    Если модель не дает подменять состояние (TorchScript другой версии Silero),
+    у каждого потока своя копия модели и окна считаются по очереди.
+    """
+
+    def __init__(self, model_factory=create_new_vad_model, max_batch_size: int = VAD_BATCH_MAX_SIZE,
+                 max_wait_ms: float = VAD_BATCH_MAX_WAIT_MS):
+        self.model_factory = model_factory
+        self.model = model_factory()
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.supports_batching = self.model.supports_batching
+        if not self.supports_batching:
+            logger.warning("Модель VAD не поддерживает подмену состояния, окна потоков считаются по очереди.")
+
+        self._streams: dict[int, _StreamState | None] = {}
+        self._stream_models: dict[int, object] = {}
+        self._next_stream_id = 0
+        self._pending: list[tuple[int, np.ndarray, Future]] = []
+        self._condition = threading.Condition()
+
+        self._stats_lock = threading.Lock()
+        self._stats = {"windows": 0, "batches": 0, "inference_seconds": 0.0}
+
+        self._worker = threading.Thread(target=self._worker_loop, name="VADEngine", daemon=True)
+        self._worker.start()
+
+    def open_stream(self) -> int:
+        with self._condition:
+            stream_id = self._next_stream_id
+            self._next_stream_id += 1
+            self._streams[stream_id] = None
+            if not self.supports_batching:
+                self._stream_models[stream_id] = self.model_factory()
+        logger.info(f"VAD: открыт поток {stream_id}, всего {len(self._streams)}")
+        return stream_id
+
+    def close_stream(self, stream_id: int):
+        with self._condition:
+            self._streams.pop(stream_id, None)
+            self._stream_models.pop(stream_id, None)
+            self._condition.notify()
+        logger.info(f"VAD: закрыт поток {stream_id}, осталось {len(self._streams)}")
+
+    def reset_stream(self, stream_id: int):
+        with self._condition:
+            self._streams[stream_id] = None
+            if stream_id in self._stream_models:
+                self._stream_models[stream_id].reset_states()
+
+    def submit(self, stream_id: int, audio: np.ndarray) -> Future:
+        future = Future()
+        with self._condition:
+            self._pending.append((stream_id, audio, future))
+            self._condition.notify()
+        return future
+
+    # Вероятность речи для окна из 512 семплов (блокирует до прогона батча)
+    def process(self, stream_id: int, audio: np.ndarray) -> float:
+        return self.submit(stream_id, audio).result()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["avg_batch_size"] = stats["windows"] / stats["batches"] if stats["batches"] else 0.0
+        stats["avg_inference_ms"] = stats["inference_seconds"] / stats["batches"] * 1000 if stats["batches"] else 0.0
+        stats["streams"] = len(self._streams)
+        stats["batching"] = self.supports_batching
+        return stats
+
+    def _next_batch(self) -> list[tuple[int, np.ndarray, Future]]:
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+
+            deadline = time.monotonic() + self.max_wait_s
+            while len(self._pending) < min(len(self._streams), self.max_batch_size):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(timeout=remaining)
+
+            # От одного потока в батч идет только одно окно: следующее зависит от состояния после предыдущего
+            batch, rest, seen = [], [], set()
+            for item in self._pending:
+                if item[0] not in seen and len(batch) < self.max_batch_size:
+                    seen.add(item[0])
+                    batch.append(item)
+                else:
+                    rest.append(item)
+            self._pending = rest
+            return batch
+
+    def _worker_loop(self):
+        while True:
+            batch = self._next_batch()
+            started = time.monotonic()
+            try:
+                probs = self._run_batch(batch) if self.supports_batching else self._run_sequential(batch)
+                for (_, _, future), prob in zip(batch, probs):
+                    future.set_result(prob)
+            except Exception as e:
+                logger.error(f"Ошибка VAD ({len(batch)} окон): {e}", exc_info=True)
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            with self._stats_lock:
+                self._stats["windows"] += len(batch)
+                self._stats["batches"] += 1
+                self._stats["inference_seconds"] += time.monotonic() - started
+
+    def _run_batch(self, batch) -> list[float]:
+        states = []
+        for stream_id, _, _ in batch:
+            stream = self._streams.get(stream_id)
+            states.append(stream or _StreamState(*initial_vad_state()))
+
+        audio = np.stack([item[1] for item in batch]).astype(np.float32, copy=False)
+        probs, state, context = self.model.forward(
+            audio,
+            np.concatenate([s.state for s in states], axis=1),
+            np.concatenate([s.context for s in states], axis=0)
+        )
+
+        with self._condition:
+            for i, (stream_id, _, _) in enumerate(batch):
+                if stream_id in self._streams: # Поток мог закрыться, пока шел прогон
+                    self._streams[stream_id] = _StreamState(state[:, i:i + 1].copy(), context[i:i + 1].copy())
+        return probs.tolist()
+
+    def _run_sequential(self, batch) -> list[float]:
+        probs = []
+        for stream_id, audio, _ in batch:
+            model = self._stream_models.get(stream_id) or self.model
+            probs.append(model(audio))
+        return probs
@@ -0,0 +1,69 @@
+import logging
+import os
+import socketserver
+import struct
+import threading
+
+import numpy as np
+
+from config.config import VAD_SOCKET_PATH
+from server.VAD.vad_engine import BatchedVADEngine
+from utils.vad_client import recv_exact, VAD_WINDOW_BYTES, OP_PROCESS, OP_RESET, PROB_FORMAT
+
+logger = logging.getLogger(__name__)
+
+
+class _VADStreamHandler(socketserver.BaseRequestHandler):
+    """Одно соединение процесса бота — один поток VAD со своим состоянием."""
+
+    def handle(self):
+        engine: BatchedVADEngine = self.server.engine
+        stream_id = engine.open_stream()
+        try:
+            while True:
+                op = recv_exact(self.request, 1)
+                if op is None:
+                    break
+                if op == OP_RESET:
+                    engine.reset_stream(stream_id)
+                    continue
+                if op != OP_PROCESS:
+                    logger.warning(f"VAD: неизвестная операция {op!r}, закрываю поток {stream_id}")
+                    break
+                payload = recv_exact(self.request, VAD_WINDOW_BYTES)
+                if payload is None:
+                    break
+                prob = engine.process(stream_id, np.frombuffer(payload, dtype=np.float32))
+                self.request.sendall(struct.pack(PROB_FORMAT, prob))
+        except OSError as e:
+            logger.info(f"VAD: соединение потока {stream_id} оборвано: {e}")
+        finally:
+            engine.close_stream(stream_id)
+
+
+class _VADServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, engine: BatchedVADEngine):
+        self.engine = engine
+        super().__init__(socket_path, _VADStreamHandler)
+
+
+_server: _VADServer | None = None
+
+
+# Запуск сервиса VAD в процессе сервера (фоновый поток)
+def start_vad_service(socket_path: str = VAD_SOCKET_PATH) -> _VADServer:
+    global _server
+    if _server is not None:
+        return _server
+    if os.path.exists(socket_path):
+        os.remove(socket_path) # Сокет остался от прошлого запуска
+    _server = _VADServer(socket_path, BatchedVADEngine())
+    threading.Thread(target=_server.serve_forever, name="VADService", daemon=True).start()
+    logger.info(f"Сервис VAD запущен: {socket_path}, батчевый режим: {_server.engine.supports_batching}")
+    return _server
+
+
+def vad_service_stats() -> dict | None:
+    return _server.engine.stats() if _server is not None else None
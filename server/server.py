@@ -1,5 +1,6 @@
 import logging
 import os
+import threading
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.responses import FileResponse
 
@@ -7,8 +8,12 @@ from fastapi.responses import FileResponse
 from config.logging import setup_logging
 from server.TG_Bot.tg_bot_handlers import router as tg_bot_router
 from server.Google_Meet.meet_bot_handlers import router as bot_control_router
+from server.ASR.asr_service_handlers import router as asr_service_router
 from server.dependencies import verify_log_access_key
 from utils.gpu_monitor import get_gpu_utilization
+from config.load_models import model_registry
+from config.config import ASR_PRELOAD_ON_STARTUP, VAD_SERVICE_ENABLED
+from server.VAD.vad_socket_server import start_vad_service, vad_service_stats
 
 setup_logging()
 # Логгер теперь настраивается uvicorn через --log-config.
@@ -22,11 +27,26 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Загрузка и прогрев Whisper в фоне: сервер сразу принимает запросы, а /health сообщает реальную готовность
+@app.on_event("startup")
+async def preload_models():
+    if ASR_PRELOAD_ON_STARTUP:
+        threading.Thread(target=model_registry.load_all, name="ModelPreload", daemon=True).start()
+
+# Общий VAD для процессов ботов: окна всех встреч считаются батчами в одной модели
+@app.on_event("startup")
+async def start_vad():
+    if VAD_SERVICE_ENABLED:
+        start_vad_service()
+
 app.include_router(bot_control_router)
 
 
 app.include_router(tg_bot_router)
 
+# Общий ASR-сервис для процессов ботов (Whisper загружен один раз в этом процессе)
+app.include_router(asr_service_router)
+
 @app.get("/logs/app.log", dependencies=[Depends(verify_log_access_key)], tags=["System"])
 async def get_app_log():
     """
@@ -54,9 +74,18 @@ async def health_check_extended():
     
     return {
         "status": "ok", 
+        "models": model_registry.status(),
+        "vad": vad_service_stats(),
         "gpu_metrics": gpu_status if gpu_status else "Not available"
     }
 
+@app.get("/startup-timings", tags=["System"])
+async def get_startup_timings():
+    """
+    Возвращает длительность каждой фазы подготовки моделей (workspace, download, load, warmup, total).
+    """
+    return model_registry.status()
+
 # --- Команда для запуска сервера из терминала ---
 # uvicorn server:app --host 0.0.0.0 --port 8001
 
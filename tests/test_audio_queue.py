@@ -0,0 +1,100 @@
+import io
+import queue
+import threading
+
+import numpy as np
+import pytest
+
+from utils.audio_queue import BoundedAudioQueue
+from utils.capture_reader import BlockCaptureReader
+
+FRAME_SAMPLES = 480
+FRAMES_PER_BLOCK = 4
+BLOCK_SAMPLES = FRAME_SAMPLES * FRAMES_PER_BLOCK
+
+
+# Поток захвата из блоков, каждый заполнен своим значением; четные блоки громкие, нечетные — тишина
+def capture_stream(n_blocks: int) -> tuple[io.BytesIO, list[int]]:
+    values = [10000 + i if i % 2 == 0 else i for i in range(n_blocks)]
+    pcm = np.concatenate([np.full(BLOCK_SAMPLES, value, dtype=np.int16) for value in values])
+    return io.BytesIO(pcm.tobytes()), values
+
+
+def block_value(block: bytes) -> int:
+    samples = np.frombuffer(block, dtype=np.int16)
+    assert len(samples) == BLOCK_SAMPLES
+    assert (samples == samples[0]).all(), "блок перезаписан другим блоком"
+    return int(samples[0])
+
+
+def fill(audio_queue: BoundedAudioQueue, n_blocks: int) -> list[int]:
+    stream, values = capture_stream(n_blocks)
+    reader = BlockCaptureReader(stream, frame_bytes=FRAME_SAMPLES * 2, frames_per_block=FRAMES_PER_BLOCK)
+    while (block := reader.read_block()) is not None:
+        audio_queue.put(block)
+    return values
+
+
+def drain(audio_queue: BoundedAudioQueue) -> list[int]:
+    return [block_value(audio_queue.get(timeout=0)) for _ in range(audio_queue.qsize())]
+
+
+def test_drop_oldest_silence_keeps_queued_payloads():
+    audio_queue = BoundedAudioQueue(max_frames=4, policy="drop_oldest_silence")
+    values = fill(audio_queue, 8)
+    # Сначала выбрасываются тихие блоки 1, 3, 5, затем (тихих нет) самый старый — 0
+    assert drain(audio_queue) == [values[2], values[4], values[6], values[7]]
+    assert audio_queue.metrics["dropped_frames"] == 4
+
+
+def test_shed_to_disk_returns_all_blocks_in_order(tmp_path):
+    audio_queue = BoundedAudioQueue(max_frames=4, policy="shed_to_disk", spill_path=tmp_path / "spill.bin")
+    values = fill(audio_queue, 8)
+    assert audio_queue.metrics["spilled_frames"] == 4
+    assert drain(audio_queue) == values
+
+
+def test_block_policy_waits_for_reader():
+    audio_queue = BoundedAudioQueue(max_frames=4, policy="block")
+    received = []
+
+    def consume():
+        for _ in range(8):
+            received.append(block_value(audio_queue.get(timeout=5)))
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    values = fill(audio_queue, 8)
+    consumer.join(timeout=5)
+    assert received == values
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        BoundedAudioQueue(max_frames=4, policy="ring")
+
+
+def test_close_releases_blocked_writer_without_queueing():
+    audio_queue = BoundedAudioQueue(max_frames=1, policy="block")
+    audio_queue.put(b"\x00\x00" * BLOCK_SAMPLES)
+    writer = threading.Thread(target=audio_queue.put, args=(b"\x01\x00" * BLOCK_SAMPLES,))
+    writer.start()
+    writer.join(timeout=0.2)
+    assert writer.is_alive() # Ждет места в очереди
+
+    audio_queue.close()
+    writer.join(timeout=5)
+    assert not writer.is_alive()
+    assert audio_queue.qsize() == 1
+    assert audio_queue.get(timeout=0) == b"\x00\x00" * BLOCK_SAMPLES
+    with pytest.raises(queue.Empty):
+        audio_queue.get(timeout=0)
+
+
+def test_close_drops_spilled_frames(tmp_path):
+    audio_queue = BoundedAudioQueue(max_frames=2, policy="shed_to_disk", spill_path=tmp_path / "spill.bin")
+    fill(audio_queue, 5)
+    audio_queue.close()
+    assert not (tmp_path / "spill.bin").exists()
+    assert audio_queue.metrics["dropped_frames"] == 3
+    assert len(drain(audio_queue)) == 2
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from utils.audio_ring_buffer import AudioRingBuffer, int16_to_float32
+
+
+def samples(start: int, n: int) -> np.ndarray:
+    return np.arange(start, start + n, dtype=np.int16)
+
+
+def test_pop_returns_oldest_samples_in_order():
+    buffer = AudioRingBuffer(capacity=8, max_pop=4)
+    buffer.write(samples(0, 6))
+    assert buffer.pop(4).tolist() == [0, 1, 2, 3]
+    assert len(buffer) == 2
+
+
+def test_write_and_pop_across_wraparound():
+    buffer = AudioRingBuffer(capacity=8, max_pop=4)
+    buffer.write(samples(0, 6))
+    buffer.pop(4)
+    buffer.write(samples(6, 5)) # Запись переходит через конец массива
+    assert len(buffer) == 7
+    assert buffer.pop(4).tolist() == [4, 5, 6, 7]
+    assert buffer.pop(3).tolist() == [8, 9, 10]
+    assert buffer.dropped == 0
+
+
+def test_overflow_overwrites_oldest_samples():
+    buffer = AudioRingBuffer(capacity=8)
+    buffer.write(samples(0, 6))
+    buffer.write(samples(6, 5))
+    assert buffer.dropped == 3
+    assert buffer.to_float32().tolist() == (samples(3, 8) / 32768.0).astype(np.float32).tolist()
+
+
+def test_write_longer_than_capacity_keeps_tail():
+    buffer = AudioRingBuffer(capacity=4)
+    buffer.write(samples(0, 2))
+    buffer.write(samples(2, 6))
+    assert buffer.dropped == 4
+    assert buffer.pop(4).tolist() == [4, 5, 6, 7]
+
+
+def test_pop_more_than_buffered_is_rejected():
+    buffer = AudioRingBuffer(capacity=8)
+    buffer.write(samples(0, 3))
+    with pytest.raises(ValueError):
+        buffer.pop(4)
+    assert len(buffer) == 3
+
+
+def test_pop_larger_than_max_pop_grows_scratch():
+    buffer = AudioRingBuffer(capacity=8, max_pop=2)
+    buffer.write(samples(0, 5))
+    assert buffer.pop(5).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_discard_and_clear():
+    buffer = AudioRingBuffer(capacity=8)
+    buffer.write(samples(0, 5))
+    buffer.discard(2)
+    assert buffer.pop(1).tolist() == [2]
+    buffer.discard(10) # Больше, чем есть, — просто опустошает буфер
+    assert len(buffer) == 0
+    buffer.write(samples(0, 3))
+    buffer.clear()
+    assert len(buffer) == 0
+
+
+def test_to_float32_does_not_consume_samples():
+    buffer = AudioRingBuffer(capacity=8)
+    buffer.write(np.array([-32768, 0, 16384], dtype=np.int16))
+    assert buffer.to_float32().tolist() == [-1.0, 0.0, 0.5]
+    assert len(buffer) == 3
+
+
+def test_int16_to_float32_writes_into_given_array():
+    out = np.zeros(4, dtype=np.float32)
+    view = int16_to_float32(np.array([16384, -16384], dtype=np.int16), out)
+    assert view.tolist() == [0.5, -0.5]
+    assert np.shares_memory(view, out)
@@ -0,0 +1,65 @@
+import pytest
+
+import utils.cpu_budget as cpu_budget
+from utils.cpu_budget import CPUBudget, THREAD_ENV_VARS
+
+
+class FakeProcess:
+    def __init__(self):
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+
+@pytest.fixture
+def eight_cpus(monkeypatch):
+    monkeypatch.setattr(cpu_budget.os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+
+
+def test_reserved_cpus_are_left_to_server(eight_cpus):
+    budget = CPUBudget(reserved=None, max_per_bot=4)
+    assert budget.server_cpus == [0, 1]
+    assert budget.pool == [2, 3, 4, 5, 6, 7]
+
+
+def test_reserved_never_takes_every_cpu(eight_cpus):
+    assert CPUBudget(reserved=100).pool == [7]
+
+
+def test_bots_get_least_loaded_cpus(eight_cpus):
+    budget = CPUBudget(reserved=2, max_per_bot=4)
+    first = budget.allocate("a")
+    second = budget.allocate("b")
+    third = budget.allocate("c")
+    assert first.cpus == (2, 3, 4, 5) # Пустая машина: не больше max_per_bot
+    assert second.cpus == (2, 6, 7) # Пул на двоих: свободные 6, 7 и наименее занятое из остальных
+    assert third.cpus == (3, 4)
+    assert (first.threads, second.threads, third.threads) == (4, 3, 2)
+
+
+def test_release_frees_cpus_for_next_bot(eight_cpus):
+    budget = CPUBudget(reserved=2, max_per_bot=4)
+    budget.allocate("a")
+    budget.allocate("b")
+    budget.release("a")
+    assert list(budget.status()) == ["b"]
+    assert budget.allocate("c").cpus == (3, 4, 5)
+
+
+def test_exited_bot_is_reaped(eight_cpus):
+    budget = CPUBudget(reserved=2, max_per_bot=4)
+    budget.allocate("a")
+    process = FakeProcess()
+    budget.attach("a", process)
+    assert list(budget.status()) == ["a"]
+    process.returncode = 0
+    assert budget.status() == {}
+    assert budget.allocate("b").cpus == (2, 3, 4, 5)
+
+
+def test_allocation_env_limits_thread_pools(eight_cpus):
+    env = CPUBudget(reserved=2, max_per_bot=2).allocate("a").env()
+    assert all(env[name] == "2" for name in THREAD_ENV_VARS)
+    assert env["BOT_CPU_SET"] == "2,3"
+    assert env["BOT_NUM_THREADS"] == "2"
@@ -0,0 +1,35 @@
+from utils.endpointer import Endpointer, SPEECH_START, SPEECH, PAUSE, SILENCE
+
+WINDOW_MS = 512 / 16000 * 1000 # 32 мс
+
+
+def run(endpointer: Endpointer, probs: list[float]) -> list[str]:
+    return [endpointer.update(prob) for prob in probs]
+
+
+def test_speech_then_pause_ends_utterance_once():
+    endpointer = Endpointer()
+    silence_windows = int(endpointer.silence_limit_ms // WINDOW_MS) + 1
+    events = run(endpointer, [0.0, 0.9, 0.9, 0.9] + [0.0] * (silence_windows + 5))
+    assert events[:3] == [SILENCE, SPEECH_START, SPEECH]
+    assert events.count(PAUSE) == 1
+    assert events.index(PAUSE) > 4
+    assert not endpointer.is_speaking
+
+
+def test_smoothing_bridges_a_short_dip():
+    endpointer = Endpointer(threshold=0.5)
+    events = run(endpointer, [0.9, 0.9, 0.9, 0.2])
+    assert events[-1] == SPEECH # Среднее трех последних окон (0.67) еще выше порога
+
+
+def test_next_speech_after_pause_starts_new_utterance():
+    endpointer = Endpointer(silence_ms=WINDOW_MS * 2, smoothing=1)
+    events = run(endpointer, [0.9, 0.0, 0.0, 0.9])
+    assert events == [SPEECH_START, SILENCE, PAUSE, SPEECH_START]
+
+
+def test_min_speech_duration():
+    endpointer = Endpointer(min_speech_s=0.5)
+    assert endpointer.long_enough(0.5)
+    assert not endpointer.long_enough(0.3)
@@ -0,0 +1,57 @@
+import numpy as np
+
+from utils.energy_gate import EnergyGate
+
+WINDOW = 512
+
+
+# Окно float32 из int16-амплитуды: синус низкой частоты (голос) или знакопеременный сигнал (шум с высоким ZCR)
+def tone(amplitude: float, period: int = 64) -> np.ndarray:
+    t = np.arange(WINDOW)
+    return (amplitude / 32768.0 * np.sin(2 * np.pi * t / period)).astype(np.float32)
+
+
+def hiss(amplitude: float) -> np.ndarray:
+    return (amplitude / 32768.0 * np.where(np.arange(WINDOW) % 2 == 0, 1.0, -1.0)).astype(np.float32)
+
+
+def gate(hangover_windows: int = 0) -> EnergyGate:
+    return EnergyGate(silence_rms=50, noise_rms=150, noise_zcr=0.35, hangover_windows=hangover_windows)
+
+
+def test_digital_silence_is_quiet():
+    assert gate().is_quiet(np.zeros(WINDOW, dtype=np.float32))
+
+
+def test_quiet_noise_with_high_zcr_is_quiet_but_quiet_voice_is_not():
+    energy_gate = gate()
+    assert energy_gate.is_quiet(hiss(100))
+    assert not energy_gate.is_quiet(tone(140)) # Та же громкость, но переходов через ноль мало
+
+
+def test_loud_window_is_not_quiet():
+    assert not gate().is_quiet(hiss(2000))
+
+
+def test_zero_crossing_rate():
+    assert EnergyGate.zero_crossing_rate(hiss(1000)) == 1.0
+    assert EnergyGate.zero_crossing_rate(np.ones(WINDOW, dtype=np.float32)) == 0.0
+
+
+def test_hangover_passes_windows_after_speech():
+    energy_gate = gate(hangover_windows=2)
+    silence = np.zeros(WINDOW, dtype=np.float32)
+    decisions = [energy_gate.should_skip(window) for window in (silence, tone(3000), silence, silence, silence)]
+    assert decisions == [True, False, False, False, True]
+    assert energy_gate.stats() == {"windows": 5, "skipped": 2, "skipped_share": 0.4}
+
+
+def test_reset_drops_hangover():
+    energy_gate = gate(hangover_windows=5)
+    energy_gate.should_skip(tone(3000))
+    energy_gate.reset()
+    assert energy_gate.should_skip(np.zeros(WINDOW, dtype=np.float32))
+
+
+def test_stats_without_windows():
+    assert gate().stats()["skipped_share"] == 0.0
@@ -0,0 +1,52 @@
+import pytest
+
+from handlers.intent_router import IntentRouter, tokenize, has_phrase
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Стоп-фразы — только целыми словами
+    ("Мэри, стоп", ("stop", "")),
+    ("Мэри, закончи встречу.", ("stop", "")),
+    ("Мэри, стопка документов где?", None),
+    # Приветствие и явные команды
+    ("Мэри, привет!", ("greeting", None)),
+    ("Мэри, запиши, что бюджет утвержден", ("save", "Бюджет утвержден")),
+    ("Мэри, найди договор с Альфой", ("search", "договор с Альфой")),
+    ("Мэри, подскажи в базе номер договора", ("search", "номер договора")),
+    # Команды без текста и запись с относительной датой решает LLM
+    ("Мэри, найди", None),
+    ("Мэри, найди пожалуйста", None),
+    ("Мэри, запиши", None),
+    ("Мэри, запиши созвон на завтра в 14:00", None),
+    # Просьбы и вопросы без отсылки к базе знаний — не поиск
+    ("Мэри, напомни мне позвонить Ивану в 10", None),
+    ("Мэри, а ты не подскажешь, который час?", None),
+    ("Мэри, когда будет релиз?", None),
+    ("Мэри, я никогда не был в Париже", None),
+    ("Мэри, когда релиз по базе знаний?", ("search", "когда релиз по базе знаний?")),
+])
+def test_route(text, expected):
+    intent = IntentRouter().route(text)
+    if expected is None:
+        assert intent is None
+        return
+    name, payload = expected
+    assert intent.name == name
+    if payload is not None:
+        assert intent.text == payload
+
+
+def test_has_phrase_matches_whole_words():
+    words = [normalized for _, normalized in tokenize("Закончи встречу, пожалуйста")]
+    assert has_phrase(words, "закончи встречу")
+    assert not has_phrase(words, "встречу закончи")
+    assert not has_phrase(["стопка"], "стоп")
+
+
+def test_stats_count_fallbacks():
+    router = IntentRouter()
+    router.route("Мэри, привет")
+    router.route("Мэри, расскажи анекдот")
+    stats = router.stats()
+    assert stats["greeting"] == 1 and stats["llm_fallback"] == 1
+    assert stats["fast_path_share"] == 0.5
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+import handlers.llm_handler as llm_handler
+from handlers.llm_handler import SentenceBuffer, StreamedReply, llm_response_streamed
+
+
+# Режет строку на кусочки фиксированной длины, как дельты потока модели
+def deltas(raw: str, size: int) -> list[str]:
+    return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_streamed_reply_matches_json_for_any_split(size):
+    raw = json.dumps({"key": 3, "text": "Созвон в 14:00.\nВзять \"отчет\" и \\ таблицу — ok ✓"}, ensure_ascii=True)
+    reply = StreamedReply()
+    pieces = [reply.feed(delta) for delta in deltas(raw, size)]
+    assert reply.key == 3
+    assert reply.closed
+    assert "".join(pieces) == reply.text == json.loads(raw)["text"]
+
+
+def test_streamed_reply_waits_for_prefix():
+    reply = StreamedReply()
+    assert reply.feed('{"key": 1, "te') == ""
+    assert reply.key is None
+    assert reply.feed('xt": "план') == "план"
+    assert reply.key == 1
+
+
+def test_streamed_reply_ignores_text_after_closing_quote():
+    reply = StreamedReply()
+    reply.feed('{"key": 3, "text": "да"}')
+    assert reply.feed(' лишнее') == ""
+    assert reply.text == "да"
+
+
+def test_sentence_buffer_glues_short_sentences():
+    buffer = SentenceBuffer(min_chars=20)
+    assert buffer.feed("Да. Конечно. ") == []
+    assert buffer.feed("Встреча завтра в десять. Пока") == ["Да. Конечно. Встреча завтра в десять."]
+    assert buffer.flush() == ["Пока"]
+    assert buffer.flush() == []
+
+
+def test_sentence_buffer_waits_for_space_after_period():
+    buffer = SentenceBuffer(min_chars=1)
+    assert buffer.feed("В 14.") == [] # Точка без пробела может быть частью числа
+    assert buffer.feed("30 созвон.\nДалее") == ["В 14.30 созвон."]
+    assert buffer.flush() == ["Далее"]
+
+
+def test_llm_response_streamed_sends_reply_by_sentences(monkeypatch):
+    raw = json.dumps({"key": 3, "text": "Встреча с заказчиком перенесена на завтра на утро. Ссылку пришлю позже."}, ensure_ascii=False)
+    monkeypatch.setattr(llm_handler.llm_client, "stream_chat", lambda *args: iter(deltas(raw, 4)))
+    sent = []
+    assert llm_response_streamed("когда встреча", sent.append) == (3, json.loads(raw)["text"])
+    assert sent == ["Встреча с заказчиком перенесена на завтра на утро.", "Ссылку пришлю позже."]
+
+
+def test_llm_response_streamed_does_not_reply_for_other_keys(monkeypatch):
+    raw = '{"key": 0, "text": "Созвон в пятницу. Бюджет утвержден."}'
+    monkeypatch.setattr(llm_handler.llm_client, "stream_chat", lambda *args: iter(deltas(raw, 5)))
+    sent = []
+    assert llm_response_streamed("запиши", sent.append) == (0, "Созвон в пятницу. Бюджет утвержден.")
+    assert sent == []
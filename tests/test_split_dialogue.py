@@ -0,0 +1,42 @@
+from handlers.llm_handler import DialogueChunk, estimate_tokens, split_dialogue
+
+# Каждая реплика — 8 символов, то есть 3 токена по оценке estimate_tokens
+DIALOGUE = """[00:00:01 - 00:00:04] Реплика1
+[00:00:05 - 00:00:09] Реплика2
+
+[00:00:10 - 00:00:12] Реплика3
+[00:00:13 - 00:00:20] Реплика4"""
+
+
+def test_estimate_tokens_is_never_zero():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("Реплика1") == 3
+
+
+def test_short_dialogue_is_one_chunk_without_timestamps_in_text():
+    assert split_dialogue(DIALOGUE, max_tokens=100) == [
+        DialogueChunk("00:00:01", "00:00:20", "Реплика1\nРеплика2\nРеплика3\nРеплика4"),
+    ]
+
+
+def test_chunks_split_on_replica_boundaries_and_keep_time_range():
+    assert split_dialogue(DIALOGUE, max_tokens=6) == [
+        DialogueChunk("00:00:01", "00:00:09", "Реплика1\nРеплика2"),
+        DialogueChunk("00:00:10", "00:00:20", "Реплика3\nРеплика4"),
+    ]
+
+
+def test_replica_longer_than_budget_goes_alone():
+    dialogue = "[00:00:01 - 00:00:02] Да\n[00:00:03 - 00:01:00] " + "слово " * 20 + "\n[00:01:01 - 00:01:02] Нет"
+    chunks = split_dialogue(dialogue, max_tokens=5)
+    assert [chunk.text for chunk in chunks] == ["Да", ("слово " * 20).strip(), "Нет"]
+    assert [(chunk.start, chunk.end) for chunk in chunks] == [("00:00:01", "00:00:02"), ("00:00:03", "00:01:00"),
+                                                               ("00:01:01", "00:01:02")]
+
+
+def test_dialogue_without_timestamps():
+    assert split_dialogue("первая\nвторая", max_tokens=100) == [DialogueChunk(None, None, "первая\nвторая")]
+
+
+def test_empty_dialogue():
+    assert split_dialogue("\n  \n") == []
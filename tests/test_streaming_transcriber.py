@@ -0,0 +1,83 @@
+import numpy as np
+
+import handlers.streaming_transcriber as streaming_transcriber
+from handlers.streaming_transcriber import StreamingTranscriber, drop_overlapping_words, words_to_text
+from utils.asr_client import TranscriptionSegment, TranscriptionWord
+
+SAMPLE_RATE = 16000
+
+
+# Слова по 0.5 с подряд, начиная с start_s; пробел в начале, как у faster-whisper
+def words(text: str, start_s: float = 0.0) -> list[TranscriptionWord]:
+    return [TranscriptionWord(start=start_s + i * 0.5, end=start_s + (i + 1) * 0.5, word=" " + word)
+            for i, word in enumerate(text.split())]
+
+
+def audio(seconds: float) -> np.ndarray:
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+
+# Подменяет ASR: каждый вызов возвращает следующую гипотезу (слова относительно начала окна)
+def fake_asr(monkeypatch, hypotheses: list[list[TranscriptionWord]]):
+    calls = []
+
+    def transcribe_pcm(pcm, **kwargs):
+        calls.append(len(pcm) / SAMPLE_RATE)
+        hypothesis = hypotheses[len(calls) - 1]
+        return [TranscriptionSegment(start=0.0, end=hypothesis[-1].end, text=words_to_text(hypothesis), words=hypothesis)]
+
+    monkeypatch.setattr(streaming_transcriber, "transcribe_pcm", transcribe_pcm)
+    return calls
+
+
+def test_drop_overlapping_words_removes_repeated_tail():
+    committed = words("завтра в десять созвон")
+    new = words("Десять, созвон по проекту", start_s=1.0)
+    assert words_to_text(drop_overlapping_words(committed, new)) == "по проекту"
+
+
+def test_drop_overlapping_words_keeps_text_without_overlap():
+    new = words("по проекту")
+    assert drop_overlapping_words(words("завтра созвон"), new) == new
+    assert drop_overlapping_words([], new) == new
+
+
+def test_step_commits_words_agreed_by_two_hypotheses(monkeypatch):
+    fake_asr(monkeypatch, [words("завтра в"), words("завтра в десять"), words("завтра в десять созвон")])
+    transcriber = StreamingTranscriber(sample_rate=SAMPLE_RATE, max_window_s=10, overlap_s=1.0)
+
+    assert transcriber.step(audio(1)) == "завтра в"
+    assert transcriber.committed_text == ""
+    assert transcriber.step(audio(1.5)) == "завтра в десять"
+    assert transcriber.committed_text == "завтра в"
+    transcriber.step(audio(2))
+    assert transcriber.committed_text == "завтра в десять"
+
+
+def test_truncate_forgets_words_after_cut_and_rewinds_window(monkeypatch):
+    said = "раз два три четыре пять шесть"
+    fake_asr(monkeypatch, [words(said), words(said), words("три четыре пять", start_s=0.5)])
+    transcriber = StreamingTranscriber(sample_rate=SAMPLE_RATE, max_window_s=2, overlap_s=1.0)
+    transcriber.step(audio(3))
+    transcriber.step(audio(3.5))
+    assert transcriber.committed_text == said
+    assert transcriber.window_start == 2 * SAMPLE_RATE
+
+    transcriber.truncate(1.5)
+    assert transcriber.committed_text == "раз два три"
+    assert transcriber.last_committed_end == 1.5
+    assert transcriber.window_start == int(0.5 * SAMPLE_RATE)
+    # Хвост до разреза распознается заново с вернувшегося окна
+    assert transcriber.finalize(audio(2)) == "раз два три четыре пять"
+
+
+def test_truncate_before_first_word_clears_everything(monkeypatch):
+    fake_asr(monkeypatch, [words("раз два"), words("раз два")])
+    transcriber = StreamingTranscriber(sample_rate=SAMPLE_RATE, max_window_s=10, overlap_s=1.0)
+    transcriber.step(audio(1))
+    transcriber.step(audio(1))
+    transcriber.truncate(0.2)
+    assert transcriber.committed_words == []
+    assert transcriber.hypothesis_words == []
+    assert transcriber.last_committed_end == 0.0
+    assert transcriber.window_start == 0
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from server.TG_Bot.transcription_cache import TranscriptionCache
+
+
+def test_cancelled_caller_does_not_cancel_coalesced_request():
+    async def scenario():
+        cache = TranscriptionCache(max_items=8)
+        release = asyncio.Event()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "текст"
+
+        first = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await second == "текст"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert calls == 1
+        assert cache.counters["coalesced"] == 1
+        assert cache.get("key") == "текст"
+        assert cache.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_error_reaches_all_callers_and_is_not_cached():
+    async def scenario():
+        cache = TranscriptionCache(max_items=8)
+
+        async def compute():
+            await asyncio.sleep(0)
+            raise RuntimeError("ASR недоступен")
+
+        results = await asyncio.gather(cache.get_or_compute("key", compute), cache.get_or_compute("key", compute),
+                                       return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert cache.get("key") is None
+
+    asyncio.run(scenario())
+
+
+def test_memory_lru_and_disk_level(tmp_path):
+    cache = TranscriptionCache(max_items=1, disk_dir=tmp_path, max_disk_bytes=1024 * 1024)
+
+    async def fill():
+        for key in ("a", "b"):
+            await cache.get_or_compute(key, lambda key=key: asyncio.sleep(0, result=f"текст {key}"))
+
+    asyncio.run(fill())
+    assert list(cache._memory) == ["b"]
+    assert cache.get("a") == "текст a" # Вытеснен из памяти, но остался на диске
+    assert cache.counters["disk_hits"] == 1
+
+
+def test_key_depends_on_audio_and_params():
+    key = TranscriptionCache.make_key(b"audio", "model", 5, "ru")
+    assert key == TranscriptionCache.make_key(b"audio", "model", 5, "ru")
+    assert key != TranscriptionCache.make_key(b"audio", "model", 1, "ru")
+    assert key != TranscriptionCache.make_key(b"other", "model", 5, "ru")
@@ -0,0 +1,76 @@
+# Замер скорости Whisper для разных профилей на эталонной записи.
+# Запуск: python -m utils.asr_benchmark --clip sample.wav [--profiles cpu_int8,gpu_fp16] [--runs 3]
+
+import argparse
+import time
+
+from faster_whisper import decode_audio
+
+from config.config import STREAM_SAMPLE_RATE
+from config.asr_profile import build_profiles, select_asr_profile
+from config.load_models import download_asr_model, load_whisper
+
+
+def benchmark_profile(local_path: str, profile, audio, runs: int) -> dict:
+    load_started = time.perf_counter()
+    model = load_whisper(local_path, profile)
+    load_seconds = time.perf_counter() - load_started
+
+    # Первый прогон не учитываем: в нем инициализация ядер и аллокаторов
+    segments, _ = model.transcribe(audio[:STREAM_SAMPLE_RATE * 5], beam_size=1, language="ru", vad_filter=False)
+    list(segments)
+
+    audio_seconds = len(audio) / STREAM_SAMPLE_RATE
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        segments, _ = model.transcribe(audio, beam_size=1, language="ru", condition_on_previous_text=False, vad_filter=False)
+        list(segments)
+        timings.append(time.perf_counter() - started)
+
+    best = min(timings)
+    return {
+        "profile": profile.name,
+        "device": profile.device,
+        "compute_type": profile.compute_type,
+        "cpu_threads": profile.cpu_threads,
+        "num_workers": profile.num_workers,
+        "load_s": load_seconds,
+        "best_s": best,
+        "rtf": best / audio_seconds, # Меньше 1 — быстрее реального времени
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнивает real-time factor Whisper для профилей ASR.")
+    parser.add_argument("--clip", required=True, help="Путь к эталонной записи (любой формат, понятный ffmpeg).")
+    parser.add_argument("--profiles", default="", help="Профили через запятую. По умолчанию — все, доступные на машине.")
+    parser.add_argument("--runs", type=int, default=3, help="Количество замеров на профиль.")
+    args = parser.parse_args()
+
+    import ctranslate2
+
+    profiles = build_profiles()
+    if args.profiles:
+        selected = [profiles[name] for name in args.profiles.split(",")]
+    else:
+        has_cuda = ctranslate2.get_cuda_device_count() > 0
+        selected = [p for p in profiles.values() if p.device == "cpu" or has_cuda]
+
+    audio = decode_audio(args.clip, sampling_rate=STREAM_SAMPLE_RATE)
+    local_path = download_asr_model()
+    print(f"Запись: {args.clip}, {len(audio) / STREAM_SAMPLE_RATE:.1f} с. Автовыбор на этой машине: {select_asr_profile().name}")
+
+    print(f"{'профиль':<12}{'device':<8}{'compute':<14}{'threads':>8}{'workers':>8}{'load, с':>10}{'best, с':>10}{'RTF':>8}")
+    for profile in selected:
+        try:
+            r = benchmark_profile(local_path, profile, audio, args.runs)
+        except Exception as e:
+            print(f"{profile.name:<12} ошибка: {e}")
+            continue
+        print(f"{r['profile']:<12}{r['device']:<8}{r['compute_type']:<14}{r['cpu_threads']:>8}{r['num_workers']:>8}"
+              f"{r['load_s']:>10.1f}{r['best_s']:>10.2f}{r['rtf']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
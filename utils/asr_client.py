@@ -0,0 +1,89 @@
+import logging
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import requests
+
+from config.config import ASR_SERVICE_URL, ASR_SERVICE_TIMEOUT_S, INTERNAL_API_KEY, API_KEY_NAME
+
+logger = logging.getLogger(__name__)
+
+# Одна сессия на процесс, чтобы переиспользовать keep-alive соединение с сервисом
+_session = requests.Session()
+
+MAX_QUEUE_RETRIES = 3 # Сколько раз повторяем запрос, если очередь ASR переполнена (429)
+MAX_RETRY_AFTER_S = 5.0
+
+
+@dataclass
+class TranscriptionWord:
+    start: float
+    end: float
+    word: str
+
+
+@dataclass
+class TranscriptionSegment:
+    """Сегмент транскрибации, повторяет нужные нам поля сегмента faster-whisper."""
+    start: float
+    end: float
+    text: str
+    words: list[TranscriptionWord] | None = None
+
+
+def _headers() -> dict:
+    return {API_KEY_NAME: INTERNAL_API_KEY} if API_KEY_NAME else {}
+
+
+def _parse_segments(payload: dict) -> list[TranscriptionSegment]:
+    segments = []
+    for seg in payload.get("segments", []):
+        words = None
+        if "words" in seg:
+            words = [TranscriptionWord(start=w["start"], end=w["end"], word=w["word"]) for w in seg["words"]]
+        segments.append(TranscriptionSegment(start=seg["start"], end=seg["end"], text=seg["text"], words=words))
+    return segments
+
+
+# Транскрибация фрагмента аудио (float32, 16 кГц, моно) через общий ASR-сервис
+# word_timestamps=True нужен для потоковой транскрибации (такие запросы не попадают в батчи).
+# priority: "high" — обращение к ассистенту, "background" — обычная речь, которая может подождать батча
+def transcribe_pcm(audio: np.ndarray, beam_size: int = 1, best_of: int = 1, language: str = "ru", word_timestamps: bool = False,
+                   priority: str = "normal") -> list[TranscriptionSegment]:
+    audio_bytes = np.ascontiguousarray(audio, dtype=np.float32).tobytes()
+    for attempt in range(MAX_QUEUE_RETRIES + 1):
+        response = _session.post(
+            f"{ASR_SERVICE_URL}/api/v1/internal/asr/transcribe",
+            params={
+                "beam_size": beam_size, "best_of": best_of, "language": language,
+                "word_timestamps": int(word_timestamps), "priority": priority
+            },
+            data=audio_bytes,
+            headers={**_headers(), "Content-Type": "application/octet-stream"},
+            timeout=ASR_SERVICE_TIMEOUT_S
+        )
+        if response.status_code != 429 or attempt == MAX_QUEUE_RETRIES:
+            break
+        retry_after = min(float(response.headers.get("Retry-After", 1)), MAX_RETRY_AFTER_S)
+        logger.warning(f"Очередь ASR переполнена, повтор через {retry_after:.0f} с (попытка {attempt + 1}/{MAX_QUEUE_RETRIES})")
+        time.sleep(retry_after)
+
+    response.raise_for_status()
+    payload = response.json()
+    if "timings" in payload:
+        logger.debug(f"ASR: ожидание в очереди {payload['timings']['queue_wait_ms']} мс, "
+                     f"инференс {payload['timings']['inference_ms']} мс, батч {payload['timings']['batch_size']}")
+    return _parse_segments(payload)
+
+
+# Транскрибация файла, лежащего на той же машине, что и ASR-сервис
+def transcribe_file(path: str, beam_size: int = 3, best_of: int = 3, language: str = "ru") -> list[TranscriptionSegment]:
+    response = _session.post(
+        f"{ASR_SERVICE_URL}/api/v1/internal/asr/transcribe-file",
+        json={"path": path, "beam_size": beam_size, "best_of": best_of, "language": language},
+        headers=_headers(),
+        timeout=None # Длинные записи могут обрабатываться десятки минут
+    )
+    response.raise_for_status()
+    return _parse_segments(response.json())
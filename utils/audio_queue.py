@@ -0,0 +1,204 @@
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+from config.config import STREAM_SAMPLE_RATE, MEET_AUDIO_CHUNKS_DIR
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("block", "drop_oldest_silence", "shed_to_disk")
+_SPILL_HEADER = struct.Struct("<dI") # Время захвата кадра и длина кадра в байтах
+SPILL_READ_FRAMES = 256 # Сколько кадров за раз поднимать с диска обратно в память
+
+
+def queue_metrics_path(meeting_id: str) -> Path:
+    return MEET_AUDIO_CHUNKS_DIR / meeting_id / "queue_metrics.json"
+
+
+class BoundedAudioQueue:
+    """
+    Очередь кадров PCM (int16) между захватом и VAD с ограниченным объемом.
+    Кадром считается любой элемент put — захват кладет блоки из нескольких кадров VAD.
+    memoryview на буфер захвата копируется при постановке: политики переполнения
+    выбрасывают и выгружают кадры не по порядку, и буфер не может ждать своей очереди.
+
+    Интерфейс совпадает с queue.Queue в той части, что нужна AudioHandler
+    (put, get с тайм-аутом, qsize, empty). Когда в памяти max_frames кадров,
+    put поступает по политике:
+      - block — ждет, пока VAD освободит место (отстает захват, копится задержка в parec);
+      - drop_oldest_silence — выбрасывает самый старый тихий кадр, а если тихих нет — самый старый;
+      - shed_to_disk — дописывает кадры во временный файл и возвращает их в очередь по мере разбора.
+    """
+
+    def __init__(self, max_frames: int, policy: str = "drop_oldest_silence", silence_rms: int = 300,
+                 spill_path: Path | None = None, sample_rate: int = STREAM_SAMPLE_RATE):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Неизвестная политика очереди: {policy}")
+        if policy == "shed_to_disk" and spill_path is None:
+            raise ValueError("Для shed_to_disk нужен spill_path")
+        self.max_frames = max_frames
+        self.policy = policy
+        self.silence_rms = silence_rms
+        self.sample_rate = sample_rate
+        self.spill_path = spill_path
+
+        self._frames: deque[tuple[bytes, float, bool]] = deque() # (кадр, время захвата, тишина)
+        self._condition = threading.Condition()
+        self._spill_file = None
+        self._spilled_frames = 0
+        self._spilled_bytes = 0
+        self._spill_read_pos = 0
+        self._queued_bytes = 0
+        self._closed = False
+
+        self.metrics = {
+            "dropped_frames": 0,
+            "dropped_seconds": 0.0,
+            "spilled_frames": 0,
+            "blocked_seconds": 0.0,
+            "max_depth": 0,
+            "lag_seconds": 0.0, # Сколько времени прошло с захвата кадра, который VAD забрал последним
+        }
+
+    def _is_silent(self, frame: bytes) -> bool:
+        samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        return bool(len(samples)) and float(np.sqrt(np.mean(samples * samples))) < self.silence_rms
+
+    def qsize(self) -> int:
+        with self._condition:
+            return len(self._frames) + self._spilled_frames
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def backlog_seconds(self) -> float:
+        with self._condition:
+            return (self._queued_bytes + self._spilled_bytes) / 2 / self.sample_rate
+
+    def put(self, frame: bytes | memoryview):
+        frame = bytes(frame) # Для bytes копии нет
+        captured_at = time.time()
+        silent = self.policy == "drop_oldest_silence" and self._is_silent(frame)
+        with self._condition:
+            if self._closed:
+                return
+            if self._spilled_frames: # Пока на диске есть кадры, новые идут туда же, чтобы не нарушить порядок
+                self._spill(frame, captured_at)
+            elif len(self._frames) >= self.max_frames:
+                if self.policy == "block":
+                    started = time.monotonic()
+                    while len(self._frames) >= self.max_frames and not self._closed:
+                        self._condition.wait()
+                    self.metrics["blocked_seconds"] += time.monotonic() - started
+                    if self._closed: # Разбудил close: кадр в закрытую очередь не кладем
+                        return
+                    self._append(frame, captured_at, silent)
+                elif self.policy == "drop_oldest_silence":
+                    self._drop_one()
+                    self._append(frame, captured_at, silent)
+                else:
+                    self._spill(frame, captured_at)
+            else:
+                self._append(frame, captured_at, silent)
+            depth = len(self._frames) + self._spilled_frames
+            self.metrics["max_depth"] = max(self.metrics["max_depth"], depth)
+            self._condition.notify_all()
+
+    def _append(self, frame: bytes, captured_at: float, silent: bool):
+        self._frames.append((frame, captured_at, silent))
+        self._queued_bytes += len(frame)
+
+    def _drop_one(self):
+        index = next((i for i, (_, _, silent) in enumerate(self._frames) if silent), 0)
+        frame, _, _ = self._frames[index]
+        del self._frames[index]
+        self._queued_bytes -= len(frame)
+        self.metrics["dropped_frames"] += 1
+        self.metrics["dropped_seconds"] += len(frame) / 2 / self.sample_rate
+
+    def _spill(self, frame: bytes, captured_at: float):
+        if self._spill_file is None:
+            self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+            self._spill_file = open(self.spill_path, "w+b")
+            logger.warning(f"Очередь аудио переполнена, сбрасываю кадры на диск: {self.spill_path}")
+        self._spill_file.seek(0, os.SEEK_END)
+        self._spill_file.write(_SPILL_HEADER.pack(captured_at, len(frame)) + frame)
+        self._spilled_frames += 1
+        self._spilled_bytes += len(frame)
+        self.metrics["spilled_frames"] += 1
+
+    # Поднимает следующую порцию кадров с диска; когда файл прочитан до конца, он обнуляется
+    def _unspill(self):
+        self._spill_file.seek(self._spill_read_pos)
+        for _ in range(min(SPILL_READ_FRAMES, self._spilled_frames)):
+            captured_at, length = _SPILL_HEADER.unpack(self._spill_file.read(_SPILL_HEADER.size))
+            frame = self._spill_file.read(length)
+            self._append(frame, captured_at, False)
+            self._spilled_frames -= 1
+            self._spilled_bytes -= length
+        self._spill_read_pos = self._spill_file.tell()
+        if not self._spilled_frames:
+            self._spill_file.seek(0)
+            self._spill_file.truncate()
+            self._spill_read_pos = 0
+
+    def get(self, timeout: float | None = None) -> bytes:
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._frames or self._spilled_frames or self._closed, timeout):
+                raise queue.Empty
+            if not self._frames and (self._closed or not self._spilled_frames):
+                raise queue.Empty # Очередь закрыта: кадры в памяти еще отдаем, файл выгрузки уже удален
+            if not self._frames:
+                self._unspill()
+            frame, captured_at, _ = self._frames.popleft()
+            self._queued_bytes -= len(frame)
+            self.metrics["lag_seconds"] = time.time() - captured_at
+            self._condition.notify_all()
+            return frame
+
+    def snapshot(self) -> dict:
+        with self._condition:
+            return {
+                **self.metrics,
+                "policy": self.policy,
+                "depth_frames": len(self._frames) + self._spilled_frames,
+                "capacity_frames": self.max_frames,
+                "backlog_seconds": (self._queued_bytes + self._spilled_bytes) / 2 / self.sample_rate,
+                "updated_at": time.time(),
+            }
+
+    # Метрики пишутся в файл встречи, откуда их читает /status сервера (боты — отдельные процессы)
+    def write_metrics(self, path: Path, capture: dict | None = None):
+        snapshot = self.snapshot()
+        if capture is not None:
+            snapshot["capture"] = capture # Статистика источника захвата (бэкенд, переполнения)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(snapshot))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.debug(f"Не удалось записать метрики очереди: {e}")
+
+    # Остановка встречи: put больше ничего не принимает и не блокирует захват
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+                self.spill_path.unlink(missing_ok=True)
+            # Невычитанные кадры выгрузки пропали вместе с файлом — учитываем их как потерянные
+            self.metrics["dropped_frames"] += self._spilled_frames
+            self.metrics["dropped_seconds"] += self._spilled_bytes / 2 / self.sample_rate
+            self._spilled_frames = 0
+            self._spilled_bytes = 0
@@ -0,0 +1,86 @@
+import numpy as np
+
+INT16_SCALE = 1.0 / 32768.0
+
+
+def int16_to_float32(samples: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """Переводит int16 в float32 [-1, 1) в заранее выделенный массив out (без аллокаций)."""
+    view = out[:len(samples)]
+    np.multiply(samples, INT16_SCALE, out=view, casting="unsafe")
+    return view
+
+
+class AudioRingBuffer:
+    """
+    Кольцевой буфер int16-семплов фиксированной емкости.
+
+    Запись и чтение копируют данные в заранее выделенные массивы, поэтому в
+    горячем цикле VAD нет аллокаций и склеек. При переполнении затираются
+    самые старые семплы (их число копится в dropped).
+    """
+
+    def __init__(self, capacity: int, max_pop: int = 0):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.int16)
+        self._start = 0 # Индекс самого старого семпла
+        self._size = 0
+        self._pop_scratch = np.zeros(max(max_pop, 1), dtype=np.int16)
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+
+    def write(self, samples: np.ndarray):
+        n = len(samples)
+        if n >= self.capacity: # Влезает только хвост
+            self.dropped += self._size + n - self.capacity
+            self._data[:] = samples[n - self.capacity:]
+            self._start, self._size = 0, self.capacity
+            return
+
+        overflow = self._size + n - self.capacity
+        if overflow > 0:
+            self.dropped += overflow
+            self._start = (self._start + overflow) % self.capacity
+            self._size -= overflow
+
+        end = (self._start + self._size) % self.capacity
+        first = min(n, self.capacity - end)
+        self._data[end:end + first] = samples[:first]
+        if first < n:
+            self._data[:n - first] = samples[first:]
+        self._size += n
+
+    def _copy_out(self, out: np.ndarray, n: int):
+        first = min(n, self.capacity - self._start)
+        out[:first] = self._data[self._start:self._start + first]
+        if first < n:
+            out[first:n] = self._data[:n - first]
+
+    # Забирает n самых старых семплов. Возвращает вид на внутренний массив, действительный до следующего pop
+    def pop(self, n: int) -> np.ndarray:
+        if n > self._size:
+            raise ValueError(f"В буфере {self._size} семплов, запрошено {n}")
+        if n > len(self._pop_scratch):
+            self._pop_scratch = np.zeros(n, dtype=np.int16)
+        out = self._pop_scratch[:n]
+        self._copy_out(out, n)
+        self._start = (self._start + n) % self.capacity
+        self._size -= n
+        return out
+
+    # Выбрасывает n самых старых семплов без копирования
+    def discard(self, n: int):
+        n = min(n, self._size)
+        self._start = (self._start + n) % self.capacity
+        self._size -= n
+
+    # Непрерывная копия содержимого в float32 — для передачи в ASR
+    def to_float32(self) -> np.ndarray:
+        contiguous = np.empty(self._size, dtype=np.int16)
+        self._copy_out(contiguous, self._size)
+        return int16_to_float32(contiguous, np.empty(self._size, dtype=np.float32))
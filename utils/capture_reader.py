@@ -0,0 +1,35 @@
+class BlockCaptureReader:
+    """
+    Читает PCM из потока (stdout parec) крупными блоками через readinto.
+
+    Блок — несколько кадров VAD подряд; данные читаются в один заранее
+    выделенный буфер и отдаются как memoryview без копирования. Следующий
+    read_block перезаписывает буфер, поэтому тот, кто хранит блок дольше
+    (BoundedAudioQueue), копирует его сам.
+    """
+
+    def __init__(self, stream, frame_bytes: int, frames_per_block: int):
+        self.stream = stream
+        self.frame_bytes = frame_bytes
+        self.block_bytes = frame_bytes * frames_per_block
+        self._buffer = bytearray(self.block_bytes)
+        self.blocks = 0
+        self.reads = 0
+
+    # Следующий блок целых кадров (действителен до следующего вызова); None — поток закончился
+    def read_block(self) -> memoryview | None:
+        view = memoryview(self._buffer)
+
+        filled = 0
+        while filled < self.block_bytes:
+            n_bytes = self.stream.readinto(view[filled:])
+            self.reads += 1
+            if not n_bytes:
+                break
+            filled += n_bytes
+
+        filled -= filled % self.frame_bytes # Неполный кадр в конце потока отбрасываем
+        if not filled:
+            return None
+        self.blocks += 1
+        return view[:filled]
@@ -0,0 +1,117 @@
+import logging
+import os
+import subprocess
+import sys
+import threading
+from dataclasses import dataclass
+
+from config.config import BOT_CPU_RESERVED, BOT_CPU_MAX_PER_BOT
+
+logger = logging.getLogger(__name__)
+
+# Переменные окружения, которыми библиотеки ограничивают свои пулы потоков
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS", "VECLIB_MAXIMUM_THREADS")
+
+
+@dataclass(frozen=True)
+class CPUAllocation:
+    cpus: tuple[int, ...]
+    threads: int
+
+    def env(self) -> dict[str, str]:
+        env = {name: str(self.threads) for name in THREAD_ENV_VARS}
+        env["BOT_CPU_SET"] = ",".join(map(str, self.cpus))
+        env["BOT_NUM_THREADS"] = str(self.threads)
+        return env
+
+
+class CPUBudget:
+    """
+    Распределяет ядра машины между процессами ботов.
+
+    Первые BOT_CPU_RESERVED ядер остаются серверу (Whisper, общий VAD). Остальные
+    делятся между живыми ботами: новый бот получает len(pool) / (ботов + 1) ядер,
+    но не больше BOT_CPU_MAX_PER_BOT, выбирая наименее занятые. Уже запущенные
+    боты свои наборы не меняют, поэтому при большой нагрузке наборы пересекаются.
+    Число потоков библиотек в боте равно числу его ядер.
+    """
+
+    def __init__(self, reserved: int | None = BOT_CPU_RESERVED, max_per_bot: int = BOT_CPU_MAX_PER_BOT):
+        try:
+            all_cpus = sorted(os.sched_getaffinity(0))
+        except AttributeError:
+            all_cpus = list(range(os.cpu_count() or 1))
+        reserved = len(all_cpus) // 4 if reserved is None else reserved
+        reserved = min(reserved, len(all_cpus) - 1)
+        self.server_cpus = all_cpus[:reserved]
+        self.pool = all_cpus[reserved:]
+        self.max_per_bot = max(1, max_per_bot)
+        self._allocations: dict[str, CPUAllocation] = {}
+        self._processes: dict[str, subprocess.Popen] = {} # Процессы ботов, чтобы вернуть ядра тех, кто завершился сам
+        self._lock = threading.Lock()
+
+    # Боты, которые завершились без stop_bot_process (конец встречи, падение), держат ядра до следующего allocate
+    def _reap_locked(self):
+        for meeting_id, process in list(self._processes.items()):
+            if process.poll() is not None:
+                self._processes.pop(meeting_id)
+                self._allocations.pop(meeting_id, None)
+                logger.info(f"[{meeting_id}] Бот завершился (код {process.returncode}), ядра освобождены")
+
+    def allocate(self, meeting_id: str) -> CPUAllocation:
+        with self._lock:
+            self._reap_locked()
+            self._allocations.pop(meeting_id, None)
+            self._processes.pop(meeting_id, None)
+            live = len(self._allocations) + 1
+            per_bot = max(1, min(self.max_per_bot, len(self.pool) // live))
+
+            load = {cpu: 0 for cpu in self.pool}
+            for allocation in self._allocations.values():
+                for cpu in allocation.cpus:
+                    load[cpu] += 1
+            cpus = tuple(sorted(sorted(self.pool, key=lambda cpu: (load[cpu], cpu))[:per_bot]))
+
+            allocation = CPUAllocation(cpus=cpus, threads=len(cpus))
+            self._allocations[meeting_id] = allocation
+        logger.info(f"[{meeting_id}] Бюджет CPU: ядра {list(cpus)}, потоков {allocation.threads} "
+                    f"(живых ботов {live}, пул {len(self.pool)} ядер, серверу {len(self.server_cpus)})")
+        return allocation
+
+    # Запомнить процесс бота, получившего ядра
+    def attach(self, meeting_id: str, process: subprocess.Popen):
+        with self._lock:
+            if meeting_id in self._allocations:
+                self._processes[meeting_id] = process
+
+    def release(self, meeting_id: str):
+        with self._lock:
+            self._processes.pop(meeting_id, None)
+            if self._allocations.pop(meeting_id, None):
+                logger.info(f"[{meeting_id}] Ядра бота освобождены, живых ботов {len(self._allocations)}")
+
+    def status(self) -> dict:
+        with self._lock:
+            self._reap_locked()
+            return {meeting_id: list(a.cpus) for meeting_id, a in self._allocations.items()}
+
+
+# Вызывается в процессе бота: проверяет привязку к ядрам и ограничивает потоки уже загруженных библиотек.
+# Пулы OpenMP/MKL ограничены переменными окружения еще до импорта numpy и torch
+def apply_process_budget():
+    threads = os.getenv("BOT_NUM_THREADS")
+    if not threads:
+        return
+    threads = int(threads)
+
+    cpu_set = os.getenv("BOT_CPU_SET")
+    if cpu_set and hasattr(os, "sched_setaffinity"):
+        cpus = {int(cpu) for cpu in cpu_set.split(",")}
+        if os.sched_getaffinity(0) != cpus:
+            os.sched_setaffinity(0, cpus)
+
+    if "torch" in sys.modules:
+        torch = sys.modules["torch"]
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    logger.info(f"Бюджет процесса: ядра {cpu_set}, потоков {threads}")
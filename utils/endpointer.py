@@ -0,0 +1,62 @@
+from collections import deque
+
+from config.config import STREAM_SAMPLE_RATE
+
+VAD_WINDOW_SAMPLES = 512 # Окно Silero при 16 кГц
+VAD_THRESHOLD = 0.1 # Сглаженная вероятность речи, выше которой окно считается речью
+SILENCE_DURATION_MS = 600 # Сколько тишины после речи нужно для конца реплики
+MIN_SPEECH_DURATION_S = 0.5 # Реплики короче отбрасываются
+SMOOTHING_WINDOWS = 3 # По скольким последним окнам усредняется вероятность
+
+# События update
+SPEECH_START = "speech_start" # Первое окно речи после тишины
+SPEECH = "speech"
+PAUSE = "pause" # Накопилась пауза после речи: реплика закончена
+SILENCE = "silence"
+
+
+class Endpointer:
+    """
+    Правила нарезки потока на реплики по вероятностям VAD.
+
+    Одни и те же для бота встречи (AudioHandler) и проверки пре-гейта
+    (utils.vad_gate_compare). Вероятность окна сглаживается средним по последним
+    smoothing окнам; после речи паузу длиной silence_ms update сообщает один раз
+    событием PAUSE. Буфер речи держит вызывающий: по long_enough он решает,
+    отдать реплику или выбросить.
+    """
+
+    def __init__(self, threshold: float = VAD_THRESHOLD, silence_ms: float = SILENCE_DURATION_MS,
+                 min_speech_s: float = MIN_SPEECH_DURATION_S, smoothing: int = SMOOTHING_WINDOWS,
+                 window_samples: int = VAD_WINDOW_SAMPLES, sample_rate: int = STREAM_SAMPLE_RATE):
+        self.threshold = threshold
+        self.silence_limit_ms = silence_ms
+        self.min_speech_s = min_speech_s
+        self.window_ms = window_samples / sample_rate * 1000
+        self._recent = deque(maxlen=smoothing)
+        self.is_speaking = False
+        self.silence_ms = 0.0
+
+    def update(self, prob: float) -> str:
+        self._recent.append(prob)
+        if sum(self._recent) / len(self._recent) > self.threshold:
+            started = not self.is_speaking
+            self.is_speaking = True
+            self.silence_ms = 0.0
+            return SPEECH_START if started else SPEECH
+
+        if not self.is_speaking:
+            return SILENCE
+        self.silence_ms += self.window_ms
+        if self.silence_ms < self.silence_limit_ms:
+            return SILENCE
+        self.reset()
+        return PAUSE
+
+    def long_enough(self, speech_s: float) -> bool:
+        return speech_s >= self.min_speech_s
+
+    # Прерывание реплики без паузы (например, поток аудио замолчал)
+    def reset(self):
+        self.is_speaking = False
+        self.silence_ms = 0.0
@@ -0,0 +1,58 @@
+import numpy as np
+
+from config.config import (VAD_GATE_SILENCE_RMS, VAD_GATE_NOISE_RMS, VAD_GATE_NOISE_ZCR, VAD_GATE_HANGOVER_WINDOWS)
+
+
+class EnergyGate:
+    """
+    Дешевый пре-гейт перед нейросетевым VAD: окно, которое заведомо тишина, Silero не получает.
+
+    Тишиной считается окно с RMS ниже silence_rms (цифровая тишина null-sink и фон)
+    или тихое окно (RMS ниже noise_rms) с высокой долей переходов через ноль — шум без
+    голоса. Пороги заданы в единицах int16, окно приходит во float32 [-1, 1].
+    После любого громкого окна еще hangover_windows окон идут в VAD без проверки,
+    чтобы не обрезать затухание фразы и не пропустить тихое начало следующей.
+    """
+
+    def __init__(self, silence_rms: float = VAD_GATE_SILENCE_RMS, noise_rms: float = VAD_GATE_NOISE_RMS,
+                 noise_zcr: float = VAD_GATE_NOISE_ZCR, hangover_windows: int = VAD_GATE_HANGOVER_WINDOWS):
+        self._silence_energy = (silence_rms / 32768.0) ** 2
+        self._noise_energy = (noise_rms / 32768.0) ** 2
+        self.noise_zcr = noise_zcr
+        self.hangover_windows = hangover_windows
+        self._hangover_left = 0
+        self.windows = 0
+        self.skipped = 0
+
+    @staticmethod
+    def zero_crossing_rate(window: np.ndarray) -> float:
+        signs = np.signbit(window)
+        return np.count_nonzero(signs[1:] != signs[:-1]) / (len(window) - 1)
+
+    def is_quiet(self, window: np.ndarray) -> bool:
+        energy = float(np.dot(window, window)) / len(window)
+        if energy < self._silence_energy:
+            return True
+        return energy < self._noise_energy and self.zero_crossing_rate(window) > self.noise_zcr
+
+    # True — окно можно не отдавать в VAD и считать его вероятность речи нулевой
+    def should_skip(self, window: np.ndarray) -> bool:
+        self.windows += 1
+        if not self.is_quiet(window):
+            self._hangover_left = self.hangover_windows
+            return False
+        if self._hangover_left > 0:
+            self._hangover_left -= 1
+            return False
+        self.skipped += 1
+        return True
+
+    def reset(self):
+        self._hangover_left = 0
+
+    def stats(self) -> dict:
+        return {
+            "windows": self.windows,
+            "skipped": self.skipped,
+            "skipped_share": round(self.skipped / self.windows, 3) if self.windows else 0.0,
+        }
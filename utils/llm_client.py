@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import queue
+import random
+import threading
+from collections.abc import Iterator
+from concurrent.futures import Future
+
+import httpx
+from openai import (AsyncOpenAI, DefaultAsyncHttpxClient, APIConnectionError, APITimeoutError, RateLimitError,
+                    InternalServerError)
+
+from config.config import (LLM_API_KEY, LLM_BASE_URL, LLM_TIMEOUT_S, LLM_MAX_RETRIES, LLM_RETRY_BASE_S, LLM_MAX_CONCURRENCY,
+                           LLM_MAX_CONNECTIONS)
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, после которых запрос имеет смысл повторить: сеть, тайм-аут, лимиты и 5xx прокси
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)
+
+
+class AsyncLLMClient:
+    """
+    Асинхронный клиент LLM на один процесс.
+
+    Все запросы выполняются в собственном цикле событий в фоновом потоке: AsyncOpenAI
+    держит общий пул соединений, семафор ограничивает число одновременных запросов
+    процесса, неудачные запросы повторяются с экспоненциальной задержкой и случайным
+    разбросом. Код вне цикла отдает корутины через submit и получает результат в
+    колбэке Future, не занимая поток на время запроса; run, который ждет ответ
+    в вызывающем потоке, остается для синхронных оберток (постобработка, сайт).
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, max_retries: int = LLM_MAX_RETRIES):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._client: AsyncOpenAI | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="LLMClientLoop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    # Клиент и семафор создаются внутри цикла клиента, чтобы пул соединений принадлежал ему
+    def _client_and_semaphore(self) -> tuple[AsyncOpenAI, asyncio.Semaphore]:
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=LLM_API_KEY,
+                base_url=LLM_BASE_URL,
+                timeout=LLM_TIMEOUT_S,
+                max_retries=0, # Повторы делаем сами, с разбросом и под семафором
+                http_client=DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS)
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client, self._semaphore
+
+    async def chat(self, system_prompt: str, user_text: str, model: str) -> str:
+        client, semaphore = self._client_and_semaphore()
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with semaphore:
+                    chat_completion = await client.chat.completions.create(
+                        model=model,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": user_text}
+                        ]
+                    )
+                return chat_completion.choices[0].message.content or ""
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                await self._retry_pause(attempt, e)
+
+    async def _retry_pause(self, attempt: int, error: Exception):
+        delay = LLM_RETRY_BASE_S * 2 ** attempt * random.uniform(0.5, 1.5)
+        logger.warning(f"Запрос к LLM не удался ({type(error).__name__}), повтор через {delay:.1f} с "
+                       f"(попытка {attempt + 1}/{self.max_retries})")
+        await asyncio.sleep(delay)
+
+    # Потоковый ответ: кусочки текста кладутся в out по мере генерации, в конце — None (перед ним исключение, если было).
+    # Повторяем запрос, только пока не пришло ни одного кусочка
+    async def _stream_into(self, system_prompt: str, user_text: str, model: str, out: queue.Queue):
+        client, semaphore = self._client_and_semaphore()
+        try:
+            for attempt in range(self.max_retries + 1):
+                received = False
+                try:
+                    async with semaphore:
+                        stream = await client.chat.completions.create(
+                            model=model,
+                            messages=[
+                                {"role": "system", "content": system_prompt},
+                                {"role": "user", "content": user_text}
+                            ],
+                            stream=True
+                        )
+                        async for chunk in stream:
+                            delta = chunk.choices[0].delta.content if chunk.choices else None
+                            if delta:
+                                received = True
+                                out.put(delta)
+                    return
+                except RETRYABLE_ERRORS as e:
+                    if received or attempt == self.max_retries:
+                        raise
+                    await self._retry_pause(attempt, e)
+        except Exception as e:
+            out.put(e)
+        finally:
+            out.put(None)
+
+    # Генератор кусочков ответа в вызывающем потоке: текст доступен, пока модель еще генерирует продолжение
+    def stream_chat(self, system_prompt: str, user_text: str, model: str) -> Iterator[str]:
+        out = queue.Queue()
+        asyncio.run_coroutine_threadsafe(self._stream_into(system_prompt, user_text, model, out), self._ensure_started())
+        while (item := out.get()) is not None:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    # Запускает корутину в цикле клиента и сразу возвращает Future (результат — через add_done_callback)
+    def submit(self, coroutine) -> Future:
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_started())
+
+    # Синхронные обертки: выполняет корутину и ждет результат в вызывающем потоке
+    def run(self, coroutine):
+        return self.submit(coroutine).result()
+
+
+llm_client = AsyncLLMClient()
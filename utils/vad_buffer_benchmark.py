@@ -0,0 +1,73 @@
+# Микробенчмарк буферизации в цикле VAD: стоимость обработки одного 30 мс кадра
+# в старой схеме (torch.cat + список numpy-массивов) и с кольцевыми буферами.
+# Модель VAD не вызывается — меряется только работа с буферами.
+# Запуск: python -m utils.vad_buffer_benchmark [--seconds 600] [--utterance-s 8]
+
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from utils.audio_ring_buffer import AudioRingBuffer, int16_to_float32
+
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = 480 # 30 мс
+VAD_CHUNK_SIZE = 512
+
+
+def run_legacy(frames: list[bytes], utterance_frames: int) -> float:
+    started = time.perf_counter()
+    vad_buffer = None
+    speech = []
+    for i, frame in enumerate(frames):
+        audio_np = np.frombuffer(frame, dtype=np.int16).astype(np.float32) / 32768.0
+        tensor = torch.from_numpy(audio_np)
+        vad_buffer = tensor if vad_buffer is None else torch.cat([vad_buffer, tensor])
+        while vad_buffer.shape[0] >= VAD_CHUNK_SIZE:
+            chunk = vad_buffer[:VAD_CHUNK_SIZE]
+            vad_buffer = vad_buffer[VAD_CHUNK_SIZE:]
+            speech.append(chunk.numpy())
+        if (i + 1) % utterance_frames == 0:
+            np.concatenate(speech)
+            speech.clear()
+    return time.perf_counter() - started
+
+
+def run_ring(frames: list[bytes], utterance_frames: int) -> float:
+    started = time.perf_counter()
+    vad_ring = AudioRingBuffer(VAD_CHUNK_SIZE * 4, max_pop=VAD_CHUNK_SIZE)
+    speech_ring = AudioRingBuffer(SAMPLE_RATE * 300)
+    vad_input = np.zeros(VAD_CHUNK_SIZE, dtype=np.float32)
+    for i, frame in enumerate(frames):
+        vad_ring.write(np.frombuffer(frame, dtype=np.int16))
+        while len(vad_ring) >= VAD_CHUNK_SIZE:
+            window = vad_ring.pop(VAD_CHUNK_SIZE)
+            torch.from_numpy(int16_to_float32(window, vad_input))
+            speech_ring.write(window)
+        if (i + 1) % utterance_frames == 0:
+            speech_ring.to_float32()
+            speech_ring.clear()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнивает стоимость буферизации кадра в цикле VAD.")
+    parser.add_argument("--seconds", type=float, default=600, help="Сколько секунд аудио прогнать.")
+    parser.add_argument("--utterance-s", type=float, default=8, help="Длина одной реплики (как часто отдаем речь в ASR).")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    n_frames = int(args.seconds * SAMPLE_RATE / FRAME_SAMPLES)
+    frames = [rng.integers(-3000, 3000, FRAME_SAMPLES, dtype=np.int16).tobytes() for _ in range(n_frames)]
+    utterance_frames = max(1, int(args.utterance_s * SAMPLE_RATE / FRAME_SAMPLES))
+
+    print(f"Кадров: {n_frames} ({args.seconds:.0f} с аудио), реплика {args.utterance_s} с")
+    for name, func in (("torch.cat + list", run_legacy), ("ring buffer", run_ring)):
+        best = min(func(frames, utterance_frames) for _ in range(args.runs))
+        print(f"{name:<18} {best / n_frames * 1e6:8.2f} мкс/кадр   {best:6.2f} с всего")
+
+
+if __name__ == "__main__":
+    main()
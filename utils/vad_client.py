@@ -0,0 +1,103 @@
+import logging
+import socket
+import struct
+
+import numpy as np
+
+from config.config import VAD_SERVICE_ENABLED, VAD_SOCKET_PATH
+
+logger = logging.getLogger(__name__)
+
+# Протокол сервиса VAD: 1 байт операции, для OP_PROCESS далее окно float32; ответ — вероятность речи float32
+VAD_WINDOW_SAMPLES = 512
+VAD_WINDOW_BYTES = VAD_WINDOW_SAMPLES * 4
+OP_PROCESS = b"P"
+OP_RESET = b"R"
+PROB_FORMAT = "<f"
+
+
+def recv_exact(sock: socket.socket, n_bytes: int) -> bytes | None:
+    """Читает ровно n_bytes байт; None — соединение закрыто."""
+    buffer = bytearray(n_bytes)
+    view = memoryview(buffer)
+    received = 0
+    while received < n_bytes:
+        n = sock.recv_into(view[received:])
+        if not n:
+            return None
+        received += n
+    return bytes(buffer)
+
+
+class LocalVAD:
+    """Собственная модель Silero процесса (как было до общего сервиса), бэкенд — VAD_BACKEND."""
+
+    def __init__(self):
+        from config.load_vad_model import create_new_vad_model
+
+        self.model = create_new_vad_model()
+
+    def __call__(self, audio: np.ndarray) -> float:
+        return self.model(audio)
+
+    def reset(self):
+        self.model.reset_states()
+
+
+class RemoteVAD:
+    """
+    Клиент общего сервиса VAD в процессе сервера. Одно соединение — один поток
+    со своим состоянием модели. Если сервис пропал посреди встречи, дальше
+    работает локальная модель.
+    """
+
+    def __init__(self, socket_path: str = VAD_SOCKET_PATH):
+        self.socket_path = socket_path
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(socket_path)
+        self._fallback: LocalVAD | None = None
+
+    def _switch_to_local(self, error: Exception):
+        logger.warning(f"Сервис VAD недоступен ({error}), переключаюсь на локальную модель.")
+        self.close()
+        self._fallback = LocalVAD()
+
+    def __call__(self, audio: np.ndarray) -> float:
+        if self._fallback is not None:
+            return self._fallback(audio)
+        try:
+            self._sock.sendall(OP_PROCESS + np.ascontiguousarray(audio, dtype=np.float32).tobytes())
+            response = recv_exact(self._sock, 4)
+            if response is None:
+                raise ConnectionError("соединение закрыто сервером")
+            return struct.unpack(PROB_FORMAT, response)[0]
+        except OSError as e:
+            self._switch_to_local(e)
+            return self._fallback(audio)
+
+    def reset(self):
+        if self._fallback is not None:
+            self._fallback.reset()
+            return
+        try:
+            self._sock.sendall(OP_RESET)
+        except OSError as e:
+            self._switch_to_local(e)
+
+    def close(self):
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+
+
+# VAD для процесса бота: общий сервис, если он запущен, иначе своя модель
+def create_vad():
+    if VAD_SERVICE_ENABLED:
+        try:
+            vad = RemoteVAD()
+            logger.info(f"VAD: подключен к общему сервису {VAD_SOCKET_PATH}")
+            return vad
+        except OSError as e:
+            logger.warning(f"Не удалось подключиться к сервису VAD ({e}), загружаю локальную модель.")
+    return LocalVAD()
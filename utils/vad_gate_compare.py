@@ -0,0 +1,81 @@
+# Проверка пре-гейта VAD на записанных встречах: прогоняет запись окнами по 512 семплов
+# через Silero без гейта и с гейтом, режет на реплики тем же Endpointer, что и
+# AudioHandler._process_audio_stream, и сравнивает границы реплик.
+# Запуск: python -m utils.vad_gate_compare --audio meeting1.wav [meeting2.webm ...] [--tolerance-ms 100]
+
+import argparse
+import time
+
+import numpy as np
+from faster_whisper import decode_audio
+
+from config.config import STREAM_SAMPLE_RATE
+from config.load_vad_model import create_new_vad_model
+from utils.energy_gate import EnergyGate
+from utils.endpointer import Endpointer, VAD_WINDOW_SAMPLES, SPEECH_START, SPEECH, PAUSE
+
+VAD_CHUNK_SIZE = VAD_WINDOW_SAMPLES
+
+
+def speech_probs(audio: np.ndarray, gate: EnergyGate | None) -> tuple[np.ndarray, float]:
+    model = create_new_vad_model()
+    n_windows = len(audio) // VAD_CHUNK_SIZE
+    probs = np.zeros(n_windows, dtype=np.float32)
+    started = time.perf_counter()
+    for i in range(n_windows):
+        window = audio[i * VAD_CHUNK_SIZE:(i + 1) * VAD_CHUNK_SIZE]
+        if gate is not None and gate.should_skip(window):
+            continue
+        probs[i] = model(window)
+    return probs, time.perf_counter() - started
+
+
+# Реплики (начало, конец) в секундах; конец — момент, когда накопилась пауза
+def segment(probs: np.ndarray) -> list[tuple[float, float]]:
+    window_s = VAD_CHUNK_SIZE / STREAM_SAMPLE_RATE
+    endpointer = Endpointer()
+    segments = []
+    speech_s = 0.0
+    start_s = 0.0
+    for i, prob in enumerate(probs):
+        event = endpointer.update(float(prob))
+        if event == SPEECH_START:
+            start_s = i * window_s
+            speech_s = 0.0
+        if event in (SPEECH_START, SPEECH):
+            speech_s += window_s
+        elif event == PAUSE:
+            if endpointer.long_enough(speech_s):
+                segments.append((start_s, (i + 1) * window_s))
+            speech_s = 0.0
+    return segments
+
+
+def compare(reference: list[tuple[float, float]], gated: list[tuple[float, float]], tolerance_s: float) -> int:
+    if len(reference) != len(gated):
+        return abs(len(reference) - len(gated))
+    return sum(1 for a, b in zip(reference, gated)
+               if abs(a[0] - b[0]) > tolerance_s or abs(a[1] - b[1]) > tolerance_s)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнивает нарезку реплик VAD без пре-гейта и с ним.")
+    parser.add_argument("--audio", nargs="+", required=True, help="Записи встреч (любой формат, понятный ffmpeg).")
+    parser.add_argument("--tolerance-ms", type=float, default=100, help="Допустимый сдвиг границы реплики.")
+    args = parser.parse_args()
+
+    tolerance_s = args.tolerance_ms / 1000
+    print(f"{'запись':<32}{'окон':>9}{'пропущено':>11}{'реплик':>8}{'с гейтом':>10}{'расхождений':>13}{'VAD, с':>9}{'с гейтом, с':>13}")
+    for path in args.audio:
+        audio = decode_audio(path, sampling_rate=STREAM_SAMPLE_RATE)
+        gate = EnergyGate()
+        reference_probs, reference_s = speech_probs(audio, None)
+        gated_probs, gated_s = speech_probs(audio, gate)
+        reference, gated = segment(reference_probs), segment(gated_probs)
+        stats = gate.stats()
+        print(f"{path[-31:]:<32}{stats['windows']:>9}{stats['skipped_share']:>11.1%}{len(reference):>8}{len(gated):>10}"
+              f"{compare(reference, gated, tolerance_s):>13}{reference_s:>9.1f}{gated_s:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()